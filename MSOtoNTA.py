@@ -1,11 +1,25 @@
 from treeAutomataConstruction import even, in_Set, singl, left, right, sub, symb
 from treeAutomata import *
+from symbolicTreeAutomata import SymbolicTreeAutomaton
+from bdd import BDD
 import re
 
 class MSO_to_NTA_Parser:
-    def __init__(self, alphabet, k):
+    def __init__(self, alphabet, k, minimize=False, symbolic=False, compiled=False, reduce=False, prune_empty=False):
         self.alphabet = alphabet
         self.k = k
+        # Minimize the automaton after every complement/cut/union/project step
+        self.minimize = minimize
+        # Reduce projected NTAs by downward simulation (see TreeAutomaton.reduce_simulation)
+        self.reduce = reduce
+        # Replace unsatisfiable intermediate results by a one-state automaton and skip
+        # the right side of and/implies when the left side is empty (costs an is_empty per step)
+        self.prune_empty = prune_empty
+        # Symbolic mode: atomic automata are converted to SymbolicTreeAutomaton (one shared BDD manager)
+        self.symbolic = symbolic
+        self.bdd = BDD() if symbolic else None
+        # Compiled mode: atomic automata are converted to CompiledTreeAutomaton (see TreeAutomaton.compile)
+        self.compiled = compiled
         self.variable_counter = 1
         self.bound_variables = {}
         self.variable_types = {}
@@ -166,81 +180,120 @@ class MSO_to_NTA_Parser:
             }
         raise ValueError(f"Unrecognized formula: {formula}")
     
-    def build_automaton(self, ast):
-        if ast['type'] in ('exists', 'exists_first'):
-            var = ast['var']
-            var_idx = self.bound_variables[var]
-            sub_automaton = self.build_automaton(ast['subformula'])
-
-            singleton = singl(var_idx, self.alphabet, self.k)
+    def _step(self, automaton):
+        # Minimization and the emptiness check work on explicit automata only
+        if self.symbolic or self.compiled:
+            return automaton
+        if self.prune_empty and automaton.is_empty():
+            print("  ✓ Subformula is unsatisfiable, using one-state automaton")
+            return TreeAutomaton.one_state(automaton.input_symbols, accepting=False)
+        if self.minimize:
+            return automaton.minimize()
+        return automaton
 
-            combined = singleton.cut(sub_automaton)
+    def _atom(self, automaton):
+        if self.symbolic:
+            return SymbolicTreeAutomaton.from_tree_automaton(automaton, self.bdd)
+        if self.compiled:
+            return automaton.compile()
+        return automaton
 
-            automaton = combined.project(self.alphabet, var_idx)
+    def _project(self, automaton, var_idx):
+        if self.symbolic:
+            return automaton.project()
+        if self.compiled:
+            return automaton.project(self.alphabet, var_idx)
+        projected = automaton.project(self.alphabet, var_idx)
+        return projected.reduce_simulation() if self.reduce else projected
 
+    def _skip(self, ast):
+        # Subformula is not built, but self.k must still count down its quantifiers
+        if ast['type'] in ('exists', 'exists_first', 'exists_second'):
             self.k = self.k - 1
-            return automaton
-        
-        elif ast['type'] == 'exists_second':
-            var = ast['var']
-            var_idx = self.bound_variables[var]
-            sub_automaton = self.build_automaton(ast['subformula'])
-            automaton = sub_automaton.project(self.alphabet, var_idx)
+        for key in ('subformula', 'left', 'right'):
+            if isinstance(ast.get(key), dict):
+                self._skip(ast[key])
+
+    def _quantifier_body(self, ast):
+        # Automaton of an existential quantifier before its variable is projected away
+        var_idx = self.bound_variables[ast['var']]
+        sub_automaton = self.build_automaton(ast['subformula'])
+        if ast['type'] == 'exists_second':
+            return sub_automaton, var_idx
+        singleton = self._atom(singl(var_idx, self.alphabet, self.k))
+        return self._step(singleton.cut(sub_automaton)), var_idx
+
+    def build_automaton(self, ast):
+        if ast['type'] in ('exists', 'exists_first', 'exists_second'):
+            body, var_idx = self._quantifier_body(ast)
+            automaton = self._step(self._project(body, var_idx))
             self.k = self.k - 1
             return automaton
         
         elif ast['type'] == 'not':
+            if not self.symbolic and not self.compiled and ast['subformula']['type'] in ('exists', 'exists_first', 'exists_second'):
+                # ¬∃ (and ∀): projection and determinization fused, the projected NTA is never built
+                body, var_idx = self._quantifier_body(ast['subformula'])
+                dta = self._step(body.project_determinize(self.alphabet, var_idx))
+                self.k = self.k - 1
+                return self._step(dta.complement())
             sub_automaton = self.build_automaton(ast['subformula'])
             print(sub_automaton.input_symbols)
-            return sub_automaton.complement()
+            return self._step(sub_automaton.complement())
         
         elif ast['type'] == 'left':
             left_var = ast['left']
             right_var = ast['right']
             left_idx = self.bound_variables[left_var]
             right_idx = self.bound_variables[right_var]
-            return left(left_idx, right_idx, self.alphabet, self.k)
+            return self._atom(left(left_idx, right_idx, self.alphabet, self.k))
         
         elif ast['type'] == 'right':
             left_var = ast['left']
             right_var = ast['right']
             left_idx = self.bound_variables[left_var]
             right_idx = self.bound_variables[right_var]
-            return right(left_idx, right_idx, self.alphabet, self.k)
+            return self._atom(right(left_idx, right_idx, self.alphabet, self.k))
         
         elif ast['type'] == 'and':
             left_automaton = self.build_automaton(ast['left'])
+            if self.prune_empty and not self.symbolic and not self.compiled and left_automaton.is_empty():
+                self._skip(ast['right'])
+                return left_automaton
             right_automaton = self.build_automaton(ast['right'])
-            return left_automaton.cut(right_automaton)
+            return self._step(left_automaton.cut(right_automaton))
         
         elif ast['type'] == 'or':
             left_automaton = self.build_automaton(ast['left'])
             right_automaton = self.build_automaton(ast['right'])
-            return left_automaton.union(right_automaton)
+            return self._step(left_automaton.union(right_automaton))
         
         elif ast['type'] == 'implies':
             left_automaton = self.build_automaton(ast['left'])
+            if self.prune_empty and not self.symbolic and not self.compiled and left_automaton.is_empty():
+                self._skip(ast['right'])
+                return TreeAutomaton.one_state(left_automaton.input_symbols, accepting=True)
             right_automaton = self.build_automaton(ast['right'])
-            left_complement = left_automaton.complement()
-            return left_complement.union(right_automaton)
+            left_complement = self._step(left_automaton.complement())
+            return self._step(left_complement.union(right_automaton))
         
         elif ast['type'] == 'in':
             set_var = ast['set_var']
             elem_var = ast['elem_var']
             set_idx = self.bound_variables[set_var]
             elem_idx = self.bound_variables[elem_var]
-            return in_Set(set_idx, elem_idx, self.alphabet, self.k)
+            return self._atom(in_Set(set_idx, elem_idx, self.alphabet, self.k))
 
         elif ast['type'] == 'predicate':
             char = ast['symbol']
             var = ast['var']
             var_idx = self.bound_variables[var]
-            return symb(char, var_idx, self.alphabet, self.k)
+            return self._atom(symb(char, var_idx, self.alphabet, self.k))
         
         elif ast['type'] == 'even':
             var = ast['var']
             var_idx = self.bound_variables[var]
-            return even(var_idx, self.alphabet, self.k)
+            return self._atom(even(var_idx, self.alphabet, self.k))
 if __name__ == "__main__":
     alphabet = {
         "a":2,
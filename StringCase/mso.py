@@ -4,9 +4,11 @@ from stringAutomata import Automaton as StringAutomaton
 
 class MSO_Parser:
 
-    def __init__(self, alphabet, k):
+    def __init__(self, alphabet, k, minimize=True):
         self.alphabet = alphabet
         self.k = k
+        # Minimize the automaton after every complement/cut/union/project step
+        self.minimize = minimize
         self.variable_counter = 1
         self.bound_variables = {}
         self.variable_types = {}
@@ -184,6 +186,11 @@ class MSO_Parser:
             
         raise ValueError(f"Unrecognized formula: {formula}")
     
+    def _step(self, automaton):
+        if self.minimize:
+            return automaton.minimize()
+        return automaton
+
     def build_automaton(self, ast):
         """
         Convert an AST node to an automaton.
@@ -194,10 +201,10 @@ class MSO_Parser:
             sub_automaton = self.build_automaton(ast['subformula'])
             print("Sub automaton transitions before cut:", sub_automaton.transitions)
             singleton = singl(var_idx, self.alphabet, self.k)
-            combined = singleton.cut(sub_automaton)
+            combined = self._step(singleton.cut(sub_automaton))
             print("Subautomaton alphabet:", sub_automaton.alphabet)
             print("Singl automaton alphabet:", singleton.alphabet)
-            automaton = combined.project(self.alphabet, var_idx)
+            automaton = self._step(combined.project(self.alphabet, var_idx))
             self.k = self.k-1
             return automaton
         
@@ -205,7 +212,7 @@ class MSO_Parser:
             var = ast['var']
             var_idx = self.bound_variables.get(var)
             sub_automaton = self.build_automaton(ast['subformula'])
-            automaton = sub_automaton.project(self.alphabet, var_idx)
+            automaton = self._step(sub_automaton.project(self.alphabet, var_idx))
             self.k = self.k-1
             return automaton
         
@@ -214,10 +221,10 @@ class MSO_Parser:
             var_idx = self.bound_variables.get(var)
             sub_automaton = self.build_automaton(ast['subformula'])
             singleton = singl(var_idx, self.alphabet, self.k)
-            sub_complement = sub_automaton.complement()
-            combined = singleton.cut(sub_complement)
-            projected = combined.project(self.alphabet, var_idx)
-            automaton = projected.complement()
+            sub_complement = self._step(sub_automaton.complement())
+            combined = self._step(singleton.cut(sub_complement))
+            projected = self._step(combined.project_determinize(self.alphabet, var_idx))
+            automaton = self._step(projected.complement())
             self.k = self.k - 1
             return automaton
         
@@ -226,13 +233,15 @@ class MSO_Parser:
             var_idx = self.bound_variables.get(var)
             sub_automaton = self.build_automaton(ast['subformula'])
             print("Sub automaton transitions before projection:", sub_automaton.transitions)
-            automaton = sub_automaton.complement().project(self.alphabet, var_idx).complement()
+            complemented = self._step(sub_automaton.complement())
+            projected = self._step(complemented.project_determinize(self.alphabet, var_idx))
+            automaton = self._step(projected.complement())
             self.k = self.k-1
             return automaton
         
         elif ast['type'] == 'not':
             sub_automaton = self.build_automaton(ast['subformula'])
-            return sub_automaton.complement()
+            return self._step(sub_automaton.complement())
         
         elif ast['type'] == 'le':
             left_var = ast['left']
@@ -248,17 +257,18 @@ class MSO_Parser:
             print("-----------")
             print("Cut automaton: ", left_automaton.cut(right_automaton).transitions)
             print("-----------")
-            return left_automaton.cut(right_automaton)
+            return self._step(left_automaton.cut(right_automaton))
         
         elif ast['type'] == 'or':
             left_automaton = self.build_automaton(ast['left'])
             right_automaton = self.build_automaton(ast['right'])
-            return left_automaton.union(right_automaton)
+            return self._step(left_automaton.union(right_automaton))
         
         elif ast['type'] == 'implies':
             left_automaton = self.build_automaton(ast['left'])
             right_automaton = self.build_automaton(ast['right'])
-            return left_automaton.complement().union(right_automaton)
+            left_complement = self._step(left_automaton.complement())
+            return self._step(left_complement.union(right_automaton))
         
         elif ast['type'] == 'in':
             # in(X,x): position x must be in set X
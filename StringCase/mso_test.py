@@ -160,6 +160,67 @@ for i, (formula, should_accept, should_reject) in enumerate(test_formulas, 1):
         print(f"  ❌ ERROR: {e}")
         traceback.print_exc()
 
+# === AUTOMATON CHECKS: minimize and project_determinize against nfa_run on all short words ===
+import itertools
+import random
+from stringAutomata import Automaton as StringAutomaton
+from utils import gen_new_alphabet
+
+def random_nfa(rng, chars, n=4):
+    # Partial on purpose: missing transitions must still reject
+    states = list(range(n))
+    transitions = {}
+    for state in states:
+        transitions[state] = {}
+        for char in chars:
+            targets = rng.sample(states, rng.choice([0, 1, 1, 2]))
+            if targets:
+                transitions[state][char] = targets if len(targets) > 1 else targets[0]
+    return StringAutomaton(set(states), set(chars), {rng.choice(states)}, set(rng.sample(states, rng.randint(1, n))), transitions)
+
+def words(chars, max_length):
+    chars = sorted(chars, key=repr)
+    for length in range(max_length + 1):
+        yield from itertools.product(chars, repeat=length)
+
+def report(name, failures):
+    print(f"  {'✓' if failures == 0 else '✗'} {name}: {int(failures)} failures")
+    return failures
+
+print(f"\n{'='*90}")
+print("Automaton checks")
+print(f"{'='*90}")
+check_rng = random.Random(11)
+check_failures = 0
+
+nfas = [random_nfa(check_rng, {"a", "b"}) for _ in range(40)]
+minimized = [A.minimize() for A in nfas]
+check_failures += report("minimize keeps the language (words up to length 7)",
+                         sum(A.nfa_run(w) != M.nfa_run(w) for A, M in zip(nfas, minimized) for w in words(A.alphabet, 7)))
+check_failures += report("minimizing twice changes nothing",
+                         sum(len(M.minimize().states) != len(M.states) for M in minimized))
+check_failures += report("minimize gives a complete DFA", sum(not M.is_deterministic() for M in minimized))
+
+# Parity of a's times parity of b's: the minimal complete DFA has 4 states
+parity = {(pa, pb): {"a": ((pa + 1) % 2, pb), "b": (pa, (pb + 1) % 2)} for pa in (0, 1) for pb in (0, 1)}
+even_even = StringAutomaton(set(parity), {"a", "b"}, {(0, 0)}, {(0, 0)}, parity)
+check_failures += report("even a's and even b's has 4 minimal states", len(even_even.minimize().states) != 4)
+# The same language through a redundant 8-state DFA (a's counted mod 4)
+mod4 = {(pa, pb): {"a": ((pa + 1) % 4, pb), "b": (pa, (pb + 1) % 2)} for pa in range(4) for pb in (0, 1)}
+even_even_mod4 = StringAutomaton(set(mod4), {"a", "b"}, {(0, 0)}, {(0, 0), (2, 0)}, mod4)
+check_failures += report("a's counted mod 4 minimizes to the same 4 states", len(even_even_mod4.minimize().states) != 4)
+
+for k in (1, 2, 3):
+    tracked = [random_nfa(check_rng, gen_new_alphabet(alphabet, k), n=3) for _ in range(10)]
+    failures = 0
+    for A in tracked:
+        fused = A.project_determinize(alphabet, k)
+        staged = A.project(alphabet, k).determinize_reachable()
+        failures += sum(fused.nfa_run(w) != staged.nfa_run(w) for w in words(staged.alphabet, 3 if k < 3 else 2))
+    check_failures += report(f"project_determinize = project + determinize_reachable (k={k})", failures)
+
+assert check_failures == 0, f"{check_failures} automaton check failures"
+
 print("\n" + "="*90)
 print("TESTING COMPLETE")
 print("="*90)
@@ -63,8 +63,10 @@ class Automaton:
         if len(self.start_states) != 1:
             return False
         for state in self.states:
+            row = self.transitions.get(state, {})
             for char in self.alphabet:
-                if isinstance(self.transitions[state][char], list):
+                # Missing transitions (e.g. after projection) make the automaton partial
+                if char not in row or isinstance(row[char], list):
                     return False
 
         for state in self.states:
@@ -215,80 +217,113 @@ class Automaton:
         if not self.is_deterministic():
             self = self.determinize()
         """
-        self = self.determinize_reachable()
+        # Complete DFAs (e.g. from minimize or project_determinize) only need their accept states flipped
+        if not self.is_deterministic():
+            self = self.determinize_reachable()
         new_accept_states = self.states - self.accept_states
         return Automaton(self.states, self.alphabet, self.start_states, new_accept_states, self.transitions)
 
-    def union(self, other):
-        new_states = {(s1, s2) for s1 in self.states for s2 in other.states}
-        new_start_states = {(st1, st2) for st1 in self.start_states for st2 in other.start_states}
-        new_accept_states = {(s1, s2) for s1 in self.states for s2 in other.states if s1 in self.accept_states or s2 in other.accept_states}
+    def minimize(self):
+        """
+        Hopcroft's O(n log n) DFA minimization. Determinizes first (reachable part only),
+        then splits the accepting/non-accepting partition with the predecessors of splitter blocks.
+        States of the result are block ids.
+        """
+        dfa = self.determinize_reachable()
+        chars = sorted(dfa.alphabet, key=repr)
+
+        # Inverse transitions: char -> state -> set of predecessors
+        inverse = {char: {} for char in chars}
+        for state in dfa.states:
+            for char in chars:
+                inverse[char].setdefault(dfa.transitions[state][char], set()).add(state)
+
+        accepting = {state for state in dfa.states if state in dfa.accept_states}
+        rejecting = dfa.states - accepting
+        blocks = [block for block in (accepting, rejecting) if block]
+        block_of = {state: idx for idx, block in enumerate(blocks) for state in block}
+        # Only the smaller initial block is needed as a splitter
+        work = {min(range(len(blocks)), key=lambda idx: len(blocks[idx]))} if len(blocks) == 2 else set()
+
+        while work:
+            splitter = list(blocks[work.pop()])
+            for char in chars:
+                # Group the predecessors of the splitter by their current block
+                touched = {}
+                for state in splitter:
+                    for pred in inverse[char].get(state, ()):
+                        touched.setdefault(block_of[pred], set()).add(pred)
+                for idx, preds in touched.items():
+                    if len(preds) == len(blocks[idx]):
+                        continue
+                    # The smaller half becomes the new block and is always a splitter
+                    rest = blocks[idx] - preds
+                    smaller, larger = (preds, rest) if len(preds) <= len(rest) else (rest, preds)
+                    blocks[idx] = larger
+                    new_idx = len(blocks)
+                    blocks.append(smaller)
+                    for state in smaller:
+                        block_of[state] = new_idx
+                    # If idx is still waiting it now holds only the larger half, so both halves get processed
+                    work.add(new_idx)
+
         new_transitions = {}
-        
-        for (s1, s2) in new_states:
-            new_transitions[(s1, s2)] = {}
-            for char in self.alphabet.union(other.alphabet):
-                next_s1 = self.transitions.get(s1, {}).get(char, s1)
-                next_s2 = other.transitions.get(s2, {}).get(char, s2)
-                if isinstance(next_s1, list) or isinstance(next_s2, list):
-                    # Handle nondeterministic transitions by adding to list
-                    combined_next_states = set()
-                    if isinstance(next_s1, list):
-                        combined_next_states.update(next_s1)
-                    if isinstance(next_s2, list):
-                        combined_next_states.update(next_s2)
-                    
-                else: new_transitions[(s1, s2)][char] = (next_s1, next_s2)
-        
-        return  Automaton(new_states, self.alphabet.union(other.alphabet), new_start_states, new_accept_states, new_transitions)
+        for state in dfa.states:
+            new_transitions.setdefault(block_of[state], {char: block_of[dfa.transitions[state][char]] for char in chars})
+        new_start_states = {block_of[state] for state in dfa.start_states}
+        new_accept_states = {block_of[state] for state in accepting}
+        return Automaton(set(new_transitions), self.alphabet, new_start_states, new_accept_states, new_transitions)
 
-    def cut(self, other):
+    def union(self, other):
+        """Reachable product accepting if either side accepts; a side without a transition drops out (None)."""
+        return self._product_reachable(other, lambda accept1, accept2: accept1 or accept2, keep_partial=True)
 
-        #print("\n In Cut Method: \n")
-        #print("Self Transitions: ", self.transitions)
-        #print("Other Transitions: ", other.transitions)
-        #print("\n End of Cut Method Print \n")
+    def cut(self, other):
+        """Reachable product accepting if both sides accept; a pair without a transition on both sides has none."""
+        return self._product_reachable(other, lambda accept1, accept2: accept1 and accept2, keep_partial=False)
 
-        new_states = {(s1, s2) for s1 in self.states for s2 in other.states}
+    def _product_reachable(self, other, is_accepting, keep_partial):
+        """
+        Product automaton built by BFS from the start pairs, so only reachable pairs become states.
+        With keep_partial a missing transition on one side continues with None on that side
+        (union semantics), otherwise the pair has no transition on that char (intersection).
+        """
+        def next_states(automaton, state, char):
+            if state is None:
+                return []
+            next_state = automaton.transitions.get(state, {}).get(char)
+            if next_state is None:
+                return []
+            return next_state if isinstance(next_state, list) else [next_state]
+
+        new_alphabet = self.alphabet.union(other.alphabet)
         new_start_states = {(st1, st2) for st1 in self.start_states for st2 in other.start_states}
-        new_accept_states = {(s1, s2) for s1 in self.states for s2 in other.states if s1 in self.accept_states and s2 in other.accept_states}
+        new_states = set(new_start_states)
         new_transitions = {}
-        
-        for (s1, s2) in new_states:
+        queue = deque(new_start_states)
+
+        while queue:
+            s1, s2 = queue.popleft()
             new_transitions[(s1, s2)] = {}
-            for char in self.alphabet.union(other.alphabet):
-                #print(f"Processiong transition for state ({s1}, {s2}) on char '{char}'")
-                next_s1 = self.transitions.get(s1, {}).get(char)
-                next_s2 = other.transitions.get(s2, {}).get(char)
-                # If either side has no transition, this symbol is not allowed from the pair.
-                if next_s1 is None or next_s2 is None:
+            for char in new_alphabet:
+                next_s1 = next_states(self, s1, char)
+                next_s2 = next_states(other, s2, char)
+                if not next_s1 and not next_s2:
                     continue
-                #print(f"  Next states: {next_s1}, {next_s2}")
-                if isinstance(next_s1, list) or isinstance(next_s2, list):
-                    # Handle nondeterministic transitions by adding to list
-                    #print(" Two NFAs in cut. Check implementation!!!")
-                    combined_next_states = list()
-                    if (isinstance(next_s1, list) and isinstance(next_s2, list)):
-                        print(f"  Nondeterministic next states from both: {next_s1}, {next_s2}")
-                        for ns1 in next_s1:
-                            for ns2 in next_s2:
-                                combined_next_states.append((ns1, ns2))
-
-                    
-                    elif isinstance(next_s1, list):
-                        #print(f"  1. Nondeterministic next states from self: {next_s1}")
-                        for ns1 in next_s1:
-                            combined_next_states.append((ns1, next_s2))
-                    elif isinstance(next_s2, list):
-                        #print(f"  2. Nondeterministic next states from other: {next_s2}")  
-                        for ns2 in next_s2:
-                            combined_next_states.append((next_s1, ns2))
-                
-                    #print(f"  Combined next states (nondeterministic): {combined_next_states}")
-                    new_transitions[(s1, s2)][char] = combined_next_states
-                else: new_transitions[(s1, s2)][char] = (next_s1, next_s2)
-        
-        return Automaton(new_states, self.alphabet.union(other.alphabet), new_start_states, new_accept_states, new_transitions)
+                if not next_s1 or not next_s2:
+                    if not keep_partial:
+                        continue
+                    next_s1 = next_s1 or [None]
+                    next_s2 = next_s2 or [None]
+                combined = [(ns1, ns2) for ns1 in next_s1 for ns2 in next_s2]
+                new_transitions[(s1, s2)][char] = combined if len(combined) > 1 else combined[0]
+                for pair in combined:
+                    if pair not in new_states:
+                        new_states.add(pair)
+                        queue.append(pair)
+
+        new_accept_states = {(s1, s2) for (s1, s2) in new_states if is_accepting(s1 in self.accept_states, s2 in other.accept_states)}
+        return Automaton(new_states, new_alphabet, new_start_states, new_accept_states, new_transitions)
 
     def project(self, alphabet, j):
         #print(f"Projecting automaton to alphabet with depth {j}...")
@@ -349,6 +384,50 @@ class Automaton:
         #print("Projection complete. new transitions:", new_transitions)
         return Automaton(self.states, new_alphabet, self.start_states, self.accept_states, new_transitions)
 
+    def project_determinize(self, alphabet, j):
+        """
+        project(alphabet, j) followed by determinize_reachable() in one subset construction.
+        The successors of a subset under a new char are collected directly from the old chars
+        that project onto it, so the projected NFA is never built.
+        """
+        new_alphabet = alphabet if j - 1 == 0 else gen_new_alphabet(alphabet, j - 1)
+        # New char -> old chars projecting onto it (same mapping as in project)
+        old_chars = {char: [] for char in new_alphabet}
+        for old_char in {old_char for row in self.transitions.values() for old_char in row}:
+            new_char = old_char[0] if j - 1 == 0 else old_char[0:j]
+            if new_char in old_chars:
+                old_chars[new_char].append(old_char)
+
+        new_start_state = frozenset(self.start_states)
+        new_transitions = {}
+        reachable_states = {new_start_state}
+        queue = deque([new_start_state])
+        while queue:
+            state = queue.popleft()
+            new_transitions[state] = {}
+            for char in new_alphabet:
+                next_states = set()
+                for substate in state:
+                    row = self.transitions.get(substate)
+                    if not row:
+                        continue
+                    for old_char in old_chars[char]:
+                        next_state = row.get(old_char)
+                        if next_state is None:
+                            continue
+                        if isinstance(next_state, list):
+                            next_states.update(next_state)
+                        else:
+                            next_states.add(next_state)
+                next_state_frozen = frozenset(next_states)
+                new_transitions[state][char] = next_state_frozen
+                if next_state_frozen not in reachable_states:
+                    reachable_states.add(next_state_frozen)
+                    queue.append(next_state_frozen)
+
+        new_accept_states = {state for state in reachable_states if any(substate in self.accept_states for substate in state)}
+        return Automaton(reachable_states, new_alphabet, {new_start_state}, new_accept_states, new_transitions)
+
                     
 
 if __name__ == "__main__":
@@ -0,0 +1,135 @@
+"""
+Reduced ordered multi-terminal BDDs over the track bits b1..bk of the symbols (base, b1, ..., bk).
+Variable i (0-based) is bit i+1, so the last track (the one removed by projection) is the
+deepest variable in the order. Leaves carry arbitrary hashable values (here: frozensets of states).
+Nodes are ints handed out by a BDD manager; equal functions get the same int (unique table),
+so comparing and hashing BDDs is comparing ints.
+"""
+from itertools import product
+
+class BDD:
+    LEAF = float("inf")
+
+    def __init__(self):
+        # node id -> (var, low, high); leaves have var LEAF and the value in self.value
+        self.var = []
+        self.low = []
+        self.high = []
+        self.value = []
+        self.unique_table = {}
+        self.leaf_table = {}
+        # Computed table: (op, u, v) for apply, ("exists", op, u, var) and ("map", f, u)
+        self.op_cache = {}
+
+    def leaf(self, value):
+        node = self.leaf_table.get(value)
+        if node is None:
+            node = len(self.var)
+            self.var.append(BDD.LEAF)
+            self.low.append(None)
+            self.high.append(None)
+            self.value.append(value)
+            self.leaf_table[value] = node
+        return node
+
+    def node(self, var, low, high):
+        # Reduction rule: both branches equal -> no test needed
+        if low == high:
+            return low
+        key = (var, low, high)
+        node = self.unique_table.get(key)
+        if node is None:
+            node = len(self.var)
+            self.var.append(var)
+            self.low.append(low)
+            self.high.append(high)
+            self.value.append(None)
+            self.unique_table[key] = node
+        return node
+
+    def is_leaf(self, u):
+        return self.var[u] == BDD.LEAF
+
+    def from_table(self, table, k, default):
+        """BDD of the function bits -> table.get(bits, default) for bit tuples of length k."""
+        def build(var, prefix):
+            if var == k:
+                return self.leaf(table.get(prefix, default))
+            return self.node(var, build(var + 1, prefix + (0,)), build(var + 1, prefix + (1,)))
+        return build(0, ())
+
+    def evaluate(self, u, bits):
+        while not self.is_leaf(u):
+            u = self.high[u] if bits[self.var[u]] else self.low[u]
+        return self.value[u]
+
+    def apply(self, op, u, v):
+        """Pointwise op(value_u, value_v) of two BDDs; op must be the same function object to hit the cache."""
+        key = (op, u, v)
+        result = self.op_cache.get(key)
+        if result is not None:
+            return result
+        var_u = self.var[u]
+        var_v = self.var[v]
+        if var_u == BDD.LEAF and var_v == BDD.LEAF:
+            result = self.leaf(op(self.value[u], self.value[v]))
+        else:
+            var = min(var_u, var_v)
+            u_low, u_high = (self.low[u], self.high[u]) if var_u == var else (u, u)
+            v_low, v_high = (self.low[v], self.high[v]) if var_v == var else (v, v)
+            result = self.node(var, self.apply(op, u_low, v_low), self.apply(op, u_high, v_high))
+        self.op_cache[key] = result
+        return result
+
+    def exists(self, u, var, op):
+        """Quantify var away, the two cofactors are merged with op (e.g. set union)."""
+        key = ("exists", op, u, var)
+        result = self.op_cache.get(key)
+        if result is not None:
+            return result
+        var_u = self.var[u]
+        if var_u > var:
+            # var does not occur below this node
+            result = u
+        elif var_u == var:
+            result = self.apply(op, self.low[u], self.high[u])
+        else:
+            result = self.node(var_u, self.exists(self.low[u], var, op), self.exists(self.high[u], var, op))
+        self.op_cache[key] = result
+        return result
+
+    def map_leaves(self, u, f):
+        key = ("map", f, u)
+        result = self.op_cache.get(key)
+        if result is not None:
+            return result
+        if self.is_leaf(u):
+            result = self.leaf(f(self.value[u]))
+        else:
+            result = self.node(self.var[u], self.map_leaves(self.low[u], f), self.map_leaves(self.high[u], f))
+        self.op_cache[key] = result
+        return result
+
+    def leaves(self, u):
+        """Values of all leaves reachable from u."""
+        values = []
+        seen = set()
+        stack = [u]
+        while stack:
+            node = stack.pop()
+            if node in seen:
+                continue
+            seen.add(node)
+            if self.is_leaf(node):
+                values.append(self.value[node])
+            else:
+                stack.append(self.low[node])
+                stack.append(self.high[node])
+        return values
+
+    def to_table(self, u, k):
+        """Inverse of from_table: bits -> value for all 2^k bit tuples."""
+        return {bits: self.evaluate(u, bits) for bits in product((0, 1), repeat=k)}
+
+    def size(self):
+        return len(self.var)
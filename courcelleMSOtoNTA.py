@@ -1,11 +1,29 @@
 from courcelleAutomataConstruction import *
 from treeAutomata import *
+from symbolicTreeAutomata import SymbolicTreeAutomaton
+from bdd import BDD
 import re
 from StringCase.utils import gen_courcelle_alphabet
 
 class courcelle_MSO_to_NTA_Parser:
-    def __init__(self, alphabet, twd, k):
+    def __init__(self, alphabet, twd, k, bitset=True, minimize=False, symbolic=False, compiled=False, workers=None, reduce=False, prune_empty=False):
         self.alphabet = alphabet
+        # Determinize with bitmask subset states (see TreeAutomaton.determinize_reachable)
+        self.bitset = bitset
+        # Worker processes for determinization and products of explicit automata (None: serial)
+        self.workers = workers
+        # Minimize the automaton after every complement/cut/union/project step
+        self.minimize = minimize
+        # Reduce projected NTAs by downward simulation (see TreeAutomaton.reduce_simulation)
+        self.reduce = reduce
+        # Replace unsatisfiable intermediate results by a one-state automaton and skip
+        # the right side of and/implies when the left side is empty (costs an is_empty per step)
+        self.prune_empty = prune_empty
+        # Symbolic mode: atomic automata are converted to SymbolicTreeAutomaton (one shared BDD manager)
+        self.symbolic = symbolic
+        self.bdd = BDD() if symbolic else None
+        # Compiled mode: atomic automata are converted to CompiledTreeAutomaton (see TreeAutomaton.compile)
+        self.compiled = compiled
         self.base_alphabet = gen_courcelle_alphabet(treewidth=twd, k=k)
         self.k = k
         self.twd = twd
@@ -178,95 +196,138 @@ class courcelle_MSO_to_NTA_Parser:
                 }
         raise ValueError(f"Unrecognized formula: {formula}")
     
-    def build_automaton(self, ast):
-        print(f"Building automaton for AST node: {ast}")
-        if ast['type'] in ('exists', 'exists_first'):
-            var = ast['var']
-            var_idx = self.bound_variables[var]
-            sub_automaton = self.build_automaton(ast['subformula'])
+    def _step(self, automaton):
+        # Minimization and the emptiness check work on explicit automata only
+        if self.symbolic or self.compiled:
+            return automaton
+        if self.prune_empty and automaton.is_empty():
+            print("  ✓ Subformula is unsatisfiable, using one-state automaton")
+            return TreeAutomaton.one_state(automaton.input_symbols, accepting=False)
+        if self.minimize:
+            return automaton.minimize()
+        return automaton
 
-            singleton = singl(var_idx, self.alphabet, self.twd, self.k)
+    def _atom(self, automaton):
+        if self.symbolic:
+            return SymbolicTreeAutomaton.from_tree_automaton(automaton, self.bdd)
+        if self.compiled:
+            return automaton.compile()
+        return automaton
 
-            combined = singleton.cut(sub_automaton)
+    def _project(self, automaton, var_idx):
+        if self.symbolic:
+            return automaton.project()
+        if self.compiled:
+            return automaton.project_courcelle(self.alphabet, self.twd, var_idx)
+        projected = automaton.project_courcelle(self.alphabet, self.twd, var_idx, verbose=False)
+        return projected.reduce_simulation() if self.reduce else projected
 
-            automaton = combined.project_courcelle(self.alphabet, self.twd, var_idx, verbose=False)
+    def _complement(self, automaton):
+        if self.symbolic or self.compiled:
+            return automaton.complement()
+        return automaton.complement(bitset=self.bitset, workers=self.workers)
 
+    def _cut(self, left_automaton, right_automaton):
+        if self.symbolic or self.compiled:
+            return left_automaton.cut(right_automaton)
+        return left_automaton.cut(right_automaton, workers=self.workers)
+
+    def _union(self, left_automaton, right_automaton):
+        if self.symbolic or self.compiled:
+            return left_automaton.union(right_automaton)
+        return left_automaton.union(right_automaton, workers=self.workers)
+
+    def _skip(self, ast):
+        # Subformula is not built, but self.k must still count down its quantifiers
+        if ast['type'] in ('exists', 'exists_first', 'exists_second', 'forall_first'):
             self.k = self.k - 1
-            return automaton
-        
-        elif ast['type'] == 'exists_second':
-            var = ast['var']
-            var_idx = self.bound_variables[var]
-            sub_automaton = self.build_automaton(ast['subformula'])
-            print("Sub Automaton:", sub_automaton.input_symbols)
-            automaton = sub_automaton.project_courcelle(self.alphabet, self.twd, var_idx, verbose=False)
-            self.k = self.k - 1
-            return automaton
-        
-        elif ast['type'] == 'forall_first':
-            var = ast['var']
-            var_idx = self.bound_variables[var]
-            sub_automaton = self.build_automaton(ast['subformula'])
+        for key in ('subformula', 'left', 'right'):
+            if isinstance(ast.get(key), dict):
+                self._skip(ast[key])
 
-            singleton = singl(var_idx, self.alphabet, self.twd, self.k)
-            combined = singleton.complement().union(sub_automaton)
+    def _quantifier_body(self, ast):
+        # Automaton of a quantifier node before its variable is projected away
+        var_idx = self.bound_variables[ast['var']]
+        sub_automaton = self.build_automaton(ast['subformula'])
+        if ast['type'] == 'exists_second':
+            print("Sub Automaton:", sub_automaton.input_symbols)
+            return sub_automaton, var_idx
+        singleton = self._atom(singl(var_idx, self.alphabet, self.twd, self.k))
+        if ast['type'] == 'forall_first':
+            return self._step(self._union(self._step(self._complement(singleton)), sub_automaton)), var_idx
+        return self._step(self._cut(singleton, sub_automaton)), var_idx
 
-            automaton = combined.project_courcelle(self.alphabet, self.twd, var_idx, verbose=False)
+    def build_automaton(self, ast):
+        print(f"Building automaton for AST node: {ast}")
+        if ast['type'] in ('exists', 'exists_first', 'exists_second', 'forall_first'):
+            body, var_idx = self._quantifier_body(ast)
+            automaton = self._step(self._project(body, var_idx))
             self.k = self.k - 1
             return automaton
 
-
         elif ast['type'] == 'not':
+            if not self.symbolic and not self.compiled and ast['subformula']['type'] in ('exists', 'exists_first', 'exists_second', 'forall_first'):
+                # ¬∃ (and ∀): projection and determinization fused, the projected NTA is never built
+                body, var_idx = self._quantifier_body(ast['subformula'])
+                dta = self._step(body.project_determinize(self.alphabet, var_idx, treewidth=self.twd))
+                self.k = self.k - 1
+                return self._step(dta.complement())
             sub_automaton = self.build_automaton(ast['subformula'])
             #print(sub_automaton.input_symbols)
-            return sub_automaton.complement()
+            return self._step(self._complement(sub_automaton))
         
         elif ast['type'] == 'and':
             left_automaton = self.build_automaton(ast['left'])
+            if self.prune_empty and not self.symbolic and not self.compiled and left_automaton.is_empty():
+                self._skip(ast['right'])
+                return left_automaton
             right_automaton = self.build_automaton(ast['right'])
-            return left_automaton.cut(right_automaton)
+            return self._step(self._cut(left_automaton, right_automaton))
         
         elif ast['type'] == 'or':
             left_automaton = self.build_automaton(ast['left'])
             right_automaton = self.build_automaton(ast['right'])
-            return left_automaton.union(right_automaton)
+            return self._step(self._union(left_automaton, right_automaton))
         
         elif ast['type'] == 'implies':
             left_automaton = self.build_automaton(ast['left'])
+            if self.prune_empty and not self.symbolic and not self.compiled and left_automaton.is_empty():
+                self._skip(ast['right'])
+                return TreeAutomaton.one_state(left_automaton.input_symbols, accepting=True)
             right_automaton = self.build_automaton(ast['right'])
-            left_complement = left_automaton.complement()
-            return left_complement.union(right_automaton)
+            left_complement = self._step(self._complement(left_automaton))
+            return self._step(self._union(left_complement, right_automaton))
 
         elif ast['type'] == 'in1':
             set_var = ast['set_var']
             elem_var = ast['elem_var']
             set_idx = self.bound_variables[set_var]
             elem_idx = self.bound_variables[elem_var]
-            return in1(set_idx, elem_idx, self.alphabet, self.twd, self.k)
+            return self._atom(in1(set_idx, elem_idx, self.alphabet, self.twd, self.k))
         
         elif ast['type'] == 'in2':
             set_var = ast['set_var']
             elem_var = ast['elem_var']
             set_idx = self.bound_variables[set_var]
             elem_idx = self.bound_variables[elem_var]
-            return in2(set_idx, elem_idx, self.alphabet, self.twd, self.k)
+            return self._atom(in2(set_idx, elem_idx, self.alphabet, self.twd, self.k))
         
         elif ast['type'] == 'subset':
             set1_var = ast['set1_var']
             set2_var = ast['set2_var']
             set1_idx = self.bound_variables[set1_var]
             set2_idx = self.bound_variables[set2_var]
-            return subset(set1_idx, set2_idx, self.alphabet, self.twd, self.k)
+            return self._atom(subset(set1_idx, set2_idx, self.alphabet, self.twd, self.k))
         
         elif ast['type'] == 'vertices':
             set_var = ast['set_var']
             set_idx = self.bound_variables[set_var]
-            return vertices(set_idx, self.alphabet, self.twd, self.k)
+            return self._atom(vertices(set_idx, self.alphabet, self.twd, self.k))
         
         elif ast['type'] == 'edges':
             set_var = ast['set_var']
             set_idx = self.bound_variables[set_var]
-            return edges(set_idx, self.alphabet, self.twd, self.k)
+            return self._atom(edges(set_idx, self.alphabet, self.twd, self.k))
         
 
 if __name__ == "__main__":
@@ -65,4 +65,69 @@ print("in1(X3, X1): ",in1_automaton.nta_run(tree_quad))
 print("------------------------------")
 print("in2(X3, X2): ",in2_automaton.nta_run(tree_quad))
 print("------------------------------")
-print("subset(X1, X2): ", sub12_automaton.nta_run(tree_quad))
\ No newline at end of file
+print("subset(X1, X2): ", sub12_automaton.nta_run(tree_quad))
+print("------------------------------")
+
+# Differential checks on tree_quad with random set assignments: products against nta_run of the operands
+import random
+from symbolicTreeAutomata import SymbolicTreeAutomaton
+from bdd import BDD
+
+def with_bits(tree, rng):
+    copies = {}
+    for node in tree.postorder()[0]:
+        label = node.label if node.label == "//" else (node.label[0],) + tuple(rng.randint(0, 1) for _ in range(k))
+        copies[id(node)] = Node(label, node.id, [copies[id(c)] for c in node.children])
+    return RootedTree(copies[id(tree.root)], list(copies.values()))
+
+def symbolic_product(A, B, method):
+    manager = BDD()
+    return getattr(SymbolicTreeAutomaton.from_tree_automaton(A, manager), method)(
+        SymbolicTreeAutomaton.from_tree_automaton(B, manager))
+
+rng = random.Random(5)
+labelled_trees = [with_bits(tree_quad, rng) for _ in range(100)]
+atom_pairs = [(singl1_automaton, edges2_automaton), (in1_automaton, sub12_automaton),
+              (vertices3_automaton, in2_automaton), (singl3_automaton.complement(), edges1_automaton)]
+products = [
+    ("union", lambda A, B: A.union(B), lambda x, y: x or y),
+    ("cut", lambda A, B: A.cut(B), lambda x, y: x and y),
+    ("trim+union", lambda A, B: A.trim().union(B.trim()), lambda x, y: x or y),
+    ("compiled union", lambda A, B: A.compile().union(B.compile()), lambda x, y: x or y),
+    ("compiled cut", lambda A, B: A.compile().cut(B.compile()), lambda x, y: x and y),
+    ("symbolic union", lambda A, B: symbolic_product(A, B, "union"), lambda x, y: x or y),
+    ("symbolic cut", lambda A, B: symbolic_product(A, B, "cut"), lambda x, y: x and y),
+]
+failures = 0
+for name, build, combine in products:
+    mismatches = 0
+    for A, B in atom_pairs:
+        product = build(A, B)
+        for tree in labelled_trees:
+            if product.nta_run(tree) != combine(A.nta_run(tree), B.nta_run(tree)):
+                mismatches += 1
+    status = "✓" if mismatches == 0 else "✗"
+    print(f"  {status} {name}: {mismatches} mismatches over {len(atom_pairs)} pairs x {len(labelled_trees)} trees")
+    failures += mismatches
+
+# The compiled operations behind courcelle_MSO_to_NTA_Parser(compiled=True) against the explicit ones
+def without_last_track(tree):
+    copies = {}
+    for node in tree.postorder()[0]:
+        label = node.label if node.label == "//" else node.label[:-1]
+        copies[id(node)] = Node(label, node.id, [copies[id(c)] for c in node.children])
+    return RootedTree(copies[id(tree.root)], list(copies.values()))
+
+projected_trees = [without_last_track(tree) for tree in labelled_trees]
+atoms = [singl1_automaton, in1_automaton, sub12_automaton, vertices3_automaton, edges3_automaton]
+compiled_checks = [
+    ("compiled complement", sum(A.compile().complement().nta_run(tree) == A.nta_run(tree) for A in atoms for tree in labelled_trees)),
+    ("compiled project_courcelle", sum(A.compile().project_courcelle(alphabet, treewidth, k).nta_run(tree)
+                                       != A.project_courcelle(alphabet, treewidth, k).nta_run(tree)
+                                       for A in atoms for tree in projected_trees)),
+]
+for name, mismatches in compiled_checks:
+    status = "✓" if mismatches == 0 else "✗"
+    print(f"  {status} {name}: {mismatches} mismatches over {len(atoms)} automata x {len(labelled_trees)} trees")
+    failures += mismatches
+assert failures == 0, f"{failures} differential mismatches"
@@ -1,3 +1,7 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import heapq
+import random
+import time
 from treeDecomp import Bag, BinaryTree, RootedTree, Tree, Node, TreeDecomposition
 
 class Vertex:
@@ -11,26 +15,51 @@ class Vertex:
         return self.label
 
 class Graph:
+    """
+    Undirected graph. The core is an adjacency index (vertex -> set of neighbours), so adj and
+    degree are O(1) and neighbour queries O(deg). edges is still available as a list of
+    {v1, v2} sets in insertion order; assigning a new edge list rebuilds the index.
+    """
     def __init__(self, vertices:list, edges:list):
         self.vertices = vertices
         self.edges = edges
 
+    @property
+    def edges(self):
+        return [set(e) for e in self._edges]
+
+    @edges.setter
+    def edges(self, edges):
+        self.adjacency = {v: set() for v in self.vertices}
+        # frozenset({v1, v2}) -> None, keeps the insertion order of the edges
+        self._edges = {}
+        for e in edges:
+            self.add_edge(*e)
+
+    def add_edge(self, v1, v2=None):
+        # A single vertex ({v} as edge) is a self loop, it is kept as edge but not as neighbour
+        if v2 is None:
+            v2 = v1
+        key = frozenset((v1, v2))
+        if key in self._edges:
+            return
+        self._edges[key] = None
+        self.adjacency.setdefault(v1, set())
+        self.adjacency.setdefault(v2, set())
+        if v1 != v2:
+            self.adjacency[v1].add(v2)
+            self.adjacency[v2].add(v1)
+
     def adj(self, v1, v2):
-        return set([v1,v2]) in self.edges
+        if v1 == v2:
+            return frozenset((v1,)) in self._edges
+        return v2 in self.adjacency.get(v1, ())
     
     def get_adj_verts(self, v:Vertex):
-        res = []
-        for e in self.edges:
-            if v in e:
-                for x in e:
-                    res.append(x)
-        res = set(res)
-        if v in res:
-            res.remove(v)
-        return res
+        return set(self.adjacency.get(v, ()))
 
     def get_degree(self, v:Vertex):
-        return len(self.get_adj_verts(v))
+        return len(self.adjacency.get(v, ()))
 
     def get_degree_dict(self):
         res = {}
@@ -39,19 +68,18 @@ class Graph:
         return res
 
     def add_fill_in_edges(self, v:Vertex):
-        adjecent_verts = self.get_adj_verts(v)
+        adjecent_verts = self.adjacency.get(v, set())
         for u in self.vertices:
             if u not in adjecent_verts:
                 for w in self.vertices:
                     if w not in adjecent_verts:
-                        self.edges.append(set([u,w]))
+                        self.add_edge(u, w)
 
     def remove_vertex(self, v:Vertex):
-        for e in self.edges.copy():
-            #print("checking: " + str(e))
-            if v in e:
-                #print("removing :" + str(e))
-                self.edges.remove(e)
+        for u in self.adjacency.pop(v, ()):
+            self.adjacency[u].discard(v)
+            del self._edges[frozenset((u, v))]
+        self._edges.pop(frozenset((v,)), None)
         self.vertices.remove(v)
 
     def eliminate_vertex(self, v:Vertex):
@@ -60,48 +88,542 @@ class Graph:
         return h
 
     def make_neighborhood_clique(self, v:Vertex):
-        adjecent_verts = self.get_adj_verts(v)
+        adjecent_verts = self.adjacency.get(v, set())
         for u in adjecent_verts:
-            for w in adjecent_verts:
-                if u != w and {u, w} not in self.edges:
-                    self.edges.append(set([u,w]))
+            # Only the missing edges, set difference instead of a lookup per pair
+            for w in adjecent_verts - self.adjacency[u]:
+                if w != u:
+                    self.add_edge(u, w)
+
+def _elimination_graph(g:Graph):
+    # Int-indexed copy of g for elimination: position i is g.vertices[i], neighbours are int sets.
+    # Vertices that only occur in edges get positions after the vertex list.
+    index = {v: i for i, v in enumerate(g.vertices)}
+    for v in g.adjacency:
+        index.setdefault(v, len(index))
+    verts = list(index)
+    adj = [set() for _ in verts]
+    for v, neighbours in g.adjacency.items():
+        adj[index[v]] = {index[u] for u in neighbours}
+    return verts, adj
+
+def _eliminate(adj, v):
+    # Eliminate v from the int graph adj in place (its neighbourhood becomes a clique), returns its neighbours
+    neighbours = adj[v]
+    for u in neighbours:
+        adj[u].discard(v)
+        fill = neighbours - adj[u]
+        fill.discard(u)
+        adj[u] |= fill
+    adj[v] = set()
+    return neighbours
 
 def minimal_degree_ordering(g):
+    """
+    Eliminate a vertex of minimum degree len(g.vertices) - 1 times (its neighbourhood becomes a
+    clique) and return the eliminated vertices in order. Ties go to the vertex that comes first
+    in g.vertices. Degrees are kept in a bucket queue and only the neighbours of the eliminated
+    vertex are updated, so sparse graphs take near-linear time. g is not modified.
+    """
+    verts, adj = _elimination_graph(g)
+    n = len(g.vertices)
+    degree = [len(neighbours) for neighbours in adj]
+    # buckets[d] is a heap of positions with degree d; entries whose degree changed are stale
+    buckets = [[] for _ in range(len(verts))]
+    for i in range(n):
+        buckets[degree[i]].append(i)
+    eliminated = [False] * len(verts)
     ordering = []
-    #print("g Vertices: " + str(g.vertices))
-    h = Graph(g.vertices.copy(), [e.copy()for e in g.edges])
-    for i in range(1,len(h.vertices)):
-        degrees = h.get_degree_dict()
-        min_deg_vert = min(degrees, key=degrees.get)
-        #print("Min degree: " + min_deg_vert.label)
-        ordering.append(min_deg_vert)
-        #h.add_fill_in_edges(min_deg_vert)
-        h.make_neighborhood_clique(min_deg_vert)
-        h.remove_vertex(min_deg_vert) 
+    low = 0
+    for _ in range(n - 1):
+        while True:
+            bucket = buckets[low]
+            while bucket and (eliminated[bucket[0]] or degree[bucket[0]] != low):
+                heapq.heappop(bucket)
+            if bucket:
+                break
+            low += 1
+        v = heapq.heappop(bucket)
+        ordering.append(verts[v])
+        eliminated[v] = True
+        for u in _eliminate(adj, v):
+            d = len(adj[u])
+            if d != degree[u]:
+                degree[u] = d
+                if u < n:
+                    heapq.heappush(buckets[d], u)
+                if d < low:
+                    low = d
     return ordering
 
+
+def _degree_score(adj, x):
+    return len(adj[x])
+
+def _fill_score(adj, x):
+    # Number of edges missing between the neighbours of x (u itself is in neighbours - adj[u])
+    neighbours = adj[x]
+    return sum(len(neighbours - adj[u]) - 1 for u in neighbours) // 2
+
+def _weighted_fill_score(adj, x):
+    # Missing edges weighted by the product of the degrees of their endpoints
+    neighbours = adj[x]
+    total = 0
+    for u in neighbours:
+        for w in neighbours - adj[u]:
+            if u < w:
+                total += len(adj[u]) * len(adj[w])
+    return total
+
+# Greedy elimination heuristics: name -> score(adj, x), the vertex with the lowest score goes next.
+# A score may only depend on the neighbourhood of x and the neighbourhoods of its neighbours.
+ELIMINATION_HEURISTICS = {
+    "min_degree": _degree_score,
+    "min_fill": _fill_score,
+    "weighted_min_fill": _weighted_fill_score,
+}
+
+def _greedy_ordering(adj, n, score, seed=None):
+    # Eliminate positions 0..n-1 of the int graph adj (modified in place) by lowest score.
+    # Ties go to the lowest position, or to a random priority per vertex if seed is given.
+    # After eliminating v only vertices within distance 2 of v are rescored.
+    if seed is None:
+        tie = list(range(n))
+    else:
+        rng = random.Random(seed)
+        tie = [rng.random() for _ in range(n)]
+    current = [score(adj, x) for x in range(n)]
+    heap = [(current[x], tie[x], x) for x in range(n)]
+    heapq.heapify(heap)
+    eliminated = [False] * len(adj)
+    ordering = []
+    while heap:
+        value, _, v = heapq.heappop(heap)
+        if eliminated[v] or value != current[v]:
+            continue
+        ordering.append(v)
+        eliminated[v] = True
+        neighbours = _eliminate(adj, v)
+        dirty = set(neighbours)
+        for u in neighbours:
+            dirty |= adj[u]
+        for x in dirty:
+            if x < n and not eliminated[x]:
+                value = score(adj, x)
+                if value != current[x]:
+                    current[x] = value
+                    heapq.heappush(heap, (value, tie[x], x))
+    return ordering
+
+def elimination_ordering(g:Graph, heuristic="min_fill", seed=None):
+    """
+    Complete elimination ordering of g (all vertices) for permutationToTreeDecomposition.
+    heuristic is a name from ELIMINATION_HEURISTICS or a score function score(adj, x) over the
+    int-indexed graph. Ties go to the vertex first in g.vertices, with a seed they are broken
+    randomly (reproducible per seed). g is not modified.
+    """
+    if heuristic == "min_degree" and seed is None:
+        ordering = minimal_degree_ordering(g)
+        eliminated = set(ordering)
+        return ordering + [v for v in g.vertices if v not in eliminated]
+    score = ELIMINATION_HEURISTICS[heuristic] if isinstance(heuristic, str) else heuristic
+    verts, adj = _elimination_graph(g)
+    return [verts[i] for i in _greedy_ordering(adj, len(g.vertices), score, seed)]
+
+def _ordering_width(adj, ordering):
+    # Width of the decomposition built from the ordering: largest degree at elimination time
+    width = -1
+    for v in ordering:
+        width = max(width, len(_eliminate(adj, v)))
+    return width
+
+def ordering_width(g:Graph, ordering):
+    """Treewidth of permutationToTreeDecomposition(g, ordering) without building the bags."""
+    verts, adj = _elimination_graph(g)
+    index = {v: i for i, v in enumerate(verts)}
+    return _ordering_width(adj, [index[v] for v in ordering])
+
+_worker_elimination_graph = None
+
+def _init_ordering_worker(adj_lists, n):
+    global _worker_elimination_graph
+    _worker_elimination_graph = (adj_lists, n)
+
+def _ordering_task(task):
+    heuristic, seed = task
+    adj_lists, n = _worker_elimination_graph
+    return _run_heuristic(adj_lists, n, heuristic, seed)
+
+def _run_heuristic(adj_lists, n, heuristic, seed):
+    ordering = _greedy_ordering([set(neighbours) for neighbours in adj_lists], n, ELIMINATION_HEURISTICS[heuristic], seed)
+    return _ordering_width([set(neighbours) for neighbours in adj_lists], ordering), ordering
+
+def portfolio_ordering(g:Graph, time_budget=10.0, workers=None, heuristics=None, max_runs=None):
+    """
+    Run many elimination heuristics and keep the ordering of lowest width.
+    Every heuristic first runs deterministically, then with randomized tie-breaking (seed 1, 2, ...)
+    until time_budget seconds have passed or max_runs orderings were computed.
+    With workers the runs are spread over a ProcessPoolExecutor, otherwise they run in-process.
+    Returns (ordering, width); ties in width go to the earlier run.
+    """
+    start_time = time.time()
+    heuristics = list(heuristics or ELIMINATION_HEURISTICS)
+    verts, adj = _elimination_graph(g)
+    n = len(g.vertices)
+    adj_lists = [tuple(neighbours) for neighbours in adj]
+
+    def runs():
+        run = 0
+        while max_runs is None or run < max_runs:
+            heuristic = heuristics[run % len(heuristics)]
+            seed = None if run < len(heuristics) else run // len(heuristics)
+            yield run, (heuristic, seed)
+            run += 1
+
+    best = None
+    done = 0
+
+    def offer(run, task, result):
+        nonlocal best, done
+        done += 1
+        if best is None or (result[0], run) < (best[0], best[1]):
+            best = (result[0], run, task, result[1])
+
+    if not workers or workers <= 1:
+        for run, task in runs():
+            if done and time.time() - start_time >= time_budget:
+                break
+            offer(run, task, _run_heuristic(adj_lists, n, *task))
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_ordering_worker, initargs=(adj_lists, n))
+        try:
+            pending = {}
+            tasks = runs()
+            for run, task in tasks:
+                pending[executor.submit(_ordering_task, task)] = (run, task)
+                if len(pending) >= 2 * workers:
+                    break
+            while pending:
+                remaining = time_budget - (time.time() - start_time)
+                finished, _ = wait(pending, timeout=max(remaining, 0) if done else None, return_when=FIRST_COMPLETED)
+                if not finished:
+                    break
+                for future in finished:
+                    run, task = pending.pop(future)
+                    offer(run, task, future.result())
+                if time.time() - start_time < time_budget:
+                    for run, task in tasks:
+                        pending[executor.submit(_ordering_task, task)] = (run, task)
+                        if len(pending) >= 2 * workers:
+                            break
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    width, run, (heuristic, seed), ordering = best
+    print(f"  ✓ Portfolio: {done} orderings, best width {width} ({heuristic}, seed {seed}) ({time.time() - start_time:.2f}s)")
+    return [verts[i] for i in ordering], width
+
+
+def _eliminate_mask(adj, v):
+    # Copy of the bitmask adjacency with v eliminated (its neighbourhood made a clique)
+    adj = adj.copy()
+    neighbours = adj[v]
+    bits = neighbours
+    while bits:
+        low = bits & -bits
+        u = low.bit_length() - 1
+        adj[u] = (adj[u] | neighbours) & ~low & ~(1 << v)
+        bits ^= low
+    adj[v] = 0
+    return adj
+
+def _minor_min_width(adj, alive):
+    # Lower bound: contract a minimum degree vertex into its minimum degree neighbour, keep the max degree seen
+    adj = {v: adj[v] for v in _mask_bits(alive)}
+    lower = 0
+    while len(adj) > 1:
+        v = min(adj, key=lambda x: adj[x].bit_count())
+        neighbours = adj.pop(v)
+        lower = max(lower, neighbours.bit_count())
+        if not neighbours:
+            continue
+        u = min(_mask_bits(neighbours), key=lambda x: adj[x].bit_count())
+        for w in _mask_bits(neighbours):
+            adj[w] &= ~(1 << v)
+            if w != u:
+                adj[w] |= 1 << u
+        adj[u] |= neighbours & ~(1 << u)
+    return lower
+
+def _mask_bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+def _is_clique_without(adj, neighbours, w):
+    # Are the neighbours (except vertex w, -1 for none) pairwise adjacent?
+    rest = neighbours & ~(1 << w) if w >= 0 else neighbours
+    bits = rest
+    while bits:
+        low = bits & -bits
+        if rest & ~adj[low.bit_length() - 1] & ~low:
+            return False
+        bits ^= low
+    return True
+
+def _reducible_vertex(adj, alive, low):
+    # A simplicial vertex, or an almost simplicial one of degree <= low: eliminating it first is safe
+    bits = alive
+    while bits:
+        bit = bits & -bits
+        bits ^= bit
+        v = bit.bit_length() - 1
+        neighbours = adj[v]
+        # First neighbour with a missing edge to another neighbour
+        rest = neighbours
+        missing = 0
+        while rest:
+            u_bit = rest & -rest
+            rest ^= u_bit
+            missing = neighbours & ~adj[u_bit.bit_length() - 1] & ~u_bit
+            if missing:
+                break
+        if not missing:
+            return v
+        if neighbours.bit_count() > low:
+            continue
+        # All neighbours but w form a clique: w is u itself or the only vertex u misses
+        u = u_bit.bit_length() - 1
+        if _is_clique_without(adj, neighbours, u):
+            return v
+        if missing.bit_count() == 1 and _is_clique_without(adj, neighbours, missing.bit_length() - 1):
+            return v
+    return None
+
+def exact_treewidth(g:Graph, time_limit=None, progress=None):
+    """
+    Optimal elimination ordering of g: returns (ordering, width, exact) with a complete ordering for
+    permutationToTreeDecomposition. The upper bound comes from the min-fill/min-degree orderings,
+    the lower bound from minor-min-width. Widths k below the upper bound are decided by a branch and bound
+    over elimination orderings that only eliminates vertices of degree <= k, eliminates simplicial
+    and almost simplicial vertices without branching, prunes with minor-min-width and memoizes
+    failed sets of remaining vertices (the remaining graph only depends on that set), which makes
+    it a dynamic program over vertex subsets. If time_limit (seconds) runs out the best ordering
+    found so far is returned with exact False. progress(lower, upper, nodes, elapsed) is called
+    whenever a bound improves and every 1,000 search nodes.
+    """
+    start_time = time.time()
+    verts, adj_sets = _elimination_graph(g)
+    n = len(verts)
+    if n == 0:
+        return [], -1, True
+    adj = [sum(1 << u for u in neighbours) for neighbours in adj_sets]
+    full = (1 << n) - 1
+
+    index = {v: i for i, v in enumerate(verts)}
+    upper, best = None, None
+    for heuristic in ("min_fill", "min_degree"):
+        ordering = [index[v] for v in elimination_ordering(g, heuristic)]
+        ordering += [i for i in range(len(g.vertices), n)]
+        width = _ordering_width([set(neighbours) for neighbours in adj_sets], ordering)
+        if upper is None or width < upper:
+            upper, best = width, ordering
+    lower = _minor_min_width(adj, full)
+    nodes = 0
+
+    class TimeLimit(Exception):
+        pass
+
+    def report():
+        if progress is not None:
+            progress(lower, upper, nodes, time.time() - start_time)
+
+    def decide(k):
+        # Elimination ordering of width <= k or None. failed holds remaining vertex sets without one;
+        # sets searched with the commuting rule below are only recorded together with last.
+        failed = set()
+
+        def search(adj, alive, last, last_neighbours):
+            nonlocal nodes
+            nodes += 1
+            if nodes % 1000 == 0:
+                report()
+                if time_limit is not None and time.time() - start_time > time_limit:
+                    raise TimeLimit()
+            path = []
+            while True:
+                v = _reducible_vertex(adj, alive, k)
+                if v is None:
+                    break
+                if adj[v].bit_count() > k:
+                    return None
+                last = -1
+                path.append(v)
+                adj = _eliminate_mask(adj, v)
+                alive &= ~(1 << v)
+            if alive.bit_count() - 1 <= k:
+                return path + list(_mask_bits(alive))
+            if alive in failed or (alive, last) in failed:
+                return None
+            if _minor_min_width(adj, alive) > k:
+                failed.add(alive)
+                return None
+            skipped = False
+            for v in sorted(_mask_bits(alive), key=lambda x: (adj[x].bit_count(), x)):
+                if adj[v].bit_count() > k:
+                    break
+                if v < last and not last_neighbours >> v & 1:
+                    # Non-adjacent vertices commute: only the order last, v with last < v is searched
+                    skipped = True
+                    continue
+                rest = search(_eliminate_mask(adj, v), alive & ~(1 << v), v, adj[v])
+                if rest is not None:
+                    return path + [v] + rest
+            failed.add((alive, last) if skipped else alive)
+            return None
+
+        return search(adj, full, -1, 0)
+
+    # From the top: every success improves the ordering, the first failure proves optimality
+    exact = True
+    try:
+        while lower < upper:
+            ordering = decide(upper - 1)
+            if ordering is not None:
+                upper, best = _ordering_width([set(neighbours) for neighbours in adj_sets], ordering), ordering
+            else:
+                lower = upper
+            report()
+    except TimeLimit:
+        exact = False
+    report()
+    status = "exact" if exact else f"time limit, lower bound {lower}"
+    print(f"  ✓ Treewidth {upper} ({status}, {nodes:,} nodes, {time.time() - start_time:.2f}s)")
+    return [verts[i] for i in best], upper, exact
+
+
+def _reduction_rule(adj, v, low):
+    # Name of the safe rule that eliminates v at lower bound low, or None
+    neighbours = adj[v]
+    degree = len(neighbours)
+    if degree == 0:
+        return "islet"
+    if degree == 1:
+        return "twig"
+    if degree == 2:
+        u, w = neighbours
+        if w in adj[u]:
+            return "parallel"
+        return "series" if low >= 2 else None
+    missing = [u for u in neighbours if len(neighbours - adj[u]) > 1]
+    if not missing:
+        return "simplicial"
+    if degree <= low:
+        # All neighbours but one (w) are pairwise adjacent
+        for w in (missing[0], *(neighbours - adj[missing[0]] - {missing[0]})):
+            if all(neighbours - adj[u] <= {u, w} for u in missing if u != w):
+                return "almost_simplicial"
+    return None
+
+def reduce_graph(g:Graph, low=0):
+    """
+    Apply treewidth-preserving reductions to g: islets (degree 0), twigs (degree 1), series
+    (degree 2, neighbours not adjacent, needs low >= 2), parallel (degree 2, neighbours adjacent),
+    simplicial and almost simplicial (degree <= low) vertices are eliminated. low is a lower bound
+    for the treewidth; it grows with the degrees of eliminated vertices and, when nothing applies,
+    with the minimum degree of the remaining graph (which is a minor of g).
+    Returns (reduced, reductions, low): tw(g) = max(low, tw(reduced)), reductions lists
+    (rule, vertex, bag) in elimination order, see expand_ordering and expand_decomposition.
+    g is not modified.
+    """
+    verts, adj = _elimination_graph(g)
+    n = len(g.vertices)
+    alive = set(range(n))
+    reductions = []
+    worklist = list(range(n))
+    queued = set(worklist)
+    while alive:
+        while worklist:
+            v = worklist.pop()
+            queued.discard(v)
+            if v not in alive:
+                continue
+            rule = _reduction_rule(adj, v, low)
+            if rule is None:
+                continue
+            neighbours = adj[v]
+            if rule != "almost_simplicial":
+                low = max(low, len(neighbours))
+            reductions.append((rule, verts[v], {verts[v]} | {verts[u] for u in neighbours}))
+            alive.discard(v)
+            # Eliminate v; the rules of vertices within distance 2 may change
+            _eliminate(adj, v)
+            touched = set(neighbours)
+            for u in neighbours:
+                touched |= adj[u]
+            for u in touched:
+                if u < n and u not in queued:
+                    queued.add(u)
+                    worklist.append(u)
+        min_degree = min((len(adj[v]) for v in alive), default=0)
+        if min_degree <= low:
+            break
+        low = min_degree
+        worklist = sorted(alive)
+        queued = set(worklist)
+    remaining = [verts[i] for i in sorted(alive)]
+    edges = []
+    for i in sorted(alive):
+        for u in adj[i]:
+            if i < u:
+                edges.append({verts[i], verts[u]})
+    print(f"  ✓ Reduced graph: {n} -> {len(remaining)} vertices, {len(reductions)} reductions, lower bound {low}")
+    return Graph(remaining, edges), reductions, low
+
+def expand_ordering(reductions, ordering):
+    """Elimination ordering of the original graph from an ordering of the reduced graph."""
+    return [v for _, v, _ in reductions] + list(ordering)
+
+def expand_decomposition(tree:Tree, reductions):
+    """
+    Add the bags of the reduced vertices to a decomposition Tree of the reduced graph (bags keyed by
+    vertex, as from permutationToTreeDecomposition), last reduction first. The neighbours of a reduced
+    vertex form a clique when it is eliminated, so some bag contains them and the new bag is hung there.
+    """
+    bags_of = {}
+    for bag in tree.I.values():
+        for x in bag.vertices:
+            bags_of.setdefault(x, []).append(bag)
+    for rule, v, vertices in reversed(reductions):
+        bag = Bag(v.label, set(vertices))
+        neighbours = vertices - {v}
+        if neighbours:
+            anchor = next(iter(neighbours))
+            parent = next(b for b in bags_of.get(anchor, []) if neighbours <= b.vertices)
+        else:
+            # Islet (or the last vertex): any bag keeps the tree connected
+            parent = next(iter(tree.I.values()), None)
+        tree.I[v] = bag
+        if parent is not None:
+            tree.add_edge(parent, bag)
+        for x in bag.vertices:
+            bags_of.setdefault(x, []).append(bag)
+    return tree
+
     
 def createBags(graph:Graph, vertexList, bags):
-    if (len(vertexList) == 1):
-        bags[vertexList[0]] = Bag(vertexList[0].label, {vertexList[0]})
-        return bags
-    next_vert = vertexList[0]
-    #print("Vertex 0: " + str(vertexList[0].label))
-    #print(vertexList)
-    #print(vertexList[0])
-    bag = Bag(next_vert.label, {next_vert})
-    for n in graph.get_adj_verts(next_vert):
-        bag.add_vertex(n)
-    bags[next_vert] = bag
-    #print([x.vertices for x in bags])
-    #print(graph_copy.vertices)
-    
-    graph.make_neighborhood_clique(next_vert)
-    graph.remove_vertex(next_vert)
-    
-    #print("V after rem: " + str(graph.vertices))
-    #print("E after rem: " + str(graph.edges))
-    return createBags(graph, vertexList[1:], bags)
+    # Eliminate the vertices in order: each bag is the vertex and its neighbours at that point
+    for next_vert in vertexList[:-1]:
+        bag = Bag(next_vert.label, {next_vert})
+        for n in graph.get_adj_verts(next_vert):
+            bag.add_vertex(n)
+        bags[next_vert] = bag
+        graph.make_neighborhood_clique(next_vert)
+        graph.remove_vertex(next_vert)
+    if vertexList:
+        bags[vertexList[-1]] = Bag(vertexList[-1].label, {vertexList[-1]})
+    return bags
 
 def permutationToTreeDecomposition(graph:Graph, vertexList):
     vertexList_copy = vertexList.copy()
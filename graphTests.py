@@ -0,0 +1,206 @@
+import json
+import os
+import random
+from graphLib import (Graph, Vertex, minimal_degree_ordering, elimination_ordering, ordering_width,
+                      portfolio_ordering, exact_treewidth, reduce_graph, expand_ordering, expand_decomposition,
+                      permutationToTreeDecomposition)
+from graph_loader import load_graph_from_adjacency_list
+
+
+def copy_graph(g):
+    return Graph(g.vertices.copy(), g.edges)
+
+def random_graph(rng, n, p):
+    vertices = [Vertex(f"v{i}") for i in range(n)]
+    edges = [{vertices[i], vertices[j]} for i in range(n) for j in range(i + 1, n) if rng.random() < p]
+    return Graph(vertices, edges)
+
+def saved_graphs():
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "saved_graphs.json")) as f:
+        data = json.load(f)
+    graphs = {}
+    for name, graph_data in data.items():
+        vertices = {label: Vertex(label) for label in graph_data["vertices"]}
+        edges = [{vertices[u], vertices[v]} for u, v in graph_data["edges"]]
+        graphs[name] = Graph(list(vertices.values()), edges)
+    return graphs
+
+def baseline_minimal_degree_ordering(g):
+    # The original quadratic implementation: recompute all degrees, take the first minimum
+    ordering = []
+    h = copy_graph(g)
+    for i in range(1, len(h.vertices)):
+        degrees = h.get_degree_dict()
+        min_deg_vert = min(degrees, key=degrees.get)
+        ordering.append(min_deg_vert)
+        h.make_neighborhood_clique(min_deg_vert)
+        h.remove_vertex(min_deg_vert)
+    return ordering
+
+def subset_treewidth(g):
+    # Independent oracle: TW(S) = min over v in S of max(TW(S - v), |Q(S - v, v)|), where Q(S, v) are
+    # the vertices outside S and v that v reaches through S (Bodlaender et al.). Exponential, small graphs only.
+    index = {v: i for i, v in enumerate(g.vertices)}
+    n = len(index)
+    adj = [0] * n
+    for v, neighbours in g.adjacency.items():
+        for u in neighbours:
+            adj[index[v]] |= 1 << index[u]
+
+    def q(s, v):
+        seen, stack, outside = 1 << v, [v], 0
+        while stack:
+            x = stack.pop()
+            for u in range(n):
+                if adj[x] >> u & 1 and not seen >> u & 1:
+                    seen |= 1 << u
+                    if s >> u & 1:
+                        stack.append(u)
+                    else:
+                        outside |= 1 << u
+        return outside.bit_count()
+
+    tw = {0: -1}
+    for s in sorted(range(1, 1 << n), key=int.bit_count):
+        tw[s] = min(max(tw[s & ~(1 << v)], q(s & ~(1 << v), v)) for v in range(n) if s >> v & 1)
+    return tw[(1 << n) - 1]
+
+def decomposition_errors(g, tree):
+    # Problems with tree as a tree decomposition of g: bags keyed by vertex, edges as {bag, bag} sets.
+    # Disconnected graphs give a forest, which is fine as long as there is no cycle.
+    errors = []
+    bags = list(tree.I.values())
+    component = {id(bag): id(bag) for bag in bags}
+    def find(x):
+        while component[x] != x:
+            x = component[x]
+        return x
+    for e in tree.F:
+        b1, b2 = (find(id(b)) for b in e)
+        if b1 == b2:
+            errors.append("cycle in the tree")
+        component[b1] = b2
+    for e in g.edges:
+        if len(e) == 2 and not any(e <= bag.vertices for bag in bags):
+            errors.append(f"edge {e} not covered")
+    neighbours = {id(bag): [] for bag in bags}
+    for e in tree.F:
+        b1, b2 = tuple(e)
+        neighbours[id(b1)].append(b2)
+        neighbours[id(b2)].append(b1)
+    for v in g.vertices:
+        holding = [bag for bag in bags if v in bag.vertices]
+        if not holding:
+            errors.append(f"vertex {v} in no bag")
+            continue
+        # Running intersection: the bags containing v are connected
+        seen, stack = {id(holding[0])}, [holding[0]]
+        while stack:
+            for other in neighbours[id(stack.pop())]:
+                if v in other.vertices and id(other) not in seen:
+                    seen.add(id(other))
+                    stack.append(other)
+        if len(seen) != len(holding):
+            errors.append(f"bags of {v} are not connected")
+    return errors
+
+def decomposition_width(tree):
+    return max((len(bag.vertices) for bag in tree.I.values()), default=0) - 1
+
+def index_errors(g):
+    # adjacency must describe exactly the non-loop edges, and adj must agree with it
+    from_edges = {v: set() for v in g.vertices}
+    for e in g.edges:
+        if len(e) == 2:
+            v1, v2 = tuple(e)
+            from_edges.setdefault(v1, set()).add(v2)
+            from_edges.setdefault(v2, set()).add(v1)
+    errors = int(g.adjacency != from_edges)
+    errors += sum(g.adj(v1, v2) != (v2 in from_edges.get(v1, ())) for v1 in g.vertices for v2 in g.vertices if v1 != v2)
+    return errors
+
+def check(name, failures):
+    print(f"  {'✓' if failures == 0 else '✗'} {name}: {failures} failures")
+    return failures
+
+
+rng = random.Random(3)
+small_graphs = [random_graph(rng, rng.randint(1, 9), rng.random()) for _ in range(150)]
+named_graphs = saved_graphs()
+named_graphs["graph_160"] = load_graph_from_adjacency_list(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "graph_160.lst"))
+failures = 0
+
+print("Adjacency index:")
+index_failures = 0
+for g in small_graphs[:50]:
+    h = copy_graph(g)
+    index_failures += index_errors(h)
+    for v in list(h.vertices)[:len(h.vertices) // 2]:
+        h.make_neighborhood_clique(v)
+        h.remove_vertex(v)
+        index_failures += index_errors(h)
+failures += check("adjacency matches the edge list through clique-making and vertex removal", index_failures)
+loop = Vertex("loop")
+looped = Graph([loop], [{loop}])
+failures += check("a self loop is an edge but not a neighbour",
+                  int(not looped.adj(loop, loop) or looped.get_degree(loop) != 0 or looped.edges != [{loop}]))
+
+print("\nMinimum degree ordering:")
+failures += check("same ordering as the original implementation on random graphs",
+                  sum(minimal_degree_ordering(g) != baseline_minimal_degree_ordering(g) for g in small_graphs))
+failures += check("same ordering as the original implementation on the saved graphs",
+                  sum(minimal_degree_ordering(g) != baseline_minimal_degree_ordering(g) for g in named_graphs.values()))
+
+print("\nExact treewidth:")
+known_widths = {"K4": 3, "Octahedral Graph": 4}
+for name, width in known_widths.items():
+    ordering, result, exact = exact_treewidth(named_graphs[name])
+    failures += check(f"{name} has treewidth {width}", int(result != width or not exact))
+exact_results = [exact_treewidth(g) for g in small_graphs]
+failures += check("exact_treewidth matches the subset dynamic program",
+                  sum(not exact or width != subset_treewidth(g) for g, (_, width, exact) in zip(small_graphs, exact_results)))
+failures += check("exact_treewidth orderings have the reported width",
+                  sum(ordering_width(g, ordering) != width for g, (ordering, width, _) in zip(small_graphs, exact_results)))
+failures += check("the decomposition of an exact ordering is valid and has that width",
+                  sum(bool(decomposition_errors(g, tree)) or decomposition_width(tree) != width
+                      for g, (ordering, width, _) in zip(small_graphs, exact_results)
+                      for tree in [permutationToTreeDecomposition(copy_graph(g), ordering)]))
+
+print("\nHeuristic orderings:")
+for heuristic in ("min_degree", "min_fill", "weighted_min_fill"):
+    failures += check(f"{heuristic} orderings are complete and never beat the exact width",
+                      sum(sorted(map(id, elimination_ordering(g, heuristic, seed))) != sorted(map(id, g.vertices))
+                          or ordering_width(g, elimination_ordering(g, heuristic, seed)) < width
+                          for g, (_, width, _) in zip(small_graphs, exact_results) for seed in (None, 1)))
+
+print("\nReductions:")
+reduction_failures = 0
+for g, (_, width, _) in zip(small_graphs, exact_results):
+    reduced, reductions, low = reduce_graph(g)
+    reduced_ordering, reduced_width, _ = exact_treewidth(reduced)
+    if max(low, reduced_width) != width:
+        reduction_failures += 1
+        continue
+    # Decomposition of the reduced graph, expanded by the bags of the reduced vertices
+    tree = expand_decomposition(permutationToTreeDecomposition(copy_graph(reduced), reduced_ordering), reductions)
+    if decomposition_errors(g, tree) or decomposition_width(tree) != width:
+        reduction_failures += 1
+        continue
+    # The expanded ordering eliminates every vertex and keeps the width
+    ordering = expand_ordering(reductions, reduced_ordering)
+    if len(ordering) != len(g.vertices) or ordering_width(g, ordering) != width:
+        reduction_failures += 1
+failures += check("reduce_graph keeps tw = max(low, tw(reduced)) and expands to a valid decomposition", reduction_failures)
+
+if __name__ == "__main__":
+    print("\nPortfolio:")
+    portfolio_failures = 0
+    for g, (_, width, _) in list(zip(small_graphs, exact_results))[:30]:
+        ordering, result = portfolio_ordering(g, time_budget=5.0, workers=2, max_runs=6)
+        if sorted(map(id, ordering)) != sorted(map(id, g.vertices)) or ordering_width(g, ordering) != result or result < width:
+            portfolio_failures += 1
+    failures += check("portfolio_ordering with workers=2 returns complete orderings of the reported width", portfolio_failures)
+
+assert failures == 0, f"{failures} graph check failures"
+print("  ✓ all graph checks passed")
@@ -0,0 +1,352 @@
+"""
+Symbolic (MONA-style) variant of TreeAutomaton for symbols (base, b1, ..., bk).
+Transitions are keyed by base symbol and child states like TreeAutomaton.transitions:
+    leaf base -> bdd, unary base -> {q: bdd}, binary base -> {q1: {q2: bdd}}
+where bdd is a node of a shared BDD manager over the k track bits whose leaves are
+frozensets of target states (the empty set means there is no transition).
+Projection of the last track is existential quantification of the deepest BDD variable.
+"""
+from collections import deque
+from itertools import product
+import time
+from bdd import BDD
+from treeAutomata import TreeAutomaton
+from treeDecomp import RootedTree
+
+EMPTY = frozenset()
+
+# Leaf operations, module level so the BDD operation cache sees the same function objects
+def _union(values1, values2):
+    return values1 | values2
+
+def _pairs(values1, values2):
+    return frozenset((s1, s2) for s1 in values1 for s2 in values2)
+
+def _pairs_partial(values1, values2):
+    # Union keeps a run of one side alone, the missing component is None and never final
+    if not values1 and not values2:
+        return EMPTY
+    return _pairs(values1 or (None,), values2 or (None,))
+
+def _singleton(values):
+    return frozenset([values])
+
+def _as_set(result):
+    if result is None:
+        return EMPTY
+    return frozenset(result) if isinstance(result, list) else frozenset([result])
+
+def _as_result(values):
+    # Back to the TreeAutomaton encoding: single state, list of states or []
+    if len(values) == 1:
+        return next(iter(values))
+    return list(values)
+
+
+class SymbolicTreeAutomaton:
+    def __init__(self, bdd, k, base_symbols, plain_symbols, states, final_states, transitions):
+        self.bdd = bdd
+        self.k = k
+        # base symbol -> arity; plain symbols carry no track bits (e.g. "//" for Courcelle)
+        self.base_symbols = base_symbols
+        self.plain_symbols = plain_symbols
+        self.states = states
+        self.final_states = final_states
+        self.transitions = transitions
+
+    @classmethod
+    def from_tree_automaton(cls, automaton, bdd=None):
+        """
+        Group the explicit symbols (base, b1, ..., bk) of a TreeAutomaton by base symbol.
+        k is taken from the tuple symbols, symbols that are no tuples become plain symbols.
+        """
+        bdd = bdd if bdd is not None else BDD()
+        k = max((len(char) - 1 for char in automaton.input_symbols if isinstance(char, tuple)), default=0)
+        base_symbols = {}
+        plain_symbols = set()
+        tables = {}
+        for char, arity in automaton.input_symbols.items():
+            if isinstance(char, tuple) and k > 0:
+                base, bits = char[0], char[1:]
+            else:
+                base, bits = char, ()
+                plain_symbols.add(base)
+            base_symbols[base] = arity
+            tables.setdefault(base, []).append((bits, automaton.transitions.get(char)))
+
+        transitions = {}
+        for base, entries in tables.items():
+            arity = base_symbols[base]
+            width = 0 if base in plain_symbols else k
+            if arity == 0:
+                transitions[base] = bdd.from_table({bits: _as_set(result) for bits, result in entries}, width, EMPTY)
+            elif arity == 1:
+                per_state = {}
+                for bits, table in entries:
+                    for state, result in (table or {}).items():
+                        per_state.setdefault(state, {})[bits] = _as_set(result)
+                transitions[base] = {state: bdd.from_table(table, width, EMPTY) for state, table in per_state.items()}
+            elif arity == 2:
+                per_pair = {}
+                for bits, table in entries:
+                    for state1, row in (table or {}).items():
+                        for state2, result in row.items():
+                            per_pair.setdefault((state1, state2), {})[bits] = _as_set(result)
+                transitions[base] = {}
+                for (state1, state2), table in per_pair.items():
+                    transitions[base].setdefault(state1, {})[state2] = bdd.from_table(table, width, EMPTY)
+        return cls(bdd, k, base_symbols, plain_symbols, set(automaton.states), set(automaton.final_states), transitions)
+
+    def _chars(self, base):
+        # Explicit symbols of a base symbol together with their track bits
+        if base in self.plain_symbols or self.k == 0:
+            return [(base, ())]
+        return [((base,) + bits, bits) for bits in product((0, 1), repeat=self.k)]
+
+    @property
+    def input_symbols(self):
+        return {char: arity for base, arity in self.base_symbols.items() for char, _ in self._chars(base)}
+
+    def to_tree_automaton(self):
+        """Enumerate all 2^k track assignments, giving the explicit TreeAutomaton."""
+        transitions = {}
+        for base, arity in self.base_symbols.items():
+            table = self.transitions.get(base)
+            for char, bits in self._chars(base):
+                if arity == 0:
+                    transitions[char] = _as_result(self.bdd.evaluate(table, bits))
+                elif arity == 1:
+                    transitions[char] = {}
+                    for state, u in table.items():
+                        values = self.bdd.evaluate(u, bits)
+                        if values:
+                            transitions[char][state] = _as_result(values)
+                elif arity == 2:
+                    transitions[char] = {}
+                    for state1, row in table.items():
+                        for state2, u in row.items():
+                            values = self.bdd.evaluate(u, bits)
+                            if values:
+                                transitions[char].setdefault(state1, {})[state2] = _as_result(values)
+        return TreeAutomaton(
+            states=set(self.states),
+            input_symbols=self.input_symbols,
+            final_states=set(self.final_states),
+            transitions=transitions
+        )
+
+    def _split(self, label):
+        if isinstance(label, tuple):
+            return label[0], label[1:]
+        return label, ()
+
+    # Nodes are evaluated in the tree's cached postorder, see RootedTree.postorder
+    def nta_run(self, tree: RootedTree):
+        evaluate = self.bdd.evaluate
+        order, labels, label_ids, child_offsets, child_index = tree.postorder()
+        state_dict = [EMPTY] * len(order)
+        for i in range(len(order)):
+            label = labels[label_ids[i]]
+            first = child_offsets[i]
+            base, bits = self._split(label)
+            arity = self.base_symbols.get(base)
+            if base not in self.plain_symbols and len(bits) != self.k:
+                # Label does not carry exactly k track bits
+                arity = None
+            table = self.transitions.get(base)
+            if arity == 0:
+                states = evaluate(table, bits)
+            elif arity == 1:
+                states = set()
+                for state in state_dict[child_index[first]]:
+                    if state in table:
+                        states |= evaluate(table[state], bits)
+            elif arity == 2:
+                states = set()
+                for state1 in state_dict[child_index[first]]:
+                    row = table.get(state1)
+                    if row is None:
+                        continue
+                    for state2 in state_dict[child_index[first + 1]]:
+                        if state2 in row:
+                            states |= evaluate(row[state2], bits)
+            else:
+                print(label, " not in input symbols!")
+                states = EMPTY
+            state_dict[i] = states
+        return any(state in self.final_states for state in state_dict[-1])
+
+    def _symbols_by_arity(self):
+        leaf_symbols = [base for base, arity in self.base_symbols.items() if arity == 0]
+        unary_symbols = [base for base, arity in self.base_symbols.items() if arity == 1]
+        binary_symbols = [base for base, arity in self.base_symbols.items() if arity == 2]
+        return leaf_symbols, unary_symbols, binary_symbols
+
+    def union(self, other):
+        print("Constructing symbolic union automaton")
+        return self._product(other, lambda final1, final2: final1 or final2, keep_partial=True)
+
+    def cut(self, other):
+        print("Constructing symbolic cut automaton...")
+        return self._product(other, lambda final1, final2: final1 and final2)
+
+    def _product(self, other, is_final, keep_partial=False):
+        """
+        Reachable product like TreeAutomaton._product_reachable, target BDDs are combined pointwise.
+        With keep_partial a side without a transition continues as None (needed for union).
+        """
+        if other.bdd is not self.bdd:
+            raise ValueError("Symbolic automata must share one BDD manager")
+        if self.k != other.k or self.base_symbols != other.base_symbols:
+            raise ValueError(f"Product of symbolic automata over different alphabets: "
+                             f"k={self.k} {self.base_symbols} vs k={other.k} {other.base_symbols}")
+        bdd = self.bdd
+        no_transition = bdd.leaf(EMPTY)
+        combine = _pairs_partial if keep_partial else _pairs
+        leaf_symbols, unary_symbols, binary_symbols = self._symbols_by_arity()
+
+        new_states = set()
+        new_transitions = {}
+        queue = deque()
+
+        def discover(u):
+            for values in bdd.leaves(u):
+                for state in values:
+                    if state not in new_states:
+                        new_states.add(state)
+                        queue.append(state)
+
+        for base in leaf_symbols:
+            u = bdd.apply(combine, self.transitions.get(base, no_transition), other.transitions.get(base, no_transition))
+            new_transitions[base] = u
+            discover(u)
+        for base in unary_symbols + binary_symbols:
+            new_transitions[base] = {}
+
+        processed_states = []
+        while queue:
+            current_state = queue.popleft()
+            s1, s2 = current_state
+            for base in unary_symbols:
+                u1 = self.transitions[base].get(s1)
+                u2 = other.transitions[base].get(s2)
+                if u1 is None and u2 is None or not keep_partial and (u1 is None or u2 is None):
+                    continue
+                u = bdd.apply(combine, no_transition if u1 is None else u1, no_transition if u2 is None else u2)
+                if u != no_transition:
+                    new_transitions[base][current_state] = u
+                    discover(u)
+
+            # Semi-naive: the current pair is combined with every processed pair (and itself)
+            processed_states.append(current_state)
+            for base in binary_symbols:
+                trans1 = self.transitions[base]
+                trans2 = other.transitions[base]
+                for other_state in processed_states:
+                    pairs = [(current_state, other_state)] if other_state == current_state else [(current_state, other_state), (other_state, current_state)]
+                    for (l1, l2), (r1, r2) in pairs:
+                        u1 = trans1.get(l1, {}).get(r1)
+                        u2 = trans2.get(l2, {}).get(r2)
+                        if u1 is None and u2 is None or not keep_partial and (u1 is None or u2 is None):
+                            continue
+                        u = bdd.apply(combine, no_transition if u1 is None else u1, no_transition if u2 is None else u2)
+                        if u != no_transition:
+                            new_transitions[base].setdefault((l1, l2), {})[(r1, r2)] = u
+                            discover(u)
+
+        new_final_states = {(s1, s2) for (s1, s2) in new_states if is_final(s1 in self.final_states, s2 in other.final_states)}
+        # With keep_partial either side of a pair may also be None
+        bound = (len(self.states) + 1) * (len(other.states) + 1) if keep_partial else len(self.states) * len(other.states)
+        print(f"  ✓ Reachable product states: {len(new_states):,} of {bound:,} | BDD nodes: {bdd.size():,}")
+        return SymbolicTreeAutomaton(bdd, self.k, self.base_symbols, self.plain_symbols | other.plain_symbols,
+                                     new_states, new_final_states, new_transitions)
+
+    def project(self):
+        """Remove the last track: every target BDD is existentially quantified over bit k."""
+        if self.k == 0:
+            raise ValueError("No track left to project away")
+        bdd = self.bdd
+        var = self.k - 1
+
+        def quantify(u):
+            return bdd.exists(u, var, _union)
+
+        new_transitions = {}
+        for base, arity in self.base_symbols.items():
+            table = self.transitions[base]
+            if base in self.plain_symbols:
+                new_transitions[base] = table
+            elif arity == 0:
+                new_transitions[base] = quantify(table)
+            elif arity == 1:
+                new_transitions[base] = {state: quantify(u) for state, u in table.items()}
+            elif arity == 2:
+                new_transitions[base] = {state1: {state2: quantify(u) for state2, u in row.items()} for state1, row in table.items()}
+        print(f"Projected away track {self.k} symbolically | BDD nodes: {bdd.size():,}")
+        return SymbolicTreeAutomaton(bdd, self.k - 1, self.base_symbols, self.plain_symbols,
+                                     self.states, self.final_states, new_transitions)
+
+    def determinize_reachable(self):
+        """
+        Subset construction over reachable subsets (semi-naive like TreeAutomaton.determinize_reachable).
+        The successor of a subset is the pointwise union of the member BDDs, whose leaves are the
+        successor subsets for the respective track bits; DTA states are frozensets of NTA states.
+        """
+        start_time = time.time()
+        bdd = self.bdd
+        no_transition = bdd.leaf(EMPTY)
+        leaf_symbols, unary_symbols, binary_symbols = self._symbols_by_arity()
+
+        reachable_states = set()
+        new_transitions = {}
+        queue = deque()
+
+        def discover(u):
+            for values in bdd.leaves(u):
+                for subset in values:
+                    if subset not in reachable_states:
+                        reachable_states.add(subset)
+                        queue.append(subset)
+
+        def subset_target(nodes):
+            u = no_transition
+            for node in nodes:
+                u = bdd.apply(_union, u, node)
+            return bdd.map_leaves(u, _singleton)
+
+        for base in leaf_symbols:
+            u = bdd.map_leaves(self.transitions[base], _singleton)
+            new_transitions[base] = u
+            discover(u)
+        for base in unary_symbols + binary_symbols:
+            new_transitions[base] = {}
+
+        processed_states = []
+        while queue:
+            current_state = queue.popleft()
+            for base in unary_symbols:
+                table = self.transitions[base]
+                u = subset_target(table[state] for state in current_state if state in table)
+                new_transitions[base][current_state] = u
+                discover(u)
+
+            processed_states.append(current_state)
+            for base in binary_symbols:
+                table = self.transitions[base]
+                symbol_transitions = new_transitions[base]
+                for other in processed_states:
+                    pairs = [(current_state, other)] if other == current_state else [(current_state, other), (other, current_state)]
+                    for left, right in pairs:
+                        u = subset_target(table[s1][s2] for s1 in left if s1 in table for s2 in right if s2 in table[s1])
+                        symbol_transitions.setdefault(left, {})[right] = u
+                        discover(u)
+
+        new_final_states = {state for state in reachable_states if any(s in self.final_states for s in state)}
+        print(f"  ✓ Symbolic determinization: {len(reachable_states):,} DTA states | BDD nodes: {bdd.size():,} | Time: {time.time() - start_time:.2f}s")
+        return SymbolicTreeAutomaton(bdd, self.k, self.base_symbols, self.plain_symbols,
+                                     reachable_states, new_final_states, new_transitions)
+
+    def complement(self):
+        dta = self.determinize_reachable()
+        return SymbolicTreeAutomaton(dta.bdd, dta.k, dta.base_symbols, dta.plain_symbols,
+                                     dta.states, dta.states - dta.final_states, dta.transitions)
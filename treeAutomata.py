@@ -1,62 +1,168 @@
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+import heapq
 from collections import deque
 from treeDecomp import Node, RootedTree
 from StringCase.utils import gen_courcelle_alphabet, gen_new_alphabet, powerset
 import random
 import time
 
+def _iter_bits(mask):
+    # Positions of the set bits of mask, lowest first
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+def _state_key(state):
+    # Sort key that does not depend on the hash seed: repr of a frozenset follows its
+    # iteration order, so sets are keyed by their sorted member keys instead
+    if isinstance(state, (frozenset, set)):
+        return ("set", tuple(sorted(_state_key(member) for member in state)))
+    if isinstance(state, tuple):
+        return ("tuple", tuple(_state_key(member) for member in state))
+    if isinstance(state, (str, int, float)):
+        return (type(state).__name__, state)
+    return (type(state).__name__, repr(state))
+
+def _binary_rows(masks, row_cache, lefts, rights):
+    # Successor masks of every left subset with every right subset for one binary symbol,
+    # see _determinize_reachable_bitset for the (s1, right) row memo
+    rows = []
+    for left in lefts:
+        left_rows = [(s1, masks[s1]) for s1 in _iter_bits(left) if masks.get(s1)]
+        results = []
+        for right in rights:
+            result = 0
+            for s1, row in left_rows:
+                row_result = row_cache.get((s1, right))
+                if row_result is None:
+                    row_result = 0
+                    for s2 in _iter_bits(right):
+                        row_result |= row.get(s2, 0)
+                    row_cache[(s1, right)] = row_result
+                result |= row_result
+            results.append(result)
+        rows.append(results)
+    return rows
+
+# Per-process tables of the determinization workers, set by _init_determinize_worker
+_worker_binary_masks = None
+_worker_row_caches = None
+
+def _init_determinize_worker(binary_masks):
+    global _worker_binary_masks, _worker_row_caches
+    _worker_binary_masks = binary_masks
+    _worker_row_caches = {symbol: {} for symbol in binary_masks}
+
+def _binary_rows_task(task):
+    symbol, lefts, rights = task
+    return _binary_rows(_worker_binary_masks[symbol], _worker_row_caches[symbol], lefts, rights)
+
+def _product_successor(next1, next2, keep_partial=False):
+    # Product of two transition results (state, list of states or None).
+    # With keep_partial (union) a side without a state continues as None, like the
+    # keep_partial product of StringCase.stringAutomata; otherwise the pair has no successor.
+    list1 = [] if next1 is None else next1 if isinstance(next1, list) else [next1]
+    list2 = [] if next2 is None else next2 if isinstance(next2, list) else [next2]
+    if not list1 and not list2:
+        return None
+    if not list1 or not list2:
+        if not keep_partial:
+            return None
+        list1 = list1 or [None]
+        list2 = list2 or [None]
+    combined = [(ns1, ns2) for ns1 in list1 for ns2 in list2]
+    return combined if len(combined) > 1 else combined[0]
+
+def _product_rows(trans1, trans2, lefts, rights, keep_partial=False):
+    # Product transitions of every left pair with every right pair for one binary symbol
+    rows = []
+    for l1, l2 in lefts:
+        row1 = trans1.get(l1, {})
+        row2 = trans2.get(l2, {})
+        rows.append([_product_successor(row1.get(r1), row2.get(r2), keep_partial) for r1, r2 in rights])
+    return rows
+
+# Per-process tables of the product workers, set by _init_product_worker
+_worker_product_tables = None
+_worker_keep_partial = False
+
+def _init_product_worker(product_tables, keep_partial=False):
+    global _worker_product_tables, _worker_keep_partial
+    _worker_product_tables = product_tables
+    _worker_keep_partial = keep_partial
+
+def _product_rows_task(task):
+    symbol, lefts, rights = task
+    trans1, trans2 = _worker_product_tables[symbol]
+    return _product_rows(trans1, trans2, lefts, rights, _worker_keep_partial)
+
 class TreeAutomaton:    
     def __init__(self, states, input_symbols, final_states, transitions):
         self.states = states
         self.input_symbols = input_symbols
         self.transitions = transitions
         self.final_states = final_states
+        # Symbol -> class representative, see symbol_classes
+        self._symbol_class = None
+        # Set on results of subset constructions: deterministic and complete, complement can flip final states
+        self._complete_dta = False
     
-    # Tree must be ordered from leaves to root
+    # Nodes are evaluated in the tree's cached postorder, see RootedTree.postorder
     def nta_run(self, tree: RootedTree):
-        state_dict = {}  # Maps each node to a list of all possible states
+        order, labels, label_ids, child_offsets, child_index = tree.postorder()
+        state_dict = [None] * len(order)  # Maps each node position to a list of all possible states
         #print(self.transitions)
-        for node in tree.nodes:
-            if node.label in self.input_symbols.keys():
-                if self.input_symbols[node.label] == 0:
+        for i in range(len(order)):
+            label = labels[label_ids[i]]
+            first = child_offsets[i]
+            if label in self.input_symbols:
+                if self.input_symbols[label] == 0:
                     # Leaf node: collect all possible states
-                    state = self.transitions[node.label]
+                    state = self.transitions[label]
                     if isinstance(state, list):
-                        state_dict[node] = state  # Already a list of states
+                        state_dict[i] = state  # Already a list of states (empty after trim)
                     else:
-                        state_dict[node] = [state]  # Wrap single state in a list
-                elif self.input_symbols[node.label] == 1:
+                        state_dict[i] = [state]  # Wrap single state in a list
+                elif self.input_symbols[label] == 1:
                     # Unary node: compute transitions for all child states
-                    child_states_list = state_dict[node.children[0]]
+                    child_states_list = state_dict[child_index[first]]
                     possible_states = []
                     for child_state in child_states_list:
-                        result = self.transitions[node.label][child_state]
+                        # Missing transitions (e.g. removed by trim) contribute no state
+                        result = self.transitions[label].get(child_state)
+                        if result is None:
+                            continue
                         if isinstance(result, list):
                             possible_states.extend(result)
                         else:
                             possible_states.append(result)
                     # Remove duplicates while preserving all unique states
-                    state_dict[node] = list(set(possible_states))
-                elif self.input_symbols[node.label] == 2:
+                    state_dict[i] = list(set(possible_states))
+                elif self.input_symbols[label] == 2:
                     # Binary node: compute transitions for all combinations of child states
-                    child_states_list_0 = state_dict[node.children[0]]
-                    child_states_list_1 = state_dict[node.children[1]]
+                    child_states_list_0 = state_dict[child_index[first]]
+                    child_states_list_1 = state_dict[child_index[first + 1]]
                     possible_states = []
                     for child_state_0 in child_states_list_0:
                         for child_state_1 in child_states_list_1:
-                            result = self.transitions[node.label][child_state_0][child_state_1]
+                            result = self.transitions[label].get(child_state_0, {}).get(child_state_1)
+                            if result is None:
+                                continue
                             if isinstance(result, list):
                                 possible_states.extend(result)
                             else:
                                 possible_states.append(result)
                     # Remove duplicates while preserving all unique states
-                    state_dict[node] = list(set(possible_states))
+                    state_dict[i] = list(set(possible_states))
                 else:
                     # Handle higher arity nodes (generalized)
                     import itertools
-                    child_states_lists = [state_dict[child] for child in node.children]
+                    child_states_lists = [state_dict[child] for child in child_index[first:child_offsets[i + 1]]]
                     possible_states = []
                     for child_state_combination in itertools.product(*child_states_lists):
-                        state = self.transitions[node.label]
+                        state = self.transitions[label]
                         for child_state in child_state_combination[:-1]:
                             state = state[child_state]
                         result = state[child_state_combination[-1]]
@@ -65,43 +171,138 @@ class TreeAutomaton:
                         else:
                             possible_states.append(result)
                     # Remove duplicates while preserving all unique states
-                    state_dict[node] = list(set(possible_states))
+                    state_dict[i] = list(set(possible_states))
             else:
-                print(node.label, " not in input symbols!")
-                state_dict[node] = []
+                print(label, " not in input symbols!")
+                state_dict[i] = []
         
-        #print("Final state dict: ", [{x.label: state_dict[x]} for x in state_dict.keys()])
-        #print("Possible states at root: ", state_dict[tree.root])
+        #print("Possible states at root: ", state_dict[-1])
         
-        # Check if any of the possible states at the root is an accepting state
-        return any(state in self.final_states for state in state_dict[tree.root])
+        # Check if any of the possible states at the root is an accepting state (root is last)
+        return any(state in self.final_states for state in state_dict[-1])
+
+    @staticmethod
+    def _tree_dag(trees):
+        """
+        Hash-cons the trees into one DAG: every distinct subterm (label, child ids) gets one id.
+        Returns (labels, children, roots) with labels[i] and the child id tuple children[i] of
+        subterm i, children before parents, and the id of every tree's root.
+        """
+        ids = {}
+        labels = []
+        children = []
+        roots = []
+        for tree in trees:
+            order, tree_labels, label_ids, child_offsets, child_index = tree.postorder()
+            node_id = []
+            for i in range(len(order)):
+                key = (tree_labels[label_ids[i]], tuple(node_id[child] for child in child_index[child_offsets[i]:child_offsets[i + 1]]))
+                subterm = ids.get(key)
+                if subterm is None:
+                    subterm = len(labels)
+                    ids[key] = subterm
+                    labels.append(key[0])
+                    children.append(key[1])
+                node_id.append(subterm)
+            roots.append(node_id[-1])
+        return labels, children, roots
+
+    def nta_run_batch(self, trees):
+        """
+        nta_run for many trees at once. The trees are hash-consed into one DAG (see _tree_dag),
+        so every distinct subterm is evaluated once, and transitions are memoized by
+        (label, child state sets). Returns one bool per tree.
+        """
+        start_time = time.time()
+        labels, children, roots = TreeAutomaton._tree_dag(trees)
+        total_nodes = sum(len(tree.postorder()[0]) for tree in trees)
+
+        def as_list(result):
+            if result is None:
+                return []
+            return result if isinstance(result, list) else [result]
+
+        step_cache = {}
+        subterm_states = []
+        for label, child_ids in zip(labels, children):
+            child_states = tuple(subterm_states[child] for child in child_ids)
+            key = (label, child_states)
+            states = step_cache.get(key)
+            if states is None:
+                arity = self.input_symbols.get(label)
+                trans = self.transitions.get(label)
+                possible_states = set()
+                if arity != len(child_ids) or trans is None:
+                    # Unknown label or missing table: no state
+                    pass
+                elif arity == 0:
+                    possible_states.update(as_list(trans))
+                elif arity == 1:
+                    for child_state in child_states[0]:
+                        possible_states.update(as_list(trans.get(child_state)))
+                elif arity == 2:
+                    for child_state_0 in child_states[0]:
+                        row = trans.get(child_state_0)
+                        if row:
+                            for child_state_1 in child_states[1]:
+                                possible_states.update(as_list(row.get(child_state_1)))
+                else:
+                    import itertools
+                    for child_state_combination in itertools.product(*child_states):
+                        result = trans
+                        for child_state in child_state_combination:
+                            result = result.get(child_state) if isinstance(result, dict) else None
+                        possible_states.update(as_list(result))
+                states = frozenset(possible_states)
+                step_cache[key] = states
+            subterm_states.append(states)
+
+        accepting_cache = {}
+        results = []
+        for root in roots:
+            states = subterm_states[root]
+            accepted = accepting_cache.get(states)
+            if accepted is None:
+                accepted = any(state in self.final_states for state in states)
+                accepting_cache[states] = accepted
+            results.append(accepted)
+        print(f"  ✓ Batch run: {len(trees):,} trees, {total_nodes:,} nodes, {len(labels):,} distinct subterms, {len(step_cache):,} distinct steps ({time.time() - start_time:.2f}s)")
+        return results
 
 
     def run(self, tree: RootedTree):
-        state_dict = {}
+        order, labels, label_ids, child_offsets, child_index = tree.postorder()
+        state_dict = [None] * len(order)
         #print(self.transitions)
-        for node in tree.nodes:
-            if node.label in self.input_symbols.keys():
-                state = self.transitions[node.label]
-                if self.input_symbols[node.label] == 0:
+        for i in range(len(order)):
+            label = labels[label_ids[i]]
+            first = child_offsets[i]
+            if label in self.input_symbols:
+                state = self.transitions[label]
+                if self.input_symbols[label] == 0:
                     # Leaf node: state is either a single state or a tuple from union/cut
+                    if state == []:
+                        # No state left for this leaf (e.g. after trim)
+                        return False
                     if isinstance(state, list):
                         print("Nondeterministic transition found, picking random option.")
-                        state_dict[node] = random.choice(state)
+                        state_dict[i] = random.choice(state)
                     else:
-                        state_dict[node] = state
+                        state_dict[i] = state
 
-                elif self.input_symbols[node.label] == 1:
-                    child_state = state_dict[node.children[0]]
+                elif self.input_symbols[label] == 1:
+                    child_state = state_dict[child_index[first]]
                     if isinstance(child_state, list):
                         print("Nondeterministic child states found, picking random option.")
                         child_state = random.choice(child_state)    
-                    state_dict[node] = state[child_state]
+                    if child_state not in state:
+                        return False
+                    state_dict[i] = state[child_state]
 
-                elif self.input_symbols[node.label] == 2:
+                elif self.input_symbols[label] == 2:
                     #print("Children : ", node.children)
-                    child_state_0 = state_dict[node.children[0]]
-                    child_state_1 = state_dict[node.children[1]]
+                    child_state_0 = state_dict[child_index[first]]
+                    child_state_1 = state_dict[child_index[first + 1]]
                     #print("Child states: ", child_state_0, child_state_1)
                     if isinstance(child_state_0, list):
                         print("Nondeterministic child states found, picking random option.")
@@ -109,13 +310,15 @@ class TreeAutomaton:
                     if isinstance(child_state_1, list):
                         print("Nondeterministic child states found, picking random option.")
                         child_state_1 = random.choice(child_state_1)
-                    state_dict[node] = state[child_state_0][child_state_1]
+                    if child_state_1 not in state.get(child_state_0, {}):
+                        return False
+                    state_dict[i] = state[child_state_0][child_state_1]
                     
                 else:
                     print("Higher arity nodes not implemented yet")
         
         # Check if any of the possible states at the root is an accepting state
-        root_states = state_dict[tree.root]
+        root_states = state_dict[-1]
         if isinstance(root_states, list):
             return any(state in self.final_states for state in root_states)
         else:
@@ -283,11 +486,21 @@ class TreeAutomaton:
             transitions=new_transitions
         )
 
-    def determinize_reachable(self):
+    def determinize_reachable(self, bitset=False, workers=None):
         """
         Convert NTA to DTA using powerset construction.
         Only reachable transitions/states are included here.
+
+        Args:
+            bitset: If True, DTA states are ints (bitmasks over the NTA states)
+                    instead of frozensets, see _determinize_reachable_bitset
+            workers: If given, the binary transitions are computed by this many worker
+                     processes, see _determinize_reachable_parallel (implies bitset)
         """
+        if workers is not None:
+            return self._determinize_reachable_parallel(workers)
+        if bitset:
+            return self._determinize_reachable_bitset()
         start_time = time.time()
         
         print("\n" + "="*70)
@@ -317,8 +530,9 @@ class TreeAutomaton:
                 new_state = frozenset([leaf_states])
             
             new_transitions[symbol] = new_state
-            reachable_states.add(new_state)
-            queue.append(new_state)
+            if new_state not in reachable_states:
+                reachable_states.add(new_state)
+                queue.append(new_state)
             #print(f"  [{idx+1}/{len(leaf_symbols)}] Symbol '{symbol}' → state {new_state}")
         
         step1_time = time.time() - step1_start
@@ -331,14 +545,20 @@ class TreeAutomaton:
         processed_count = 0
         last_update = time.time()
         last_state_count = len(reachable_states)
+        processed_states = []
+        pairs_visited = 0
+        pairs_computed = 0
+        full_rescan_pairs = 0
         
-        unary_symbols = [symbol for symbol, arity in self.input_symbols.items() if arity == 1]
-        binary_symbols = [symbol for symbol, arity in self.input_symbols.items() if arity == 2]
+        # Only one symbol per class of identical tables is processed (see symbol_classes)
+        symbol_class = self.symbol_classes()
+        unary_symbols = [symbol for symbol, arity in self.input_symbols.items() if arity == 1 and symbol_class[symbol] == symbol]
+        binary_symbols = [symbol for symbol, arity in self.input_symbols.items() if arity == 2 and symbol_class[symbol] == symbol]
         
         #print("Binary symbols: ", binary_symbols)
         #print("Unary symbols: ", unary_symbols)
 
-        print(f"  Processing {len(unary_symbols)} unary and {len(binary_symbols)} binary symbols")
+        print(f"  Processing {len(unary_symbols)} unary and {len(binary_symbols)} binary symbol classes")
         
         while queue:
             current_state = queue.popleft()
@@ -376,37 +596,49 @@ class TreeAutomaton:
                         reachable_states.add(new_state)
                         queue.append(new_state)
             
-            # Process binary transitions
+            # Process binary transitions (semi-naive): the current state is combined with
+            # every state processed so far, itself included, in both argument positions.
+            # Pairs of two older states were already computed when the later one was popped.
+            processed_states.append(current_state)
+            full_rescan_pairs += len(reachable_states) ** 2 * len(binary_symbols)
             for symbol in binary_symbols:
                 if symbol not in new_transitions:
                     new_transitions[symbol] = {}
-                
-                # Only build transitions for combinations of reachable states
-                for left in list(reachable_states):  # Use list to avoid modification during iteration
-                    if left not in new_transitions[symbol]:
-                        new_transitions[symbol][left] = {}
-                    
-                    for right in list(reachable_states):
-                        if right not in new_transitions[symbol][left]:
-                            resulting_states = set()
-                            for s1 in left:
-                                for s2 in right:
-                                    if s1 in self.transitions[symbol] and s2 in self.transitions[symbol][s1]:
-                                        result = self.transitions[symbol][s1][s2]
-                                        if isinstance(result, list):
-                                            resulting_states.update(result)
-                                        else:
-                                            resulting_states.add(result)
-                            
-                            new_state = frozenset(resulting_states)
-                            new_transitions[symbol][left][right] = new_state
-                            
-                            if new_state not in reachable_states:
-                                reachable_states.add(new_state)
-                                queue.append(new_state)
+                symbol_transitions = new_transitions[symbol]
+                symbol_table = self.transitions[symbol]
+
+                for other in processed_states:
+                    pairs = [(current_state, other)] if other == current_state else [(current_state, other), (other, current_state)]
+                    for left, right in pairs:
+                        pairs_visited += 1
+                        row = symbol_transitions.setdefault(left, {})
+                        if right in row:
+                            continue
+                        resulting_states = set()
+                        for s1 in left:
+                            if s1 not in symbol_table:
+                                continue
+                            s1_row = symbol_table[s1]
+                            for s2 in right:
+                                if s2 in s1_row:
+                                    result = s1_row[s2]
+                                    if isinstance(result, list):
+                                        resulting_states.update(result)
+                                    else:
+                                        resulting_states.add(result)
+
+                        new_state = frozenset(resulting_states)
+                        row[right] = new_state
+                        pairs_computed += 1
+
+                        if new_state not in reachable_states:
+                            reachable_states.add(new_state)
+                            queue.append(new_state)
         
         step2_time = time.time() - step2_start
-        print(f"  ✓ BFS complete: {processed_count:,} states processed in {step2_time:.2f}s\n")
+        print(f"  ✓ BFS complete: {processed_count:,} states processed in {step2_time:.2f}s")
+        print(f"  ✓ Binary pairs visited: {pairs_visited:,} | computed: {pairs_computed:,} | full rescan would visit: {full_rescan_pairs:,}\n")
+        self._share_class_tables(new_transitions, symbol_class)
         
         # Step 3: Identify final states
         print("Step 3: Identifying final states...")
@@ -431,347 +663,1416 @@ class TreeAutomaton:
         print(f"{'States avoided by reachability':<40} {total_powerset_states - len(reachable_states):>20,}")
         print(f"{'Reduction percentage':<40} {reduction_percent:>19.2f}%")
         print(f"{'Final states':<40} {len(new_final_states):>20,}")
+        print(f"{'Binary pairs visited':<40} {pairs_visited:>20,}")
+        print(f"{'Binary pairs computed':<40} {pairs_computed:>20,}")
         print(f"{'Input symbols':<40} {len(self.input_symbols):>20}")
         print(f"{'Total processing time':<40} {total_time:>19.2f}s")
         print("="*70 + "\n")
         
-        return TreeAutomaton(
+        dta = TreeAutomaton(
             states=reachable_states,
             input_symbols=self.input_symbols,
             final_states=new_final_states,
             transitions=new_transitions
         )
+        dta._symbol_class = symbol_class
+        dta._complete_dta = True
+        return dta
 
-    def complement(self):
-        # Determinize and get the NEW automaton
-        dta = self.determinize_reachable()
+    def symbol_classes(self):
+        """
+        Map every input symbol to the representative of its class: symbols with the same
+        arity and identical transition tables behave the same, so operations only need to
+        process one symbol per class and can share the resulting table with the others.
+        Computed once per automaton (results of operations set it directly).
+        """
+        if self._symbol_class is None:
+            representative_of = {}
+            symbol_class = {}
+            for char, arity in self.input_symbols.items():
+                key = (arity, self._table_key(arity, self.transitions.get(char)))
+                symbol_class[char] = representative_of.setdefault(key, char)
+            self._symbol_class = symbol_class
+        return self._symbol_class
+
+    @staticmethod
+    def _table_key(arity, table):
+        # Hashable view of a transition table, a single state and a one-element list compare equal
+        def result_key(result):
+            if result is None:
+                return frozenset()
+            return frozenset(result) if isinstance(result, list) else frozenset([result])
+
+        if arity == 0:
+            return result_key(table)
+        if arity == 1:
+            return frozenset((state, result_key(result)) for state, result in (table or {}).items())
+        if arity == 2:
+            return frozenset((state1, state2, result_key(result))
+                             for state1, row in (table or {}).items() for state2, result in row.items())
+        return id(table)
+
+    def _share_class_tables(self, new_transitions, symbol_class):
+        # Symbols only computed for their class representative get the representative's table
+        for char, representative in symbol_class.items():
+            if char != representative and self.input_symbols[char] in (1, 2):
+                new_transitions[char] = new_transitions[representative]
+
+    def _state_bits(self):
+        """
+        Assign bit positions to the NTA states: declared states first (sorted so
+        the numbering is reproducible), then states only used in the transitions.
+        """
+        bit_of = {}
+        for state in sorted(self.states, key=_state_key):
+            bit_of[state] = len(bit_of)
+
+        def add(result):
+            for state in (result if isinstance(result, list) else [result]):
+                if state is not None and state not in bit_of:
+                    bit_of[state] = len(bit_of)
+
+        for symbol, arity in self.input_symbols.items():
+            trans = self.transitions.get(symbol)
+            if trans is None:
+                continue
+            if arity == 0:
+                add(trans)
+            elif arity == 1:
+                for state, result in trans.items():
+                    add(state)
+                    add(result)
+            elif arity == 2:
+                for state1, row in trans.items():
+                    add(state1)
+                    for state2, result in row.items():
+                        add(state2)
+                        add(result)
+        return bit_of
+
+    def _determinize_reachable_bitset(self):
+        """
+        determinize_reachable with subset states as Python ints.
+        Bit i of a DTA state is set iff the i-th NTA state (see _state_bits) is in the subset,
+        so hashing and equality of subsets are int operations.
+        Every NTA transition is turned into a successor mask once; a binary transition
+        on subsets (L, R) is the OR over s1 in L of row(s1, R), where row(s1, R) is
+        itself the OR of the successor masks of s1 and every s2 in R and gets memoized.
+        """
+        start_time = time.time()
+        print("\n" + "="*70)
+        print("STARTING DETERMINIZATION (Reachable States Only, bitset subsets)")
+        print("="*70)
+
+        bit_of = self._state_bits()
+        print(f"\nOriginal NTA has {len(bit_of)} states (one bit each)\n")
+
+        # Step 1: Precompute successor masks
+        symbol_class = self.symbol_classes()
+        leaf_symbols = [symbol for symbol, arity in self.input_symbols.items() if arity == 0]
+        unary_symbols = [symbol for symbol, arity in self.input_symbols.items() if arity == 1 and symbol_class[symbol] == symbol]
+        binary_symbols = [symbol for symbol, arity in self.input_symbols.items() if arity == 2 and symbol_class[symbol] == symbol]
+        to_mask, unary_masks, binary_masks = self._successor_masks(bit_of, unary_symbols, binary_symbols)
+        row_cache = {symbol: {} for symbol in binary_symbols}
+
+        def unary_step(symbol, subset):
+            masks = unary_masks[symbol]
+            result = 0
+            for s in _iter_bits(subset):
+                result |= masks.get(s, 0)
+            return result
+
+        def binary_step(symbol, left, right):
+            masks = binary_masks[symbol]
+            cache = row_cache[symbol]
+            result = 0
+            for s1 in _iter_bits(left):
+                row = masks.get(s1)
+                if not row:
+                    continue
+                row_result = cache.get((s1, right))
+                if row_result is None:
+                    row_result = 0
+                    for s2 in _iter_bits(right):
+                        row_result |= row.get(s2, 0)
+                    cache[(s1, right)] = row_result
+                result |= row_result
+            return result
+
+        # Step 2: BFS over reachable subsets
+        reachable_states = set()
+        new_transitions = {}
+        queue = deque()
+        for symbol in leaf_symbols:
+            new_state = to_mask(self.transitions.get(symbol))
+            new_transitions[symbol] = new_state
+            if new_state not in reachable_states:
+                reachable_states.add(new_state)
+                queue.append(new_state)
+        for symbol in unary_symbols + binary_symbols:
+            new_transitions[symbol] = {}
+
+        print(f"Exploring reachable states ({len(unary_symbols)} unary, {len(binary_symbols)} binary symbols)...")
+        processed_count = 0
+        last_update = time.time()
+        processed_states = []
+        pairs_visited = 0
+        pairs_computed = 0
+        while queue:
+            current_state = queue.popleft()
+            processed_count += 1
+
+            current_time = time.time()
+            if (current_time - last_update) > 1.0:
+                print(f"  Processed: {processed_count:,} | Queue: {len(queue):,} | Reachable: {len(reachable_states):,}")
+                last_update = current_time
+
+            for symbol in unary_symbols:
+                new_state = unary_step(symbol, current_state)
+                new_transitions[symbol][current_state] = new_state
+                if new_state not in reachable_states:
+                    reachable_states.add(new_state)
+                    queue.append(new_state)
+
+            # Semi-naive: combine only the current state with the processed ones (and itself)
+            processed_states.append(current_state)
+            for symbol in binary_symbols:
+                symbol_transitions = new_transitions[symbol]
+                for other in processed_states:
+                    pairs = [(current_state, other)] if other == current_state else [(current_state, other), (other, current_state)]
+                    for left, right in pairs:
+                        pairs_visited += 1
+                        row = symbol_transitions.setdefault(left, {})
+                        if right in row:
+                            continue
+                        new_state = binary_step(symbol, left, right)
+                        row[right] = new_state
+                        pairs_computed += 1
+                        if new_state not in reachable_states:
+                            reachable_states.add(new_state)
+                            queue.append(new_state)
+
+        self._share_class_tables(new_transitions, symbol_class)
+
+        # Step 3: Final states
+        final_mask = 0
+        for state in self.final_states:
+            if state in bit_of:
+                final_mask |= 1 << bit_of[state]
+        new_final_states = {state for state in reachable_states if state & final_mask}
+
+        total_time = time.time() - start_time
+        print(f"  ✓ Binary pairs visited: {pairs_visited:,} | computed: {pairs_computed:,}")
+        print(f"  ✓ Reachable DTA states: {len(reachable_states):,} | Final: {len(new_final_states):,} | Time: {total_time:.2f}s")
+        print("="*70 + "\n")
+
+        dta = TreeAutomaton(
+            states=reachable_states,
+            input_symbols=self.input_symbols,
+            final_states=new_final_states,
+            transitions=new_transitions
+        )
+        dta._symbol_class = symbol_class
+        dta._complete_dta = True
+        return dta
+
+    def _successor_masks(self, bit_of, unary_symbols, binary_symbols):
+        # Successor masks of the NTA transitions for the bitset determinizers
+        def to_mask(result):
+            mask = 0
+            for state in (result if isinstance(result, list) else [result]):
+                if state is not None:
+                    mask |= 1 << bit_of[state]
+            return mask
+
+        unary_masks = {}
+        for symbol in unary_symbols:
+            unary_masks[symbol] = {bit_of[state]: to_mask(result)
+                                   for state, result in self.transitions.get(symbol, {}).items()}
+        binary_masks = {}
+        for symbol in binary_symbols:
+            binary_masks[symbol] = {bit_of[state1]: {bit_of[state2]: to_mask(result) for state2, result in row.items()}
+                                    for state1, row in self.transitions.get(symbol, {}).items()}
+        return to_mask, unary_masks, binary_masks
+
+    def _determinize_reachable_parallel(self, workers, min_parallel_pairs=20000):
+        """
+        _determinize_reachable_bitset in rounds, with the binary transitions computed by a
+        ProcessPoolExecutor. Every round takes the subsets found in the previous one (the frontier),
+        shards the new pairs by symbol and left subset (frontier x all, old x frontier) and sends the
+        shards to the workers; the coordinator collects the rows in shard order and dedups the new
+        subsets into the next frontier. DTA states are bitmasks over the reproducible numbering of
+        _state_bits and are discovered in shard order, so the result does not depend on the worker
+        count or scheduling. Rounds with fewer than min_parallel_pairs pairs are computed in-process.
+        """
+        start_time = time.time()
+        print("\n" + "="*70)
+        print(f"STARTING DETERMINIZATION (Reachable States Only, bitset subsets, {workers} workers)")
+        print("="*70)
+
+        bit_of = self._state_bits()
+        print(f"\nOriginal NTA has {len(bit_of)} states (one bit each)\n")
+
+        symbol_class = self.symbol_classes()
+        leaf_symbols = [symbol for symbol, arity in self.input_symbols.items() if arity == 0]
+        unary_symbols = [symbol for symbol, arity in self.input_symbols.items() if arity == 1 and symbol_class[symbol] == symbol]
+        binary_symbols = [symbol for symbol, arity in self.input_symbols.items() if arity == 2 and symbol_class[symbol] == symbol]
+        to_mask, unary_masks, binary_masks = self._successor_masks(bit_of, unary_symbols, binary_symbols)
+        local_row_caches = {symbol: {} for symbol in binary_symbols}
+
+        reachable_states = set()
+        new_transitions = {}
+        frontier = []
+        for symbol in leaf_symbols:
+            new_state = to_mask(self.transitions.get(symbol))
+            new_transitions[symbol] = new_state
+            if new_state not in reachable_states:
+                reachable_states.add(new_state)
+                frontier.append(new_state)
+        for symbol in unary_symbols + binary_symbols:
+            new_transitions[symbol] = {}
+
+        executor = None
+        if workers > 1 and binary_symbols:
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_determinize_worker, initargs=(binary_masks,))
+        processed_states = []
+        rounds = 0
+        pairs_computed = 0
+        try:
+            while frontier:
+                rounds += 1
+                old_states = list(processed_states)
+                processed_states.extend(frontier)
+                next_frontier = []
+
+                for symbol in unary_symbols:
+                    masks = unary_masks[symbol]
+                    for state in frontier:
+                        new_state = 0
+                        for s in _iter_bits(state):
+                            new_state |= masks.get(s, 0)
+                        new_transitions[symbol][state] = new_state
+                        if new_state not in reachable_states:
+                            reachable_states.add(new_state)
+                            next_frontier.append(new_state)
+
+                # Pairs with at least one new subset: new lefts with every right, old lefts with the new rights
+                tasks = []
+                for symbol in binary_symbols:
+                    for lefts, rights in ((frontier, processed_states), (old_states, frontier)):
+                        shard_size = max(1, -(-len(lefts) // (4 * workers)))
+                        for start in range(0, len(lefts), shard_size):
+                            tasks.append((symbol, lefts[start:start + shard_size], rights))
+                round_pairs = sum(len(lefts) * len(rights) for _, lefts, rights in tasks)
+                if executor is not None and round_pairs >= min_parallel_pairs:
+                    results = executor.map(_binary_rows_task, tasks)
+                else:
+                    results = (_binary_rows(binary_masks[symbol], local_row_caches[symbol], lefts, rights) for symbol, lefts, rights in tasks)
+
+                for (symbol, lefts, rights), rows in zip(tasks, results):
+                    symbol_transitions = new_transitions[symbol]
+                    for left, row in zip(lefts, rows):
+                        left_transitions = symbol_transitions.setdefault(left, {})
+                        for right, new_state in zip(rights, row):
+                            left_transitions[right] = new_state
+                            if new_state not in reachable_states:
+                                reachable_states.add(new_state)
+                                next_frontier.append(new_state)
+
+                pairs_computed += round_pairs
+                print(f"  Round {rounds}: {len(frontier):,} new subsets | {len(tasks):,} shards | {round_pairs:,} pairs | Reachable: {len(reachable_states):,}")
+                frontier = next_frontier
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        self._share_class_tables(new_transitions, symbol_class)
+
+        final_mask = 0
+        for state in self.final_states:
+            if state in bit_of:
+                final_mask |= 1 << bit_of[state]
+        new_final_states = {state for state in reachable_states if state & final_mask}
+
+        total_time = time.time() - start_time
+        print(f"  ✓ Binary pairs computed: {pairs_computed:,} in {rounds} rounds")
+        print(f"  ✓ Reachable DTA states: {len(reachable_states):,} | Final: {len(new_final_states):,} | Time: {total_time:.2f}s")
+        print("="*70 + "\n")
+
+        dta = TreeAutomaton(
+            states=reachable_states,
+            input_symbols=self.input_symbols,
+            final_states=new_final_states,
+            transitions=new_transitions
+        )
+        dta._symbol_class = symbol_class
+        dta._complete_dta = True
+        return dta
+
+    def lazy_determinize(self):
+        """DTA view of this NTA whose subset states are only built while running trees."""
+        return LazyDeterminizedAutomaton(self)
+
+    def lazy_complement(self):
+        """Complement of this NTA without materializing the DTA (see LazyDeterminizedAutomaton)."""
+        return LazyDeterminizedAutomaton(self, complement=True)
+
+    def compile(self):
+        """Intern states and symbols into a CompiledTreeAutomaton (see there)."""
+        return CompiledTreeAutomaton.from_tree_automaton(self)
+
+    def compile_runner(self):
+        """
+        Generate a specialized run function for this DTA: run(tree) -> bool, same answer as run().
+        States become ints (plus a dead state for missing transitions) and every symbol gets a
+        flat tuple, so each node is one indexed lookup without isinstance or dict checks.
+        run.batch(trees) evaluates many trees in one call, run.arrays(labels, label_ids,
+        child_offsets, child_index) takes the postorder arrays of RootedTree.postorder directly.
+        """
+        if not self.is_deterministic():
+            raise ValueError("compile_runner needs a deterministic automaton, determinize first")
+        for char, arity in self.input_symbols.items():
+            if arity > 2:
+                raise ValueError(f"Higher arity ({arity}) not supported for symbol {char}")
+
+        state_id = {}
+        for state in self.states:
+            state_id.setdefault(state, len(state_id))
+
+        def intern(result):
+            if result is None or result == []:
+                return None
+            if isinstance(result, list):
+                result = result[0]
+            return state_id.setdefault(result, len(state_id))
+
+        # Leaf symbols first, then unary, then binary: the arity test is a comparison of the symbol id
+        leaf_symbols = [char for char, arity in self.input_symbols.items() if arity == 0]
+        unary_symbols = [char for char, arity in self.input_symbols.items() if arity == 1]
+        binary_symbols = [char for char, arity in self.input_symbols.items() if arity == 2]
+        leaf_results = [intern(self.transitions.get(char)) for char in leaf_symbols]
+        unary_rows = [{intern(s): intern(t) for s, t in self.transitions.get(char, {}).items()} for char in unary_symbols]
+        binary_rows = [{(intern(s1), intern(s2)): intern(t)
+                        for s1, row in self.transitions.get(char, {}).items() for s2, t in row.items()}
+                       for char in binary_symbols]
+
+        dead = len(state_id)
+        width = dead + 1
+        tables = [dead if q is None else q for q in leaf_results]
+        for row in unary_rows:
+            table = [dead] * width
+            for s, t in row.items():
+                if t is not None:
+                    table[s] = t
+            tables.append(tuple(table))
+        for row in binary_rows:
+            table = [dead] * (width * width)
+            for (s1, s2), t in row.items():
+                if t is not None:
+                    table[s1 * width + s2] = t
+            tables.append(tuple(table))
+        accepting = [False] * width
+        for state in self.final_states:
+            if state in state_id:
+                accepting[state_id[state]] = True
+        symbols = {char: i for i, char in enumerate(leaf_symbols + unary_symbols + binary_symbols)}
+
+        # Loop body over one tree's postorder arrays. The last child of node i is node i - 1,
+        # so q (the previous node's state) is the unary child and the right binary child.
+        first_unary = len(leaf_symbols)
+        first_binary = first_unary + len(unary_symbols)
+        branches = [f"if s < {first_unary}:\n            q = T[s]"]
+        if unary_symbols:
+            branches.append(f"elif s < {first_binary}:\n            q = T[s][q]")
+        if binary_symbols:
+            branches.append(f"else:\n            q = T[s][states[child_index[child_offsets[i]]] * {width} + q]")
+        body = "\n        ".join(branches)
+        source = f"""
+def run_arrays(labels, label_ids, child_offsets, child_index, S=S, T=T, A=A):
+    syms = [S.get(label, -1) for label in labels]
+    if -1 in syms or not label_ids:
+        return False
+    states = [0] * len(label_ids)
+    q = 0
+    for i, lid in enumerate(label_ids):
+        s = syms[lid]
+        {body}
+        states[i] = q
+    return A[q]
+
+def run(tree, run_arrays=run_arrays):
+    return run_arrays(*tree.postorder()[1:])
+
+def run_batch(trees, run_arrays=run_arrays):
+    return [run_arrays(*tree.postorder()[1:]) for tree in trees]
+"""
+        namespace = {"S": symbols, "T": tuple(tables), "A": tuple(accepting)}
+        exec(source, namespace)
+        run = namespace["run"]
+        run.batch = namespace["run_batch"]
+        run.arrays = namespace["run_arrays"]
+        run.source = source
+        print(f"  ✓ Compiled runner: {dead} states, {len(symbols)} symbols")
+        return run
+
+    def complement(self, bitset=False, workers=None):
+        # Determinize and get the NEW automaton (not needed for complete DTAs, e.g. from project_determinize)
+        dta = self if self._complete_dta else self.determinize_reachable(bitset=bitset, workers=workers)
         # Complement the DTA's final states
         new_final_states = dta.states - dta.final_states
-        return TreeAutomaton(
+        complemented = TreeAutomaton(
             states=dta.states,
             input_symbols=dta.input_symbols,
             final_states=new_final_states,
             transitions=dta.transitions
         )
+        complemented._symbol_class = dta._symbol_class
+        complemented._complete_dta = True
+        return complemented
     
-    def union(self, other):
-        print("Constructing union automaton")
-        new_states = {(s1, s2) for s1 in self.states for s2 in other.states}
-        #print(new_states)
-        new_final_states = {(s1, s2) for s1 in self.states for s2 in other.states if s1 in self.final_states or s2 in other.final_states}
-        #print(new_final_states)
+    def minimize(self):
+        """
+        Minimize a deterministic bottom-up tree automaton by partition refinement.
+        Unreachable states are dropped first, then the final/non-final partition is refined
+        until it is a congruence: two states stay together only if every unary symbol and
+        every binary symbol (with the state as left or as right child, paired with any other
+        state) leads them into the same block. Missing transitions count as their own block.
+        Nondeterministic automata are determinized with determinize_reachable first.
+        Each block is represented by one of its original states, so state names keep their type.
+        """
+        start_time = time.time()
+        if not self.is_deterministic():
+            print("Automaton is nondeterministic, determinizing before minimization...")
+            dta = self.determinize_reachable()
+        else:
+            dta = self
+        print("Minimizing automaton...")
+
+        leaf_symbols = [char for char, arity in dta.input_symbols.items() if arity == 0]
+        unary_symbols = [char for char, arity in dta.input_symbols.items() if arity == 1]
+        binary_symbols = [char for char, arity in dta.input_symbols.items() if arity == 2]
+
+        reachable = dta._reachable_states()
+
+        # Initial partition: final vs non-final
+        block = {state: 0 if state in dta.final_states else 1 for state in reachable}
+        num_blocks = len(set(block.values()))
+        rounds = 0
+        while True:
+            rounds += 1
+            signatures = {state: [] for state in reachable}
+            for char in unary_symbols:
+                for state, next_state in dta.transitions.get(char, {}).items():
+                    if state in reachable:
+                        signatures[state].append((char, block[next_state]))
+            for char in binary_symbols:
+                for left_state, row in dta.transitions.get(char, {}).items():
+                    if left_state not in reachable:
+                        continue
+                    for right_state, next_state in row.items():
+                        if right_state not in reachable:
+                            continue
+                        signatures[left_state].append((char, 0, right_state, block[next_state]))
+                        signatures[right_state].append((char, 1, left_state, block[next_state]))
+
+            block_ids = {}
+            new_block = {}
+            for state in reachable:
+                key = (block[state], frozenset(signatures[state]))
+                new_block[state] = block_ids.setdefault(key, len(block_ids))
+            block = new_block
+            if len(block_ids) == num_blocks:
+                break
+            num_blocks = len(block_ids)
+
+        # Pick one representative per block
+        representative = {}
+        for state in sorted(reachable, key=_state_key):
+            representative.setdefault(block[state], state)
+        rep = {state: representative[block[state]] for state in reachable}
+
+        new_states = set(representative.values())
         new_transitions = {}
-        
-        for char in self.input_symbols.keys():  # Assuming both automata have the same input symbols
+        for char in leaf_symbols:
+            state = dta.transitions.get(char)
+            new_transitions[char] = rep[state] if state is not None else None
+        for char in unary_symbols:
+            new_transitions[char] = {rep[state]: rep[next_state] for state, next_state in dta.transitions.get(char, {}).items() if state in new_states}
+        for char in binary_symbols:
             new_transitions[char] = {}
-            if self.input_symbols[char] == 0:
-                # Handle leaf transitions - combine states from both automata
-                states1 = self.transitions[char]
-                states2 = other.transitions[char]
-                # Create list of combined states
-                combined = []
-                if isinstance(states1, list) and isinstance(states2, list):
-                    for s1 in states1:
-                        for s2 in states2:
-                            combined.append((s1, s2))
-                elif isinstance(states1, list):
-                    for s1 in states1:
-                        combined.append((s1, states2))
-                elif isinstance(states2, list):
-                    for s2 in states2:
-                        combined.append((states1, s2))
-                else:
-                    combined.append((states1, states2))
-                new_transitions[char] = combined if len(combined) > 1 else combined[0] if combined else None
-            elif self.input_symbols[char] == 1:
-                 # Handle unary transitions
+            for left_state, row in dta.transitions.get(char, {}).items():
+                if left_state not in new_states:
+                    continue
+                new_transitions[char][left_state] = {right_state: rep[next_state] for right_state, next_state in row.items() if right_state in new_states}
+        new_final_states = {state for state in new_states if state in dta.final_states}
+
+        print(f"  ✓ Minimized {len(dta.states):,} → {len(new_states):,} states ({rounds} refinement rounds, {time.time() - start_time:.2f}s)")
+        minimized = TreeAutomaton(
+            states=new_states,
+            input_symbols=dta.input_symbols,
+            final_states=new_final_states,
+            transitions=new_transitions
+        )
+        minimized._complete_dta = dta._complete_dta
+        return minimized
+
+    def trim(self):
+        """
+        Remove states no tree reaches (bottom-up fixpoint, see _reachable_states) and states
+        from which no final state can be reached (top-down usefulness fixpoint).
+        Transitions into or out of removed states are dropped; a leaf symbol without any
+        remaining state maps to an empty list, so runs over it simply reject.
+        """
+        reachable = self._reachable_states()
+        useful = self._useful_states(reachable)
+        keep = reachable & useful
+
+        def keep_result(result):
+            kept = [state for state in (result if isinstance(result, list) else [result]) if state in keep]
+            return kept if len(kept) != 1 else kept[0]
+
+        new_transitions = {}
+        old_count = 0
+        new_count = 0
+        for char, arity in self.input_symbols.items():
+            if arity == 0:
+                new_transitions[char] = keep_result(self.transitions.get(char))
+                old_count += 1
+                new_count += new_transitions[char] != []
+            elif arity == 1:
                 new_transitions[char] = {}
-                for (s1, s2) in new_states:
-                    new_transitions[char][(s1, s2)] = {}
-                    child_s1 = self.transitions[char][s1]
-                    child_s2 = other.transitions[char][s2]
-
-                    combined = []
-                    if isinstance(child_s1, list) and isinstance(child_s2, list):
-                        for cs1 in child_s1:
-                            for cs2 in child_s2:
-                                combined.append((cs1, cs2))
-                    elif isinstance(child_s1, list):
-                        for cs1 in child_s1:
-                            combined.append((cs1, child_s2))
-                    elif isinstance(child_s2, list):
-                        for cs2 in child_s2:
-                            combined.append((child_s1, cs2))
-                    else:
-                        combined.append((child_s1, child_s2))
-                    
-                    new_transitions[char][(s1, s2)] = combined if len(combined) > 1 else combined[0] if combined else None
-                
-            else:
+                for state, result in self.transitions.get(char, {}).items():
+                    old_count += 1
+                    if state in keep:
+                        result = keep_result(result)
+                        if result != []:
+                            new_transitions[char][state] = result
+                            new_count += 1
+            elif arity == 2:
                 new_transitions[char] = {}
-                for (s1, s2) in new_states:
-                    new_transitions[char][(s1, s2)] = {}
-                    for (t1, t2) in new_states:
-                        next_s1 = self.transitions[char][s1][t1]
-                        next_s2 = other.transitions[char][s2][t2]
-                        # Handle lists in transitions
-                        if isinstance(next_s1, list) or isinstance(next_s2, list):
-                            combined_next = []
-                            states1 = next_s1 if isinstance(next_s1, list) else [next_s1]
-                            states2 = next_s2 if isinstance(next_s2, list) else [next_s2]
-                            for ns1 in states1:
-                                for ns2 in states2:
-                                    combined_next.append((ns1, ns2))
-                            new_transitions[char][(s1, s2)][(t1, t2)] = combined_next if len(combined_next) > 1 else combined_next[0]
-                        else:
-                            new_transitions[char][(s1, s2)][(t1, t2)] = (next_s1, next_s2)
-        #print("New Transitions: ",new_transitions)
+                for state1, row in self.transitions.get(char, {}).items():
+                    old_count += len(row)
+                    if state1 not in keep:
+                        continue
+                    new_row = {}
+                    for state2, result in row.items():
+                        if state2 in keep:
+                            result = keep_result(result)
+                            if result != []:
+                                new_row[state2] = result
+                    if new_row:
+                        new_transitions[char][state1] = new_row
+                        new_count += len(new_row)
+            else:
+                new_transitions[char] = self.transitions.get(char)
+
+        new_states = set(keep)
+        print(f"  ✓ Trim removed {len(set(self.states) - keep):,} of {len(self.states):,} states and {old_count - new_count:,} of {old_count:,} transitions")
         return TreeAutomaton(
             states=new_states,
             input_symbols=self.input_symbols,
-            final_states=new_final_states,
+            final_states={state for state in self.final_states if state in keep},
             transitions=new_transitions
-        )  
+        )
 
-    def cut(self, other):
-        print("Constructing cut automaton...")
-        new_states = {(s1, s2) for s1 in self.states for s2 in other.states}
-        #print(new_states)
-        new_final_states = {(s1, s2) for s1 in self.states for s2 in other.states if s1 in self.final_states and s2 in other.final_states}
-        #print(new_final_states)
-        new_transitions = {}
-        #print("self symbols: ", self.input_symbols)
-        #print("---------------------------")
-        #print("other symbols: ", other.input_symbols)
-        for char in self.input_symbols.keys():  # Assuming both automata have the same input symbols
-            new_transitions[char] = {}
-            if self.input_symbols[char] == 0:
-                # Handle leaf transitions - combine states from both automata
-                trans1 = self.transitions[char]
-                trans2 = other.transitions[char]
-                # Extract states from lists if present (nondeterministic case)
-                states1 = trans1 if not isinstance(trans1, list) else trans1
-                states2 = trans2 if not isinstance(trans2, list) else trans2
-                # Create list of combined states
-                combined = []
-                if isinstance(states1, list) and isinstance(states2, list):
-                    for s1 in states1:
-                        for s2 in states2:
-                            combined.append((s1, s2))
-                elif isinstance(states1, list):
-                    for s1 in states1:
-                        combined.append((s1, states2))
-                elif isinstance(states2, list):
-                    for s2 in states2:
-                        combined.append((states1, s2))
-                else:
-                    combined.append((states1, states2))
-                new_transitions[char] = combined if len(combined) > 1 else combined[0] if combined else None
-            elif self.input_symbols[char] == 1:
-                 # Handle unary transitions
-                new_transitions[char] = {}
-                for (s1, s2) in new_states:
-                    new_transitions[char][(s1, s2)] = {}
-                    child_s1 = self.transitions[char][s1]
-                    child_s2 = other.transitions[char][s2]
-
-                    combined = []
-                    if isinstance(child_s1, list) and isinstance(child_s2, list):
-                        for cs1 in child_s1:
-                            for cs2 in child_s2:
-                                combined.append((cs1, cs2))
-                    elif isinstance(child_s1, list):
-                        for cs1 in child_s1:
-                            combined.append((cs1, child_s2))
-                    elif isinstance(child_s2, list):
-                        for cs2 in child_s2:
-                            combined.append((child_s1, cs2))
-                    else:
-                        combined.append((child_s1, child_s2))
-                    
-                    new_transitions[char][(s1, s2)] = combined if len(combined) > 1 else combined[0] if combined else None
-                
+    def _useful_states(self, reachable):
+        """States from which a final state can be reached when the other children are reachable (top-down fixpoint)."""
+        useful = {state for state in self.final_states if state in reachable}
+        # Edges child -> results that lead from child upwards
+        edges = []
+        for char, arity in self.input_symbols.items():
+            if arity == 1:
+                for state, result in self.transitions.get(char, {}).items():
+                    if state in reachable:
+                        edges.append((state, result))
+            elif arity == 2:
+                for state1, row in self.transitions.get(char, {}).items():
+                    if state1 not in reachable:
+                        continue
+                    for state2, result in row.items():
+                        if state2 in reachable:
+                            edges.append((state1, result))
+                            edges.append((state2, result))
+        changed = True
+        while changed:
+            changed = False
+            for child, result in edges:
+                if child in useful:
+                    continue
+                if any(state in useful for state in (result if isinstance(result, list) else [result])):
+                    useful.add(child)
+                    changed = True
+        return useful
+
+    def downward_simulation(self):
+        """
+        Maximal downward simulation as {state: set of states simulating it (itself included)}.
+        r simulates q if for every transition symbol(c1, ..., cn) → q there is a transition
+        symbol(d1, ..., dn) → r where every di simulates ci, so every tree reaching q also reaches r.
+        Greatest fixpoint over bitmasks (states numbered in _state_key order): every transition (c1, c2) → q
+        restricts the simulators of q to the states reached from simulators of c1 and c2.
+        These images only depend on the simulator masks of the children and are memoized.
+        """
+        start_time = time.time()
+        symbol_class = self.symbol_classes()
+        states = set(self.states)
+        for char, arity in self.input_symbols.items():
+            trans = self.transitions.get(char)
+            if arity == 0:
+                states.update(state for state in (trans if isinstance(trans, list) else [trans]) if state is not None)
+            elif arity == 1:
+                for state, result in (trans or {}).items():
+                    states.add(state)
+                    states.update(result if isinstance(result, list) else [result])
+            elif arity == 2:
+                for state1, row in (trans or {}).items():
+                    states.add(state1)
+                    for state2, result in row.items():
+                        states.add(state2)
+                        states.update(result if isinstance(result, list) else [result])
+        ordered = sorted(states, key=_state_key)
+        index = {state: i for i, state in enumerate(ordered)}
+
+        def to_mask(result):
+            mask = 0
+            for state in (result if isinstance(result, list) else [result]):
+                if state is not None:
+                    mask |= 1 << index[state]
+            return mask
+
+        # Successor masks per symbol class: unary {child: mask}, binary {left: {right: mask}}
+        simulators = [(1 << len(ordered)) - 1] * len(ordered)
+        unary_rows = []
+        binary_rows = []
+        for char, arity in self.input_symbols.items():
+            trans = self.transitions.get(char)
+            if arity == 0:
+                # Only states reached by the leaf symbol can simulate its targets
+                targets = to_mask(trans)
+                for q in _iter_bits(targets):
+                    simulators[q] &= targets
+            elif symbol_class[char] != char:
+                continue
+            elif arity == 1:
+                unary_rows.append({index[state]: to_mask(result) for state, result in (trans or {}).items()})
+            elif arity == 2:
+                binary_rows.append({index[state1]: {index[state2]: to_mask(result) for state2, result in row.items()}
+                                    for state1, row in (trans or {}).items()})
+        # A state without transitions of some symbol cannot simulate the targets of that symbol
+        for rows in unary_rows + binary_rows:
+            targets = 0
+            for row in rows.values():
+                for result in (row.values() if isinstance(row, dict) else [row]):
+                    targets |= result
+            for q in _iter_bits(targets):
+                simulators[q] &= targets
+
+        unary_cache = [{} for _ in unary_rows]
+        binary_cache = [{} for _ in binary_rows]
+        left_cache = [{} for _ in binary_rows]
+
+        def unary_image(k, child_mask):
+            # States reached from any state in child_mask
+            image = unary_cache[k].get(child_mask)
+            if image is None:
+                image = 0
+                rows = unary_rows[k]
+                for d in _iter_bits(child_mask):
+                    image |= rows.get(d, 0)
+                unary_cache[k][child_mask] = image
+            return image
+
+        def binary_image(k, left_mask, right_mask):
+            # States reached from any pair in left_mask x right_mask
+            image = binary_cache[k].get((left_mask, right_mask))
+            if image is None:
+                image = 0
+                rows = binary_rows[k]
+                for d1 in _iter_bits(left_mask):
+                    row = rows.get(d1)
+                    if not row:
+                        continue
+                    row_image = left_cache[k].get((d1, right_mask))
+                    if row_image is None:
+                        row_image = 0
+                        for d2 in _iter_bits(right_mask):
+                            row_image |= row.get(d2, 0)
+                        left_cache[k][(d1, right_mask)] = row_image
+                    image |= row_image
+                binary_cache[k][(left_mask, right_mask)] = image
+            return image
+
+        rounds = 0
+        changed = True
+        while changed:
+            rounds += 1
+            changed = False
+            for k, rows in enumerate(unary_rows):
+                for c, result in rows.items():
+                    image = unary_image(k, simulators[c])
+                    for q in _iter_bits(result):
+                        if simulators[q] & ~image:
+                            simulators[q] &= image
+                            changed = True
+            for k, rows in enumerate(binary_rows):
+                for c1, row in rows.items():
+                    for c2, result in row.items():
+                        image = binary_image(k, simulators[c1], simulators[c2])
+                        for q in _iter_bits(result):
+                            if simulators[q] & ~image:
+                                simulators[q] &= image
+                                changed = True
+
+        simulation = {ordered[q]: {ordered[r] for r in _iter_bits(mask)} for q, mask in enumerate(simulators)}
+        pairs = sum(len(simulating) - 1 for simulating in simulation.values())
+        print(f"  ✓ Downward simulation: {pairs:,} non-trivial pairs over {len(ordered):,} states ({rounds} rounds, {time.time() - start_time:.2f}s)")
+        return simulation
+
+    def quotient_simulation(self, simulation=None):
+        """
+        Merge the states that simulate each other (see downward_simulation), they are reached by
+        the same trees. The representative of a class is its smallest state by _state_key, as in minimize.
+        """
+        if simulation is None:
+            simulation = self.downward_simulation()
+        representative = {}
+        for state in sorted(simulation, key=_state_key):
+            if state not in representative:
+                for other in simulation[state]:
+                    if state in simulation[other]:
+                        representative[other] = state
 
+        def merge(results):
+            merged = []
+            for result in results:
+                for state in (result if isinstance(result, list) else [result]):
+                    if state is not None and representative.get(state, state) not in merged:
+                        merged.append(representative.get(state, state))
+            return merged if len(merged) != 1 else merged[0]
 
+        symbol_class = self.symbol_classes()
+        new_transitions = {}
+        for char, arity in self.input_symbols.items():
+            trans = self.transitions.get(char)
+            if arity == 0:
+                new_transitions[char] = merge([trans])
+            elif symbol_class[char] != char:
+                continue
+            elif arity == 1:
+                grouped = {}
+                for state, result in (trans or {}).items():
+                    grouped.setdefault(representative.get(state, state), []).append(result)
+                new_transitions[char] = {state: merge(results) for state, results in grouped.items()}
+            elif arity == 2:
+                grouped = {}
+                for state1, row in (trans or {}).items():
+                    new_row = grouped.setdefault(representative.get(state1, state1), {})
+                    for state2, result in row.items():
+                        new_row.setdefault(representative.get(state2, state2), []).append(result)
+                new_transitions[char] = {state1: {state2: merge(results) for state2, results in row.items()}
+                                         for state1, row in grouped.items()}
             else:
-                new_transitions[char] = {}
-                for (s1, s2) in new_states:
-                    new_transitions[char][(s1, s2)] = {}
-                    for (t1, t2) in new_states:
-                        next_s1 = self.transitions[char][s1][t1]
-                        next_s2 = other.transitions[char][s2][t2]
-                        # Handle lists in transitions
-                        if isinstance(next_s1, list) or isinstance(next_s2, list):
-                            combined_next = []
-                            states1 = next_s1 if isinstance(next_s1, list) else [next_s1]
-                            states2 = next_s2 if isinstance(next_s2, list) else [next_s2]
-                            for ns1 in states1:
-                                for ns2 in states2:
-                                    combined_next.append((ns1, ns2))
-                            new_transitions[char][(s1, s2)][(t1, t2)] = combined_next if len(combined_next) > 1 else combined_next[0]
-                        else:
-                            new_transitions[char][(s1, s2)][(t1, t2)] = (next_s1, next_s2)
-        #print(new_transitions)
-        return TreeAutomaton(
+                new_transitions[char] = trans
+        self._share_class_tables(new_transitions, symbol_class)
+
+        new_states = {representative.get(state, state) for state in self.states}
+        print(f"  ✓ Simulation quotient: {len(self.states):,} → {len(new_states):,} states")
+        quotient = TreeAutomaton(
             states=new_states,
             input_symbols=self.input_symbols,
-            final_states=new_final_states,
+            final_states={representative.get(state, state) for state in self.final_states},
             transitions=new_transitions
-        )  
+        )
+        quotient._symbol_class = symbol_class
+        return quotient
 
-    def project(self, alphabet, j, verbose=False):
-        print("Projecting automaton by removing last coordinate...")
+    def prune_simulation(self, simulation=None):
         """
-        Project away the LAST coordinate from tuple-based alphabet symbols.
-        This removes the rightmost element representing set membership.
-        Creates nondeterministic transitions when multiple symbols project to the same one.
-        
-        Args:
-            alphabet: Set of base alphabet symbols (e.g., {'a', 'b'})
-            j: Depth level for generating the new alphabet using gen_new_alphabet
-            verbose: If True, print detailed debug output during projection
-        
-        Examples:
-            ("b", 0, 1) → ("b", 0)
-            ("b", 0) → "b"
+        Remove every transition symbol(c1, ..., cn) → q for which a transition symbol(d1, ..., dn) → q
+        exists where every di simulates ci but not the other way round (see downward_simulation):
+        the trees using the removed transition still reach q through the other one.
         """
+        if simulation is None:
+            simulation = self.downward_simulation()
 
-        if verbose:
-            print("\n" + "="*70)
-            print(f"STARTING PROJECTION (removing last coordinate)")
-            print(f"Base alphabet: {alphabet}, depth level j={j}")
-            print("="*70)
-        
-        new_input_symbols = {}
+        def as_list(result):
+            if result is None:
+                return []
+            return result if isinstance(result, list) else [result]
+
+        def as_result(states):
+            return states if len(states) != 1 else states[0]
+
+        symbol_class = self.symbol_classes()
         new_transitions = {}
-        
-        # Determine the new alphabet based on projection depth
-        if j - 1 == 0:
-            # After projection, we're at the base alphabet level
-            new_alphabet = alphabet
-            if verbose:
-                print(f"New alphabet (j=1): {new_alphabet}")
-        else:
-            # Generate new alphabet for projection depth j-1
-            new_alphabet = gen_new_alphabet(alphabet, j - 1)
-            if verbose:
-                print(f"New alphabet (j={j}): {new_alphabet}")
-        
-        # Build mapping from old chars to new chars (removing LAST coordinate)
-        char_mapping = {}
-        if verbose:
-            print(f"\nStep 1: Building character mapping (removing last coordinate)...")
-        
-        for old_char in self.input_symbols.keys():
-            if isinstance(old_char, tuple):
-                # Remove LAST element
-                new_char = old_char[:-1]
-                # If only one element left, unwrap the tuple
-                if len(new_char) == 1:
-                    new_char = new_char[0]
-                char_mapping[old_char] = new_char
-                if new_char in new_alphabet or (isinstance(new_char, tuple) and new_char in new_alphabet):
-                    new_input_symbols[new_char] = self.input_symbols[old_char]
-                    if verbose:
-                        print(f"  {old_char} → {new_char} (arity: {self.input_symbols[old_char]})")
+        removed = 0
+        for char, arity in self.input_symbols.items():
+            trans = self.transitions.get(char)
+            if arity == 0 or arity > 2:
+                new_transitions[char] = trans
+                continue
+            if symbol_class[char] != char:
+                continue
+            if arity == 1:
+                # into[q] = states with a transition to q
+                into = {}
+                for state, result in (trans or {}).items():
+                    for target in as_list(result):
+                        into.setdefault(target, set()).add(state)
+                new_table = {}
+                for state, result in (trans or {}).items():
+                    kept = [target for target in as_list(result)
+                            if not any(other != state and state not in simulation[other] for other in simulation[state] if other in into[target])]
+                    removed += len(as_list(result)) - len(kept)
+                    if kept:
+                        new_table[state] = as_result(kept)
             else:
-                # Not a tuple, keep as is if in new alphabet
-                if old_char in new_alphabet:
-                    char_mapping[old_char] = old_char
-                    new_input_symbols[old_char] = self.input_symbols[old_char]
-                    if verbose:
-                        print(f"  {old_char} → {old_char} (unchanged, arity: {self.input_symbols[old_char]})")
-        
-        # Build new transitions by grouping old transitions that map to same new char
-        if verbose:
-            print("\nStep 2: Building new transitions...")
-        for new_char in new_input_symbols.keys():
-            arity = new_input_symbols[new_char]
-            
-            # Find all old chars that project to this new char
-            old_chars_for_new = [oc for oc, nc in char_mapping.items() if nc == new_char]
-            if verbose:
-                print(f"\n  Processing '{new_char}' (arity={arity}):")
-                print(f"    Old chars projecting to this: {old_chars_for_new}")
-            
+                # into[q][left] = right states of the transitions (left, right) → q
+                into = {}
+                for state1, row in (trans or {}).items():
+                    for state2, result in row.items():
+                        for target in as_list(result):
+                            into.setdefault(target, {}).setdefault(state1, set()).add(state2)
+
+                def dominated(state1, state2, target):
+                    for left in simulation[state1]:
+                        for right in into[target].get(left, ()):
+                            if (left, right) != (state1, state2) and right in simulation[state2] \
+                                    and not (state1 in simulation[left] and state2 in simulation[right]):
+                                return True
+                    return False
+
+                new_table = {}
+                for state1, row in (trans or {}).items():
+                    new_row = {}
+                    for state2, result in row.items():
+                        kept = [target for target in as_list(result) if not dominated(state1, state2, target)]
+                        removed += len(as_list(result)) - len(kept)
+                        if kept:
+                            new_row[state2] = as_result(kept)
+                    if new_row:
+                        new_table[state1] = new_row
+            new_transitions[char] = new_table
+        self._share_class_tables(new_transitions, symbol_class)
+
+        print(f"  ✓ Simulation pruning removed {removed:,} transitions")
+        pruned = TreeAutomaton(
+            states=self.states,
+            input_symbols=self.input_symbols,
+            final_states=self.final_states,
+            transitions=new_transitions
+        )
+        pruned._symbol_class = symbol_class
+        return pruned
+
+    def reduce_simulation(self):
+        """Quotient by downward simulation equivalence, then prune simulation-subsumed transitions."""
+        quotient = self.quotient_simulation()
+        return quotient.prune_simulation()
+
+    def is_empty(self):
+        """True if the automaton accepts no tree (see witness)."""
+        return self._smallest_accepting_run() is None
+
+    def witness(self):
+        """
+        Smallest accepted tree as a RootedTree of Nodes (nodes ordered from leaves to root),
+        or None if the language is empty.
+        """
+        run = self._smallest_accepting_run()
+        if run is None:
+            return None
+        final_state, back_pointer = run
+        return TreeAutomaton._tree_from_back_pointers(final_state, back_pointer)
+
+    @staticmethod
+    def _tree_from_back_pointers(root, back_pointer):
+        # back_pointer[key] = (symbol, child keys); rebuild the tree below root in postorder
+        nodes = []
+        built = []
+        stack = [(root, False)]
+        while stack:
+            state, expanded = stack.pop()
+            symbol, children = back_pointer[state]
+            if not expanded:
+                stack.append((state, True))
+                for child in reversed(children):
+                    stack.append((child, False))
+            else:
+                child_nodes = [built.pop() for _ in children][::-1]
+                node = Node(symbol, len(nodes) + 1, child_nodes)
+                nodes.append(node)
+                built.append(node)
+        return RootedTree(built.pop(), nodes)
+
+    def _smallest_accepting_run(self):
+        """
+        Bottom-up fixpoint (Knuth's generalization of Dijkstra) over tree sizes.
+        back_pointer[q] = (symbol, child states) of a smallest tree reaching q. Every transition
+        is looked at once, when its last child state is settled. Stops at the first settled
+        final state and returns (that state, back_pointer), or None if no final state is reachable.
+        """
+        unary_by_child = {}
+        binary_by_left = {}
+        binary_by_right = {}
+        for char, arity in self.input_symbols.items():
+            if arity == 1:
+                for state, result in self.transitions.get(char, {}).items():
+                    unary_by_child.setdefault(state, []).append((char, result))
+            elif arity == 2:
+                for state1, row in self.transitions.get(char, {}).items():
+                    for state2, result in row.items():
+                        binary_by_left.setdefault(state1, []).append((char, state2, result))
+                        binary_by_right.setdefault(state2, []).append((char, state1, result))
+
+        size = {}
+        back_pointer = {}
+        heap = []
+        counter = 0
+
+        def offer(result, new_size, symbol, children):
+            nonlocal counter
+            for state in (result if isinstance(result, list) else [result]):
+                if state is None:
+                    continue
+                if state not in size or new_size < size[state]:
+                    size[state] = new_size
+                    back_pointer[state] = (symbol, children)
+                    counter += 1
+                    heapq.heappush(heap, (new_size, counter, state))
+
+        for char, arity in self.input_symbols.items():
             if arity == 0:
-                # Leaf transitions: collect all states from old chars
-                collected_states = []
-                for old_char in old_chars_for_new:
-                    old_transition = self.transitions[old_char]
-                    if verbose:
-                        print(f"      From '{old_char}': {old_transition}")
-                    if isinstance(old_transition, list):
-                        collected_states.extend(old_transition)
-                    else:
-                        collected_states.append(old_transition)
-                
-                # Store as list if multiple states, single state otherwise
-                if len(collected_states) > 1:
-                    new_transitions[new_char] = collected_states
-                    if verbose:
-                        print(f"    → Result (nondeterministic): {collected_states}")
-                elif len(collected_states) == 1:
-                    new_transitions[new_char] = collected_states[0]
-                    if verbose:
-                        print(f"    → Result (deterministic): {collected_states[0]}")
-            
+                offer(self.transitions.get(char), 1, char, ())
+
+        settled = set()
+        while heap:
+            state_size, _, state = heapq.heappop(heap)
+            if state in settled or state_size > size[state]:
+                continue
+            settled.add(state)
+            if state in self.final_states:
+                return state, back_pointer
+            for char, result in unary_by_child.get(state, ()):
+                offer(result, state_size + 1, char, (state,))
+            for char, right_state, result in binary_by_left.get(state, ()):
+                if right_state in settled:
+                    offer(result, state_size + size[right_state] + 1, char, (state, right_state))
+            for char, left_state, result in binary_by_right.get(state, ()):
+                # left_state == state was already handled as left child above
+                if left_state in settled and left_state != state:
+                    offer(result, size[left_state] + state_size + 1, char, (left_state, state))
+        return None
+
+    def is_universal(self):
+        """True if the automaton accepts every tree over its input symbols (see universality_counterexample)."""
+        return self.universality_counterexample() is None
+
+    def universality_counterexample(self):
+        """A tree over the input symbols that is rejected, or None if the automaton is universal."""
+        return self.inclusion_counterexample(TreeAutomaton.one_state(self.input_symbols, accepting=True))
+
+    def includes(self, other):
+        """True if every tree accepted by other is accepted by self (see inclusion_counterexample)."""
+        return self.inclusion_counterexample(other) is None
+
+    def inclusion_counterexample(self, other):
+        """
+        A tree accepted by other but not by self as a RootedTree, or None if L(other) ⊆ L(self).
+        Explores pairs (state of other, macrostate of self) bottom-up like determinize_reachable,
+        without determinizing either automaton: a macrostate only grows with its children, so a pair
+        is dropped when a pair with the same state of other and a smaller macrostate is known, and
+        known pairs with a larger macrostate are retired (antichain of subset-minimal macrostates).
+        A pair with a final state of other and a macrostate without final state of self is a counterexample.
+        """
+        def as_list(result):
+            if result is None:
+                return []
+            return result if isinstance(result, list) else [result]
+
+        # Symbols are explored once per (class in self, class in other)
+        class1 = self.symbol_classes()
+        class2 = other.symbol_classes()
+        pair_representative = {}
+        symbol_class = {char: pair_representative.setdefault((class1.get(char, char), class2[char]), char) for char in other.input_symbols}
+        leaf_symbols = [char for char, arity in other.input_symbols.items() if arity == 0 and symbol_class[char] == char]
+        unary_symbols = [char for char, arity in other.input_symbols.items() if arity == 1 and symbol_class[char] == char]
+        binary_symbols = [char for char, arity in other.input_symbols.items() if arity == 2 and symbol_class[char] == char]
+
+        post_cache = {}
+
+        def post(char, children):
+            # Macrostate of self reached from the child macrostates
+            key = (char, children)
+            macrostate = post_cache.get(key)
+            if macrostate is None:
+                trans = self.transitions.get(char)
+                states = set()
+                if len(children) == 1:
+                    if trans:
+                        for q in children[0]:
+                            states.update(as_list(trans.get(q)))
+                elif trans:
+                    for q1 in children[0]:
+                        row = trans.get(q1)
+                        if row:
+                            for q2 in children[1]:
+                                states.update(as_list(row.get(q2)))
+                macrostate = frozenset(states)
+                post_cache[key] = macrostate
+            return macrostate
+
+        # Pair entries are ids into these lists; antichain[p] holds the live ids with state p
+        entry_state = []
+        entry_macrostate = []
+        alive = []
+        back_pointer = {}
+        antichain = {}
+        queue = deque()
+
+        def add(p, macrostate, symbol, children):
+            known = antichain.setdefault(p, [])
+            if any(entry_macrostate[entry] <= macrostate for entry in known):
+                return None
+            for entry in known:
+                if macrostate < entry_macrostate[entry]:
+                    alive[entry] = False
+            entry = len(entry_state)
+            entry_state.append(p)
+            entry_macrostate.append(macrostate)
+            alive.append(True)
+            back_pointer[entry] = (symbol, children)
+            antichain[p] = [known_entry for known_entry in known if alive[known_entry]] + [entry]
+            queue.append(entry)
+            if p in other.final_states and not any(q in self.final_states for q in macrostate):
+                return entry
+            return None
+
+        def counterexample(entry):
+            print(f"  ✓ Counterexample found after {len(entry_state):,} pairs")
+            return TreeAutomaton._tree_from_back_pointers(entry, back_pointer)
+
+        print("Checking inclusion with antichains...")
+        for char in leaf_symbols:
+            macrostate = frozenset(as_list(self.transitions.get(char)))
+            for p in as_list(other.transitions.get(char)):
+                found = add(p, macrostate, char, ())
+                if found is not None:
+                    return counterexample(found)
+
+        processed = []
+        while queue:
+            entry = queue.popleft()
+            if not alive[entry]:
+                continue
+            p = entry_state[entry]
+            for char in unary_symbols:
+                trans = other.transitions.get(char, {})
+                if p not in trans:
+                    continue
+                macrostate = post(char, (entry_macrostate[entry],))
+                for next_p in as_list(trans[p]):
+                    found = add(next_p, macrostate, char, (entry,))
+                    if found is not None:
+                        return counterexample(found)
+
+            # Semi-naive as in determinize_reachable, retired entries are skipped
+            processed = [known for known in processed if alive[known]]
+            processed.append(entry)
+            for char in binary_symbols:
+                trans = other.transitions.get(char, {})
+                for known in processed:
+                    pairs = [(entry, known)] if known == entry else [(entry, known), (known, entry)]
+                    for left, right in pairs:
+                        results = trans.get(entry_state[left], {}).get(entry_state[right])
+                        if results is None:
+                            continue
+                        macrostate = post(char, (entry_macrostate[left], entry_macrostate[right]))
+                        for next_p in as_list(results):
+                            found = add(next_p, macrostate, char, (left, right))
+                            if found is not None:
+                                return counterexample(found)
+                    if not alive[entry]:
+                        break
+                if not alive[entry]:
+                    break
+
+        print(f"  ✓ Inclusion holds ({len(entry_state):,} pairs explored)")
+        return None
+
+    @staticmethod
+    def one_state(input_symbols, accepting):
+        """Automaton with a single state that accepts every tree (accepting=True) or none."""
+        state = "q_all" if accepting else "q_none"
+        transitions = {}
+        for char, arity in input_symbols.items():
+            if arity == 0:
+                transitions[char] = state
             elif arity == 1:
-                # Unary transitions
-                new_transitions[new_char] = {}
-                print("New char: ", new_char)
-                if verbose:
-                    print(f"    Building unary transitions...")
-                for state in self.states:
-                    combined_results = []
-                    for old_char in old_chars_for_new:
-                        if state in self.transitions[old_char]:
-                            result = self.transitions[old_char][state]
-                            if isinstance(result, list):
-                                combined_results.extend(result)
-                            else:
-                                combined_results.append(result)
-                    
-                    if len(combined_results) > 1:
-                        new_transitions[new_char][state] = combined_results
-                        if verbose:
-                            print(f"      δ({state}) = {combined_results} (nondeterministic)")
-                    elif len(combined_results) == 1:
-                        new_transitions[new_char][state] = combined_results[0]
-                        if verbose:
-                            print(f"      δ({state}) = {combined_results[0]}")
-            
+                transitions[char] = {state: state}
             elif arity == 2:
-                # Binary transitions
-                new_transitions[new_char] = {}
-                if verbose:
-                    print(f"    Building binary transitions...")
-                transition_count = 0
-                for state1 in self.states:
-                    new_transitions[new_char][state1] = {}
-                    for state2 in self.states:
-                        combined_results = []
-                        for old_char in old_chars_for_new:
-                            if state1 in self.transitions[old_char] and state2 in self.transitions[old_char][state1]:
-                                result = self.transitions[old_char][state1][state2]
-                                if isinstance(result, list):
-                                    combined_results.extend(result)
-                                else:
-                                    combined_results.append(result)
-                        
-                        if len(combined_results) > 1:
-                            new_transitions[new_char][state1][state2] = combined_results
-                            transition_count += 1
-                            if verbose and transition_count <= 5:  # Only print first few to avoid clutter
-                                print(f"      δ({state1}, {state2}) = {combined_results} (nondeterministic)")
-                        elif len(combined_results) == 1:
-                            new_transitions[new_char][state1][state2] = combined_results[0]
-                            transition_count += 1
-                            if verbose and transition_count <= 5:
-                                print(f"      δ({state1}, {state2}) = {combined_results[0]}")
-                if verbose and transition_count > 5:
-                    print(f"      ... and {transition_count - 5} more transitions")
+                transitions[char] = {state: {state: state}}
+        return TreeAutomaton(
+            states={state},
+            input_symbols=input_symbols,
+            final_states={state} if accepting else set(),
+            transitions=transitions
+        )
+
+    def is_deterministic(self):
+        """True if no transition (leaf, unary or binary) yields a list of states."""
+        for char, arity in self.input_symbols.items():
+            trans = self.transitions.get(char)
+            if arity == 0:
+                if isinstance(trans, list):
+                    return False
+            elif arity == 1:
+                if any(isinstance(next_state, list) for next_state in (trans or {}).values()):
+                    return False
+            elif arity == 2:
+                if any(isinstance(next_state, list) for row in (trans or {}).values() for next_state in row.values()):
+                    return False
+        return True
+
+    def _reachable_states(self):
+        """States some tree reaches bottom-up (fixpoint over the transition tables)."""
+        reachable = set()
+        for char, arity in self.input_symbols.items():
+            if arity == 0:
+                result = self.transitions.get(char)
+                if result is not None:
+                    reachable.update(result if isinstance(result, list) else [result])
+        changed = True
+        while changed:
+            changed = False
+            for char, arity in self.input_symbols.items():
+                if arity == 1:
+                    results = [next_state for state, next_state in self.transitions.get(char, {}).items() if state in reachable]
+                elif arity == 2:
+                    results = [next_state for left_state, row in self.transitions.get(char, {}).items() if left_state in reachable
+                               for right_state, next_state in row.items() if right_state in reachable]
+                else:
+                    continue
+                for result in results:
+                    for state in (result if isinstance(result, list) else [result]):
+                        if state not in reachable:
+                            reachable.add(state)
+                            changed = True
+        return reachable
+
+    def union(self, other, trim=False, workers=None):
+        print("Constructing union automaton")
+        result = self._product_reachable(other, lambda final1, final2: final1 or final2, workers, keep_partial=True)
+        return result.trim() if trim else result
+
+    def cut(self, other, trim=False, workers=None):
+        print("Constructing cut automaton...")
+        result = self._product_reachable(other, lambda final1, final2: final1 and final2, workers)
+        return result.trim() if trim else result
+
+    def _product_reachable(self, other, is_final, workers=None, min_parallel_states=1000, min_parallel_pairs=20000, keep_partial=False):
+        """
+        Product automaton of self and other restricted to the pairs that are reachable bottom-up.
+        With keep_partial (union) a side without a transition continues as None in the pair, so
+        trees accepted by only one side are kept; otherwise such a pair has no transition (cut).
+        Starts from the leaf pairs and explores like determinize_reachable: a popped pair is
+        combined with every pair popped before it (and itself) in both argument positions,
+        so unreachable pairs never get a state or a table entry.
+        The result is trimmed to reachable states; cut and union only differ in is_final.
+        With workers, products of at least min_parallel_states state pairs compute their binary
+        rows in a process pool, see _product_rounds for min_parallel_pairs.
+        """
+        def as_list(result):
+            if result is None:
+                return []
+            return result if isinstance(result, list) else [result]
+
+        if self.input_symbols != other.input_symbols:
+            differing = sorted(set(self.input_symbols.items()) ^ set(other.input_symbols.items()), key=repr)
+            raise ValueError(f"Product of automata over different alphabets: {len(differing)} symbols differ, "
+                             f"e.g. {differing[:5]}")
+
+        # A symbol pair class is (class in self, class in other), one representative is processed
+        class1 = self.symbol_classes()
+        class2 = other.symbol_classes()
+        pair_representative = {}
+        symbol_class = {char: pair_representative.setdefault((class1[char], class2[char]), char) for char in self.input_symbols}
+
+        leaf_symbols = [char for char, arity in self.input_symbols.items() if arity == 0]
+        unary_symbols = [char for char, arity in self.input_symbols.items() if arity == 1 and symbol_class[char] == char]
+        binary_symbols = [char for char, arity in self.input_symbols.items() if arity == 2 and symbol_class[char] == char]
+
+        new_states = set()
+        new_transitions = {}
+        queue = deque()
+
+        def discover(result):
+            for state in as_list(result):
+                if state not in new_states:
+                    new_states.add(state)
+                    queue.append(state)
+
+        # Handle leaf transitions - combine states from both automata
+        for char in leaf_symbols:
+            result = _product_successor(self.transitions.get(char), other.transitions.get(char), keep_partial)
+            new_transitions[char] = [] if result is None else result
+            discover(result)
+        for char in unary_symbols + binary_symbols:
+            new_transitions[char] = {}
+
+        if workers is not None and len(self.states) * len(other.states) >= min_parallel_states:
+            self._product_rounds(other, workers, list(queue), new_states, new_transitions, unary_symbols, binary_symbols,
+                                 min_parallel_pairs=min_parallel_pairs, keep_partial=keep_partial)
+            queue.clear()
+
+        processed_states = []
+        while queue:
+            current_state = queue.popleft()
+            s1, s2 = current_state
+
+            for char in unary_symbols:
+                trans1 = self.transitions.get(char, {})
+                trans2 = other.transitions.get(char, {})
+                result = _product_successor(trans1.get(s1), trans2.get(s2), keep_partial)
+                if result is not None:
+                    new_transitions[char][current_state] = result
+                    discover(result)
+
+            processed_states.append(current_state)
+            for char in binary_symbols:
+                trans1 = self.transitions.get(char, {})
+                trans2 = other.transitions.get(char, {})
+                symbol_transitions = new_transitions[char]
+                for other_state in processed_states:
+                    pairs = [(current_state, other_state)] if other_state == current_state else [(current_state, other_state), (other_state, current_state)]
+                    for (l1, l2), (r1, r2) in pairs:
+                        next_s1 = trans1.get(l1, {}).get(r1)
+                        next_s2 = trans2.get(l2, {}).get(r2)
+                        result = _product_successor(next_s1, next_s2, keep_partial)
+                        if result is None:
+                            continue
+                        symbol_transitions.setdefault((l1, l2), {})[(r1, r2)] = result
+                        discover(result)
+
+        self._share_class_tables(new_transitions, symbol_class)
+        new_final_states = {(s1, s2) for (s1, s2) in new_states if is_final(s1 in self.final_states, s2 in other.final_states)}
+        # With keep_partial either side of a pair may also be None
+        bound = (len(self.states) + 1) * (len(other.states) + 1) if keep_partial else len(self.states) * len(other.states)
+        print(f"  ✓ Reachable product states: {len(new_states):,} of {bound:,} ({len(unary_symbols) + len(binary_symbols)} symbol classes)")
+        product = TreeAutomaton(
+            states=new_states,
+            input_symbols=self.input_symbols,
+            final_states=new_final_states,
+            transitions=new_transitions
+        )
+        product._symbol_class = symbol_class
+        return product
+
+    def _product_rounds(self, other, workers, frontier, new_states, new_transitions, unary_symbols, binary_symbols, min_parallel_pairs=20000, keep_partial=False):
+        """
+        Exploration of _product_reachable in rounds, like _determinize_reachable_parallel: the binary
+        rows of the new pairs are sharded by symbol and left pair across a ProcessPoolExecutor and
+        merged in shard order into new_transitions. Rounds with fewer than min_parallel_pairs pairs
+        are computed in-process.
+        """
+        product_tables = {char: (self.transitions.get(char, {}), other.transitions.get(char, {})) for char in binary_symbols}
+        executor = None
+        if workers > 1 and binary_symbols:
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_product_worker, initargs=(product_tables, keep_partial))
+
+        def discover(result, next_frontier):
+            for state in (result if isinstance(result, list) else [result]):
+                if state not in new_states:
+                    new_states.add(state)
+                    next_frontier.append(state)
+
+        processed_states = []
+        rounds = 0
+        try:
+            while frontier:
+                rounds += 1
+                old_states = list(processed_states)
+                processed_states.extend(frontier)
+                next_frontier = []
+
+                for char in unary_symbols:
+                    trans1 = self.transitions.get(char, {})
+                    trans2 = other.transitions.get(char, {})
+                    for current_state in frontier:
+                        s1, s2 = current_state
+                        result = _product_successor(trans1.get(s1), trans2.get(s2), keep_partial)
+                        if result is not None:
+                            new_transitions[char][current_state] = result
+                            discover(result, next_frontier)
+
+                tasks = []
+                for char in binary_symbols:
+                    for lefts, rights in ((frontier, processed_states), (old_states, frontier)):
+                        shard_size = max(1, -(-len(lefts) // (4 * workers)))
+                        for start in range(0, len(lefts), shard_size):
+                            tasks.append((char, lefts[start:start + shard_size], rights))
+                round_pairs = sum(len(lefts) * len(rights) for _, lefts, rights in tasks)
+                if executor is not None and round_pairs >= min_parallel_pairs:
+                    results = executor.map(_product_rows_task, tasks)
+                else:
+                    results = (_product_rows(*product_tables[char], lefts, rights, keep_partial) for char, lefts, rights in tasks)
+
+                for (char, lefts, rights), rows in zip(tasks, results):
+                    symbol_transitions = new_transitions[char]
+                    for left, row in zip(lefts, rows):
+                        for right, result in zip(rights, row):
+                            if result is None:
+                                continue
+                            symbol_transitions.setdefault(left, {})[right] = result
+                            discover(result, next_frontier)
+
+                print(f"  Round {rounds}: {len(frontier):,} new pairs | {len(tasks):,} shards | {round_pairs:,} binary pairs | Reachable: {len(new_states):,}")
+                frontier = next_frontier
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    def project(self, alphabet, j, verbose=False, trim=False):
+        print("Projecting automaton by removing last coordinate...")
+        """
+        Project away the LAST coordinate from tuple-based alphabet symbols.
+        This removes the rightmost element representing set membership.
+        Creates nondeterministic transitions when multiple symbols project to the same one.
         
+        Args:
+            alphabet: Set of base alphabet symbols (e.g., {'a', 'b'})
+            j: Depth level for generating the new alphabet using gen_new_alphabet
+            verbose: If True, print detailed debug output during projection
+            trim: If True, run trim() on the result
+        
+        Examples:
+            ("b", 0, 1) → ("b", 0)
+            ("b", 0) → "b"
+        """
+
+        if verbose:
+            print("\n" + "="*70)
+            print(f"STARTING PROJECTION (removing last coordinate)")
+            print(f"Base alphabet: {alphabet}, depth level j={j}")
+            print("="*70)
+        
+        # Determine the new alphabet based on projection depth
+        if j - 1 == 0:
+            # After projection, we're at the base alphabet level
+            new_alphabet = alphabet
+            if verbose:
+                print(f"New alphabet (j=1): {new_alphabet}")
+        else:
+            # Generate new alphabet for projection depth j-1
+            new_alphabet = gen_new_alphabet(alphabet, j - 1)
+            if verbose:
+                print(f"New alphabet (j={j}): {new_alphabet}")
+        
+        char_mapping, new_input_symbols = self._projection_mapping(new_alphabet, verbose)
+        
+        # Build new transitions by grouping old transitions that map to same new char
+        new_transitions, new_symbol_class = self._project_transitions(char_mapping, new_input_symbols, copy_binary=False, verbose=verbose)
+
         if verbose:
             print("\n" + "="*70)
             print("PROJECTION COMPLETE")
@@ -780,14 +2081,16 @@ class TreeAutomaton:
             print(f"Final states: {self.final_states}")
             print("="*70 + "\n")
         
-        return TreeAutomaton(
+        projected = TreeAutomaton(
             states=self.states,
             input_symbols=new_input_symbols,
             final_states=self.final_states,
             transitions=new_transitions
         )
+        projected._symbol_class = new_symbol_class
+        return projected.trim() if trim else projected
 
-    def project_courcelle(self, alphabet, treewidth, j,  verbose=False):
+    def project_courcelle(self, alphabet, treewidth, j,  verbose=False, trim=False):
         print("Projecting automaton by removing last coordinate...")
         """
         Project away the LAST coordinate from tuple-based alphabet symbols.
@@ -800,6 +2103,7 @@ class TreeAutomaton:
             alphabet: Set of base alphabet symbols (e.g., {'a', 'b'})
             j: Depth level for generating the new alphabet using gen_new_alphabet
             verbose: If True, print detailed debug output during projection
+            trim: If True, run trim() on the result
         
         Examples:
             ("b", 0, 1) → ("b", 0)
@@ -812,9 +2116,6 @@ class TreeAutomaton:
             print(f"Base alphabet: {alphabet}, depth level j={j}")
             print("="*70)
         
-        new_input_symbols = {}
-        new_transitions = {}
-        
         # Determine the new alphabet based on projection depth
         if j - 1 == 0:
             # After projection, we're at the base alphabet level
@@ -827,8 +2128,32 @@ class TreeAutomaton:
             if verbose:
                 print(f"New alphabet (j={j}): {new_alphabet}")
         
+        char_mapping, new_input_symbols = self._projection_mapping(new_alphabet, verbose)
+        
+        # Build new transitions by grouping old transitions that map to same new char
+        new_transitions, new_symbol_class = self._project_transitions(char_mapping, new_input_symbols, copy_binary=True, verbose=verbose)
+
+        if verbose:
+            print("\n" + "="*70)
+            print("PROJECTION COMPLETE")
+            print(f"New alphabet: {set(new_input_symbols.keys())}")
+            print(f"States: {self.states}")
+            print(f"Final states: {self.final_states}")
+            print("="*70 + "\n")
+        
+        projected = TreeAutomaton(
+            states=self.states,
+            input_symbols=new_input_symbols,
+            final_states=self.final_states,
+            transitions=new_transitions
+        )
+        projected._symbol_class = new_symbol_class
+        return projected.trim() if trim else projected
+
+    def _projection_mapping(self, new_alphabet, verbose=False):
         # Build mapping from old chars to new chars (removing LAST coordinate)
         char_mapping = {}
+        new_input_symbols = {}
         if verbose:
             print(f"\nStep 1: Building character mapping (removing last coordinate)...")
         
@@ -851,110 +2176,771 @@ class TreeAutomaton:
                     new_input_symbols[old_char] = self.input_symbols[old_char]
                     if verbose:
                         print(f"  {old_char} → {old_char} (unchanged, arity: {self.input_symbols[old_char]})")
-        
-        # Build new transitions by grouping old transitions that map to same new char
+        return char_mapping, new_input_symbols
+
+    def project_determinize(self, alphabet, j, treewidth=None):
+        """
+        project(alphabet, j) followed by determinize_reachable() in a single subset construction
+        (project_courcelle(alphabet, treewidth, j) if treewidth is given).
+        Successor subsets are read directly from the tables of the old chars behind each new char,
+        so the projected NTA and its merged successor lists are never built.
+        DTA states are frozensets of states as in determinize_reachable.
+        """
+        start_time = time.time()
+        print("Projecting away last coordinate and determinizing in one pass...")
+        if treewidth is not None:
+            new_alphabet = gen_courcelle_alphabet(treewidth, j - 1)
+        elif j - 1 == 0:
+            new_alphabet = alphabet
+        else:
+            new_alphabet = gen_new_alphabet(alphabet, j - 1)
+        char_mapping, new_input_symbols = self._projection_mapping(new_alphabet)
+
+        # Old chars behind every new char, one per symbol class (see symbol_classes)
+        old_class = self.symbol_classes()
+        old_chars_by_new = {}
+        for old_char, new_char in char_mapping.items():
+            if new_char in new_input_symbols:
+                old_chars_by_new.setdefault(new_char, {})[old_class[old_char]] = None
+        # New chars built from the same old classes get the same table
+        representative_of = {}
+        new_symbol_class = {}
+        for new_char, arity in new_input_symbols.items():
+            key = (arity, frozenset(old_chars_by_new.get(new_char, ())))
+            new_symbol_class[new_char] = representative_of.setdefault(key, new_char)
+        old_tables = {new_char: [self.transitions.get(old_char) for old_char in old_chars_by_new.get(new_char, ())]
+                      for new_char, representative in new_symbol_class.items() if representative == new_char}
+
+        leaf_symbols = [char for char, arity in new_input_symbols.items() if arity == 0 and char in old_tables]
+        unary_symbols = [char for char, arity in new_input_symbols.items() if arity == 1 and char in old_tables]
+        binary_symbols = [char for char, arity in new_input_symbols.items() if arity == 2 and char in old_tables]
+
+        def add_successors(states, result):
+            if result is None:
+                return
+            if isinstance(result, list):
+                states.update(result)
+            else:
+                states.add(result)
+
+        reachable_states = set()
+        new_transitions = {}
+        queue = deque()
+
+        def discover(new_state):
+            if new_state not in reachable_states:
+                reachable_states.add(new_state)
+                queue.append(new_state)
+
+        for char in leaf_symbols:
+            states = set()
+            for table in old_tables[char]:
+                add_successors(states, table)
+            new_transitions[char] = frozenset(states)
+            discover(new_transitions[char])
+        for char in unary_symbols + binary_symbols:
+            new_transitions[char] = {}
+
+        # left DTA state -> {right NTA state: successors} merged over the old chars and the NTA
+        # states in left; computed once per left state instead of once per pair
+        left_images = {char: {} for char in binary_symbols}
+
+        def left_image(char, left):
+            image = left_images[char].get(left)
+            if image is None:
+                image = {}
+                for table in old_tables[char]:
+                    if not table:
+                        continue
+                    for s1 in left:
+                        for s2, result in table.get(s1, {}).items():
+                            successors = image.setdefault(s2, set())
+                            if isinstance(result, list):
+                                successors.update(result)
+                            else:
+                                successors.add(result)
+                left_images[char][left] = image
+            return image
+
+        processed_states = []
+        pairs_computed = 0
+        while queue:
+            current_state = queue.popleft()
+            for char in unary_symbols:
+                states = set()
+                for table in old_tables[char]:
+                    if table:
+                        for state in current_state:
+                            add_successors(states, table.get(state))
+                new_transitions[char][current_state] = frozenset(states)
+                discover(new_transitions[char][current_state])
+
+            # Semi-naive as in determinize_reachable
+            processed_states.append(current_state)
+            for char in binary_symbols:
+                symbol_transitions = new_transitions[char]
+                for other in processed_states:
+                    pairs = [(current_state, other)] if other == current_state else [(current_state, other), (other, current_state)]
+                    for left, right in pairs:
+                        image = left_image(char, left)
+                        states = set()
+                        for s2 in right:
+                            successors = image.get(s2)
+                            if successors:
+                                states |= successors
+                        new_state = frozenset(states)
+                        symbol_transitions.setdefault(left, {})[right] = new_state
+                        pairs_computed += 1
+                        discover(new_state)
+
+        for char, representative in new_symbol_class.items():
+            if char != representative:
+                new_transitions[char] = new_transitions[representative]
+        new_final_states = {state for state in reachable_states if any(s in self.final_states for s in state)}
+        print(f"  ✓ Reachable DTA states: {len(reachable_states):,} | Final: {len(new_final_states):,} | Binary pairs computed: {pairs_computed:,} | Time: {time.time() - start_time:.2f}s")
+        dta = TreeAutomaton(
+            states=reachable_states,
+            input_symbols=new_input_symbols,
+            final_states=new_final_states,
+            transitions=new_transitions
+        )
+        dta._symbol_class = new_symbol_class
+        dta._complete_dta = True
+        return dta
+
+    def _project_transitions(self, char_mapping, new_input_symbols, copy_binary, verbose=False):
+        """
+        Transitions of a projection: every new char gets the union of the tables of the old chars
+        mapped to it. An inverse index new char -> old chars replaces the per-char scan of
+        char_mapping, only entries defined in the old tables are visited, and successors are
+        collected in sets so no state appears twice in a result.
+        With copy_binary the binary tables are kept as they are (project_courcelle, "//" has no tracks).
+        """
         if verbose:
             print("\nStep 2: Building new transitions...")
-        for new_char in new_input_symbols.keys():
-            arity = new_input_symbols[new_char]
-            
-            # Find all old chars that project to this new char
-            old_chars_for_new = [oc for oc, nc in char_mapping.items() if nc == new_char]
+        old_chars_by_new = {}
+        for old_char, new_char in char_mapping.items():
+            if new_char in new_input_symbols:
+                old_chars_by_new.setdefault(new_char, []).append(old_char)
+
+        def successors(result):
+            if result is None:
+                return ()
+            return result if isinstance(result, list) else (result,)
+
+        def as_result(states):
+            return next(iter(states)) if len(states) == 1 else list(states)
+
+        old_class = self.symbol_classes()
+        class_tables = {}
+        new_symbol_class = {}
+        new_transitions = {}
+        for new_char, arity in new_input_symbols.items():
+            # One old char per symbol class is enough, and new chars built from the same
+            # classes get the same table (see symbol_classes)
+            old_chars = list(dict.fromkeys(old_class[oc] for oc in old_chars_by_new.get(new_char, [])))
             if verbose:
-                print(f"\n  Processing '{new_char}' (arity={arity}):")
-                print(f"    Old chars projecting to this: {old_chars_for_new}")
-            
+                print(f"\n  Processing '{new_char}' (arity={arity}), old chars: {old_chars}")
+            new_symbol_class[new_char] = new_char
+            if arity == 2 and copy_binary:
+                new_transitions[new_char] = self.transitions[new_char]
+                continue
+            class_key = (arity, frozenset(old_chars))
+            if arity in (1, 2):
+                if class_key in class_tables:
+                    new_transitions[new_char] = new_transitions[class_tables[class_key]]
+                    new_symbol_class[new_char] = class_tables[class_key]
+                    continue
+                class_tables[class_key] = new_char
+
             if arity == 0:
-                # Leaf transitions: collect all states from old chars
-                collected_states = []
-                for old_char in old_chars_for_new:
-                    old_transition = self.transitions[old_char]
-                    if verbose:
-                        print(f"      From '{old_char}': {old_transition}")
-                    if isinstance(old_transition, list):
-                        collected_states.extend(old_transition)
-                    else:
-                        collected_states.append(old_transition)
-                
-                # Store as list if multiple states, single state otherwise
-                if len(collected_states) > 1:
-                    new_transitions[new_char] = collected_states
-                    if verbose:
-                        print(f"    → Result (nondeterministic): {collected_states}")
-                elif len(collected_states) == 1:
-                    new_transitions[new_char] = collected_states[0]
-                    if verbose:
-                        print(f"    → Result (deterministic): {collected_states[0]}")
-            
+                states = set()
+                for old_char in old_chars:
+                    states.update(successors(self.transitions.get(old_char)))
+                new_transitions[new_char] = as_result(states)
             elif arity == 1:
-                # Unary transitions
-                new_transitions[new_char] = {}
-                print("New char: ", new_char)
-                if verbose:
-                    print(f"    Building unary transitions...")
-                for state in self.states:
-                    combined_results = []
-                    for old_char in old_chars_for_new:
-                        if state in self.transitions[old_char]:
-                            result = self.transitions[old_char][state]
-                            if isinstance(result, list):
-                                combined_results.extend(result)
-                            else:
-                                combined_results.append(result)
-                    
-                    if len(combined_results) > 1:
-                        new_transitions[new_char][state] = combined_results
-                        if verbose:
-                            print(f"      δ({state}) = {combined_results} (nondeterministic)")
-                    elif len(combined_results) == 1:
-                        new_transitions[new_char][state] = combined_results[0]
-                        if verbose:
-                            print(f"      δ({state}) = {combined_results[0]}")
-            
+                merged = {}
+                for old_char in old_chars:
+                    for state, result in self.transitions.get(old_char, {}).items():
+                        merged.setdefault(state, set()).update(successors(result))
+                new_transitions[new_char] = {state: as_result(states) for state, states in merged.items() if states}
             elif arity == 2:
-                new_transitions[new_char] = self.transitions[new_char]
-                """
-                # Binary transitions
-                new_transitions[new_char] = {}
-                if verbose:
-                    print(f"    Building binary transitions...")
-                transition_count = 0
-                for state1 in self.states:
-                    new_transitions[new_char][state1] = {}
-                    for state2 in self.states:
-                        combined_results = []
-                        for old_char in old_chars_for_new:
-                            if state1 in self.transitions[old_char] and state2 in self.transitions[old_char][state1]:
-                                result = self.transitions[old_char][state1][state2]
-                                if isinstance(result, list):
-                                    combined_results.extend(result)
-                                else:
-                                    combined_results.append(result)
-                        
-                        if len(combined_results) > 1:
-                            new_transitions[new_char][state1][state2] = combined_results
-                            transition_count += 1
-                            if verbose and transition_count <= 5:  # Only print first few to avoid clutter
-                                print(f"      δ({state1}, {state2}) = {combined_results} (nondeterministic)")
-                        elif len(combined_results) == 1:
-                            new_transitions[new_char][state1][state2] = combined_results[0]
-                            transition_count += 1
-                            if verbose and transition_count <= 5:
-                                print(f"      δ({state1}, {state2}) = {combined_results[0]}")
-                if verbose and transition_count > 5:
-                    print(f"      ... and {transition_count - 5} more transitions")
-        """
-        if verbose:
-            print("\n" + "="*70)
-            print("PROJECTION COMPLETE")
-            print(f"New alphabet: {set(new_input_symbols.keys())}")
-            print(f"States: {self.states}")
-            print(f"Final states: {self.final_states}")
-            print("="*70 + "\n")
-        
+                merged = {}
+                for old_char in old_chars:
+                    for state1, row in self.transitions.get(old_char, {}).items():
+                        merged_row = merged.setdefault(state1, {})
+                        for state2, result in row.items():
+                            merged_row.setdefault(state2, set()).update(successors(result))
+                new_transitions[new_char] = {state1: {state2: as_result(states) for state2, states in row.items() if states}
+                                             for state1, row in merged.items()}
+            if verbose:
+                print(f"    → {new_transitions[new_char]}")
+        return new_transitions, new_symbol_class
+
+class LazyDeterminizedAutomaton:
+    """
+    On-the-fly subset simulation of an NTA.
+    Subset states are bitmasks as in TreeAutomaton.determinize_reachable(bitset=True), but
+    they are only computed for the (symbol, child subsets) combinations that occur in the
+    trees passed to run. Every computed transition is memoized, so later runs only pay for
+    combinations they have not seen before. With complement=True the accepting subsets
+    are flipped, which gives the complement without building the full DTA.
+    """
+    def __init__(self, nta, complement=False):
+        self.nta = nta
+        self.is_complement = complement
+        self.bit_of = nta._state_bits()
+        self.final_mask = 0
+        for state in nta.final_states:
+            if state in self.bit_of:
+                self.final_mask |= 1 << self.bit_of[state]
+        # Successor masks per symbol, converted from the NTA on first use
+        self.successor_masks = {}
+        # Memoized subset transitions
+        self.leaf_transitions = {}
+        self.unary_transitions = {}
+        self.binary_transitions = {}
+
+    def _to_mask(self, result):
+        mask = 0
+        for state in (result if isinstance(result, list) else [result]):
+            if state is not None:
+                mask |= 1 << self.bit_of[state]
+        return mask
+
+    def _masks(self, symbol):
+        masks = self.successor_masks.get(symbol)
+        if masks is None:
+            trans = self.nta.transitions.get(symbol, {})
+            if self.nta.input_symbols[symbol] == 1:
+                masks = {self.bit_of[state]: self._to_mask(result) for state, result in trans.items()}
+            else:
+                masks = {self.bit_of[state1]: {self.bit_of[state2]: self._to_mask(result) for state2, result in row.items()}
+                         for state1, row in trans.items()}
+            self.successor_masks[symbol] = masks
+        return masks
+
+    def step(self, symbol, children):
+        """Subset reached by symbol from the child subsets (bitmasks)."""
+        arity = self.nta.input_symbols[symbol]
+        if arity == 0:
+            new_state = self.leaf_transitions.get(symbol)
+            if new_state is None:
+                new_state = self._to_mask(self.nta.transitions.get(symbol))
+                self.leaf_transitions[symbol] = new_state
+        elif arity == 1:
+            key = (symbol, children[0])
+            new_state = self.unary_transitions.get(key)
+            if new_state is None:
+                masks = self._masks(symbol)
+                new_state = 0
+                for s in _iter_bits(children[0]):
+                    new_state |= masks.get(s, 0)
+                self.unary_transitions[key] = new_state
+        elif arity == 2:
+            key = (symbol, children[0], children[1])
+            new_state = self.binary_transitions.get(key)
+            if new_state is None:
+                masks = self._masks(symbol)
+                right_bits = list(_iter_bits(children[1]))
+                new_state = 0
+                for s1 in _iter_bits(children[0]):
+                    row = masks.get(s1)
+                    if row:
+                        for s2 in right_bits:
+                            new_state |= row.get(s2, 0)
+                self.binary_transitions[key] = new_state
+        else:
+            raise ValueError(f"Higher arity ({arity}) not supported for symbol {symbol}")
+        return new_state
+
+    def is_final(self, subset):
+        accepted = (subset & self.final_mask) != 0
+        return accepted != self.is_complement
+
+    # Nodes are evaluated in the tree's cached postorder, see RootedTree.postorder
+    def run(self, tree: RootedTree):
+        order, labels, label_ids, child_offsets, child_index = tree.postorder()
+        state_dict = [0] * len(order)
+        for i in range(len(order)):
+            label = labels[label_ids[i]]
+            if label in self.nta.input_symbols:
+                state_dict[i] = self.step(label, [state_dict[child] for child in child_index[child_offsets[i]:child_offsets[i + 1]]])
+            else:
+                print(label, " not in input symbols!")
+        return self.is_final(state_dict[-1])
+
+    # The simulated automaton is deterministic, so both runs coincide
+    nta_run = run
+
+    def cache_size(self):
+        return len(self.leaf_transitions) + len(self.unary_transitions) + len(self.binary_transitions)
+
+class CompiledTreeAutomaton:
+    """
+    Compact form of a TreeAutomaton.
+    States and symbols are interned to dense ints, successor sets are interned to
+    set ids (id 0 is always the empty set) and every symbol gets one flat table:
+        leaf:   delta[sym]               -> set id
+        unary:  delta[sym][q]            -> set id
+        binary: delta[sym][left*n+right] -> set id
+    Unary and binary tables are array('i') so no per-entry Python objects are kept.
+    Use TreeAutomaton.compile() to build one and to_tree_automaton() to get the dict form back.
+    """
+    def __init__(self, state_names, symbol_names, arities, final_states, delta, succ_sets):
+        self.state_names = state_names      # state id -> original state
+        self.state_ids = {s: i for i, s in enumerate(state_names)}
+        self.symbol_names = symbol_names    # symbol id -> original symbol
+        self.symbol_ids = {c: i for i, c in enumerate(symbol_names)}
+        self.arities = arities              # symbol id -> arity
+        self.final_states = final_states    # frozenset of state ids
+        self.delta = delta                  # symbol id -> set id / array of set ids
+        self.succ_sets = succ_sets          # set id -> sorted tuple of state ids
+        self.n = len(state_names)
+
+    @classmethod
+    def from_tree_automaton(cls, automaton):
+        # Intern the declared states first (sorted so the numbering is reproducible),
+        # then every state that only shows up inside the transition table.
+        state_names = sorted(automaton.states, key=_state_key)
+        state_ids = {s: i for i, s in enumerate(state_names)}
+
+        def add_state(s):
+            if s not in state_ids:
+                state_ids[s] = len(state_names)
+                state_names.append(s)
+
+        def add_result(result):
+            if isinstance(result, list):
+                for s in result:
+                    add_state(s)
+            elif result is not None:
+                add_state(result)
+
+        for char, arity in automaton.input_symbols.items():
+            trans = automaton.transitions.get(char)
+            if trans is None:
+                continue
+            if arity == 0:
+                add_result(trans)
+            elif arity == 1:
+                for q, result in trans.items():
+                    add_state(q)
+                    add_result(result)
+            elif arity == 2:
+                for left, row in trans.items():
+                    add_state(left)
+                    for right, result in row.items():
+                        add_state(right)
+                        add_result(result)
+            else:
+                raise ValueError(f"Higher arity ({arity}) not supported for symbol {char}")
+
+        n = len(state_names)
+        succ_sets = [()]
+        succ_ids = {(): 0}
+
+        def set_id(result):
+            if result is None:
+                ids = ()
+            elif isinstance(result, list):
+                ids = tuple(sorted({state_ids[s] for s in result}))
+            else:
+                ids = (state_ids[result],)
+            sid = succ_ids.get(ids)
+            if sid is None:
+                sid = len(succ_sets)
+                succ_ids[ids] = sid
+                succ_sets.append(ids)
+            return sid
+
+        symbol_names = list(automaton.input_symbols.keys())
+        arities = [automaton.input_symbols[c] for c in symbol_names]
+        delta = []
+        for char, arity in zip(symbol_names, arities):
+            trans = automaton.transitions.get(char)
+            if arity == 0:
+                delta.append(set_id(trans))
+            elif arity == 1:
+                table = array('i', [0]) * n
+                for q, result in (trans or {}).items():
+                    table[state_ids[q]] = set_id(result)
+                delta.append(table)
+            else:
+                table = array('i', [0]) * (n * n)
+                for left, row in (trans or {}).items():
+                    base = state_ids[left] * n
+                    for right, result in row.items():
+                        table[base + state_ids[right]] = set_id(result)
+                delta.append(table)
+
+        final_states = frozenset(state_ids[s] for s in automaton.final_states if s in state_ids)
+        return cls(state_names, symbol_names, arities, final_states, delta, succ_sets)
+
+    @property
+    def input_symbols(self):
+        return dict(zip(self.symbol_names, self.arities))
+
+    def _result(self, sid):
+        # Inverse of set_id: single state stays a scalar, several become a list
+        ids = self.succ_sets[sid]
+        if len(ids) == 1:
+            return self.state_names[ids[0]]
+        return [self.state_names[q] for q in ids]
+
+    def to_tree_automaton(self):
+        """Convert back to the dict-of-dict form used by the construction modules."""
+        n = self.n
+        names = self.state_names
+        transitions = {}
+        for sym, char in enumerate(self.symbol_names):
+            arity = self.arities[sym]
+            table = self.delta[sym]
+            if arity == 0:
+                transitions[char] = self._result(table)
+            elif arity == 1:
+                transitions[char] = {names[q]: self._result(table[q]) for q in range(n) if table[q]}
+            else:
+                transitions[char] = {}
+                for left in range(n):
+                    base = left * n
+                    row = {names[right]: self._result(table[base + right]) for right in range(n) if table[base + right]}
+                    if row:
+                        transitions[char][names[left]] = row
         return TreeAutomaton(
-            states=self.states,
-            input_symbols=new_input_symbols,
-            final_states=self.final_states,
-            transitions=new_transitions
-        )
\ No newline at end of file
+            states=set(names),
+            input_symbols={char: self.arities[sym] for sym, char in enumerate(self.symbol_names)},
+            final_states={names[q] for q in self.final_states},
+            transitions=transitions
+        )
+
+    def is_deterministic(self):
+        for sym, arity in enumerate(self.arities):
+            table = self.delta[sym]
+            if arity == 0:
+                if len(self.succ_sets[table]) > 1:
+                    return False
+            elif any(len(self.succ_sets[sid]) > 1 for sid in set(table)):
+                return False
+        return True
+
+    # Nodes are evaluated in the tree's cached postorder, see RootedTree.postorder
+    def nta_run(self, tree: RootedTree):
+        n = self.n
+        succ_sets = self.succ_sets
+        order, labels, label_ids, child_offsets, child_index = tree.postorder()
+        # Symbol id per distinct label of the tree, looked up once
+        label_syms = [self.symbol_ids.get(label) for label in labels]
+        state_dict = [()] * len(order)
+        for i in range(len(order)):
+            sym = label_syms[label_ids[i]]
+            if sym is None:
+                print(labels[label_ids[i]], " not in input symbols!")
+                continue
+            arity = self.arities[sym]
+            table = self.delta[sym]
+            first = child_offsets[i]
+            if arity == 0:
+                state_dict[i] = succ_sets[table]
+            elif arity == 1:
+                possible_states = set()
+                for q in state_dict[child_index[first]]:
+                    possible_states.update(succ_sets[table[q]])
+                state_dict[i] = possible_states
+            else:
+                possible_states = set()
+                right_states = state_dict[child_index[first + 1]]
+                for left in state_dict[child_index[first]]:
+                    base = left * n
+                    for right in right_states:
+                        possible_states.update(succ_sets[table[base + right]])
+                state_dict[i] = possible_states
+        return any(q in self.final_states for q in state_dict[-1])
+
+    def run(self, tree: RootedTree):
+        # Deterministic run, a missing transition (empty set) rejects the tree.
+        # Nondeterministic entries pick a random option like TreeAutomaton.run.
+        n = self.n
+        succ_sets = self.succ_sets
+        order, labels, label_ids, child_offsets, child_index = tree.postorder()
+        label_syms = [self.symbol_ids.get(label) for label in labels]
+        state_dict = [0] * len(order)
+        for i in range(len(order)):
+            sym = label_syms[label_ids[i]]
+            if sym is None:
+                print(labels[label_ids[i]], " not in input symbols!")
+                return False
+            arity = self.arities[sym]
+            table = self.delta[sym]
+            first = child_offsets[i]
+            if arity == 0:
+                sid = table
+            elif arity == 1:
+                sid = table[state_dict[child_index[first]]]
+            else:
+                sid = table[state_dict[child_index[first]] * n + state_dict[child_index[first + 1]]]
+            ids = succ_sets[sid]
+            if not ids:
+                return False
+            state_dict[i] = ids[0] if len(ids) == 1 else random.choice(ids)
+        return state_dict[-1] in self.final_states
+
+    def determinize_reachable(self):
+        """
+        Subset construction over the reachable subsets only.
+        Subsets are sorted tuples of NTA state ids and get dense ids in discovery order.
+        A state popped from the queue is combined with every state popped before it
+        (and itself) in both argument positions, so every pair is computed exactly once.
+        """
+        succ_sets = self.succ_sets
+        n = self.n
+        subsets = []
+        subset_ids = {}
+        queue = deque()
+
+        def intern(ids):
+            key = tuple(sorted(ids))
+            sid = subset_ids.get(key)
+            if sid is None:
+                sid = len(subsets)
+                subset_ids[key] = sid
+                subsets.append(key)
+                queue.append(sid)
+            return sid
+
+        leaf_det = {}
+        unary_det = {}
+        binary_det = {}
+        for sym, arity in enumerate(self.arities):
+            if arity == 0:
+                leaf_det[sym] = intern(succ_sets[self.delta[sym]])
+            elif arity == 1:
+                unary_det[sym] = {}
+            else:
+                binary_det[sym] = {}
+
+        def step_binary(table, left, right):
+            resulting_states = set()
+            right_ids = subsets[right]
+            for s1 in subsets[left]:
+                base = s1 * n
+                for s2 in right_ids:
+                    resulting_states.update(succ_sets[table[base + s2]])
+            return intern(resulting_states)
+
+        while queue:
+            current = queue.popleft()
+            current_ids = subsets[current]
+            for sym, row in unary_det.items():
+                table = self.delta[sym]
+                resulting_states = set()
+                for q in current_ids:
+                    resulting_states.update(succ_sets[table[q]])
+                row[current] = intern(resulting_states)
+            for sym, pairs in binary_det.items():
+                table = self.delta[sym]
+                for other in range(current + 1):
+                    pairs[(current, other)] = step_binary(table, current, other)
+                    if other != current:
+                        pairs[(other, current)] = step_binary(table, other, current)
+
+        # Pack into tables; in the DTA state i has the singleton set id i + 1
+        m = len(subsets)
+        new_succ_sets = [()] + [(q,) for q in range(m)]
+        delta = []
+        for sym, arity in enumerate(self.arities):
+            if arity == 0:
+                delta.append(leaf_det[sym] + 1)
+            elif arity == 1:
+                table = array('i', [0]) * m
+                for q, target in unary_det[sym].items():
+                    table[q] = target + 1
+                delta.append(table)
+            else:
+                table = array('i', [0]) * (m * m)
+                for (left, right), target in binary_det[sym].items():
+                    table[left * m + right] = target + 1
+                delta.append(table)
+
+        state_names = [frozenset(self.state_names[q] for q in subset) for subset in subsets]
+        final_states = frozenset(i for i, subset in enumerate(subsets) if any(q in self.final_states for q in subset))
+        return CompiledTreeAutomaton(state_names, list(self.symbol_names), list(self.arities), final_states, delta, new_succ_sets)
+
+    def complement(self):
+        dta = self if self.is_deterministic() and self._is_complete() else self.determinize_reachable()
+        return CompiledTreeAutomaton(
+            dta.state_names, dta.symbol_names, dta.arities,
+            frozenset(range(dta.n)) - dta.final_states,
+            dta.delta, dta.succ_sets
+        )
+
+    def _is_complete(self):
+        for sym, arity in enumerate(self.arities):
+            table = self.delta[sym]
+            if arity == 0:
+                if not table:
+                    return False
+            elif 0 in table:
+                return False
+        return True
+
+    def _product(self, other, is_final, keep_partial=False):
+        # Product over the reachable pairs only, as TreeAutomaton._product_reachable: pairs get dense
+        # ids in discovery order, starting from the leaf pairs, and a popped pair is combined with
+        # every pair popped before it (and itself) in both argument positions.
+        # With keep_partial (union) each side gets an extra absent state (id n1 resp. n2, name None)
+        # without transitions, so a pair whose one side has no successor continues on the other side.
+        if self.input_symbols != other.input_symbols:
+            raise ValueError("Product of automata over different alphabets")
+        n1, n2 = self.n, other.n
+        pairs = []
+        pair_ids = {}
+        queue = deque()
+        succ_sets = [()]
+        succ_ids = {(): 0}
+        pair_cache = {}
+
+        def intern(pair):
+            pid = pair_ids.get(pair)
+            if pid is None:
+                pid = len(pairs)
+                pair_ids[pair] = pid
+                pairs.append(pair)
+                queue.append(pid)
+            return pid
+
+        def pair_set(sid1, sid2):
+            sid = pair_cache.get((sid1, sid2))
+            if sid is None:
+                set1, set2 = self.succ_sets[sid1], other.succ_sets[sid2]
+                if keep_partial and (set1 or set2):
+                    set1, set2 = set1 or (n1,), set2 or (n2,)
+                ids = tuple(sorted(intern((a, b)) for a in set1 for b in set2))
+                sid = succ_ids.get(ids)
+                if sid is None:
+                    sid = len(succ_sets)
+                    succ_ids[ids] = sid
+                    succ_sets.append(ids)
+                pair_cache[(sid1, sid2)] = sid
+            return sid
+
+        leaf_sets = {}
+        unary = {}
+        binary = {}
+        for sym, char in enumerate(self.symbol_names):
+            t1, t2 = self.delta[sym], other.delta[other.symbol_ids[char]]
+            if self.arities[sym] == 0:
+                leaf_sets[sym] = pair_set(t1, t2)
+            elif self.arities[sym] == 1:
+                unary[sym] = (t1, t2, {})
+            else:
+                binary[sym] = (t1, t2, {})
+
+        def step_binary(t1, t2, left, right):
+            (l1, l2), (r1, r2) = pairs[left], pairs[right]
+            sid1 = t1[l1 * n1 + r1] if l1 < n1 and r1 < n1 else 0
+            sid2 = t2[l2 * n2 + r2] if l2 < n2 and r2 < n2 else 0
+            return pair_set(sid1, sid2)
+
+        while queue:
+            current = queue.popleft()
+            s1, s2 = pairs[current]
+            for t1, t2, row in unary.values():
+                row[current] = pair_set(t1[s1] if s1 < n1 else 0, t2[s2] if s2 < n2 else 0)
+            for t1, t2, entries in binary.values():
+                for other_pair in range(current + 1):
+                    entries[(current, other_pair)] = step_binary(t1, t2, current, other_pair)
+                    if other_pair != current:
+                        entries[(other_pair, current)] = step_binary(t1, t2, other_pair, current)
+
+        m = len(pairs)
+        delta = []
+        for sym, arity in enumerate(self.arities):
+            if arity == 0:
+                delta.append(leaf_sets[sym])
+            elif arity == 1:
+                table = array('i', [0]) * m
+                for q, sid in unary[sym][2].items():
+                    table[q] = sid
+                delta.append(table)
+            else:
+                table = array('i', [0]) * (m * m)
+                for (left, right), sid in binary[sym][2].items():
+                    table[left * m + right] = sid
+                delta.append(table)
+
+        names1 = list(self.state_names) + [None]
+        names2 = list(other.state_names) + [None]
+        state_names = [(names1[s1], names2[s2]) for s1, s2 in pairs]
+        final_states = frozenset(
+            pid for pid, (s1, s2) in enumerate(pairs)
+            if is_final(s1 in self.final_states, s2 in other.final_states)
+        )
+        return CompiledTreeAutomaton(state_names, list(self.symbol_names), list(self.arities), final_states, delta, succ_sets)
+
+    def union(self, other):
+        return self._product(other, lambda f1, f2: f1 or f2, keep_partial=True)
+
+    def cut(self, other):
+        return self._product(other, lambda f1, f2: f1 and f2)
+
+    def project(self, alphabet, j):
+        # Same symbol mapping as TreeAutomaton.project
+        new_alphabet = alphabet if j - 1 == 0 else gen_new_alphabet(alphabet, j - 1)
+        return self._project(new_alphabet, merge_binary=True)
+
+    def project_courcelle(self, alphabet, treewidth, j):
+        # Same symbol mapping as TreeAutomaton.project_courcelle, "//" is kept as is
+        new_alphabet = gen_courcelle_alphabet(treewidth, j - 1)
+        return self._project(new_alphabet, merge_binary=False)
+
+    def _project(self, new_alphabet, merge_binary):
+        groups = {}
+        for sym, old_char in enumerate(self.symbol_names):
+            if isinstance(old_char, tuple):
+                new_char = old_char[:-1]
+                if len(new_char) == 1:
+                    new_char = new_char[0]
+            else:
+                new_char = old_char
+            if new_char in new_alphabet:
+                groups.setdefault(new_char, []).append(sym)
+
+        succ_sets = list(self.succ_sets)
+        succ_ids = {ids: sid for sid, ids in enumerate(succ_sets)}
+        union_cache = {}
+
+        def union_set(sids):
+            if len(sids) == 1:
+                return sids[0]
+            sid = union_cache.get(sids)
+            if sid is None:
+                ids = set()
+                for s in sids:
+                    ids.update(succ_sets[s])
+                ids = tuple(sorted(ids))
+                sid = succ_ids.get(ids)
+                if sid is None:
+                    sid = len(succ_sets)
+                    succ_ids[ids] = sid
+                    succ_sets.append(ids)
+                union_cache[sids] = sid
+            return sid
+
+        symbol_names = []
+        arities = []
+        delta = []
+        for new_char, old_syms in groups.items():
+            arity = self.arities[old_syms[-1]]
+            symbol_names.append(new_char)
+            arities.append(arity)
+            if arity == 0:
+                delta.append(union_set(tuple(self.delta[s] for s in old_syms)))
+            elif arity == 2 and not merge_binary:
+                delta.append(self.delta[self.symbol_ids[new_char]])
+            elif len(old_syms) == 1:
+                delta.append(self.delta[old_syms[0]])
+            else:
+                tables = [self.delta[s] for s in old_syms]
+                delta.append(array('i', [union_set(entries) for entries in zip(*tables)]))
+        return CompiledTreeAutomaton(list(self.state_names), symbol_names, arities, self.final_states, delta, succ_sets)
@@ -1,3 +1,4 @@
+from array import array
 
 class Bag:
     def __init__(self, label, vertices:set):
@@ -98,15 +99,80 @@ class RootedTree():
 
     def __repr__(self):
         return str(self.root)
+
+    # Reassigning root or nodes drops the cached evaluation order
+    @property
+    def root(self):
+        return self._root
+
+    @root.setter
+    def root(self, root:Node):
+        self._root = root
+        self._postorder = None
+
+    @property
+    def nodes(self):
+        return self._nodes
+
+    @nodes.setter
+    def nodes(self, nodes):
+        self._nodes = nodes
+        self._postorder = None
     
     def add_node(self, node:Node):  
         self.nodes.append(node)
+        self._postorder = None
 
     def set_root(self, root:Node):
         self.root = root
     
     def add_edge(self, parent:Node, child:Node):
         parent.add_child(child)
+        self._postorder = None
+
+    def invalidate_order(self):
+        # Call after changing Node.children directly (not through add_edge)
+        self._postorder = None
+
+    def postorder(self):
+        """
+        Evaluation order of the tree reachable from root, children before parents.
+        Returns (order, labels, label_ids, child_offsets, child_index) as parallel arrays:
+        order[i] is the Node at position i, labels[label_ids[i]] its label and its children
+        are at positions child_index[child_offsets[i]:child_offsets[i + 1]].
+        Computed iteratively (no recursion limit) and cached until the tree changes.
+        """
+        if self._postorder is not None and self._postorder[0] == len(self._nodes):
+            return self._postorder[1]
+        order = []
+        position = {}
+        labels = []
+        label_id = {}
+        label_ids = array('l')
+        child_offsets = array('l', [0])
+        child_index = array('l')
+        stack = [(self._root, False)] if self._root is not None else []
+        while stack:
+            node, expanded = stack.pop()
+            if not expanded:
+                stack.append((node, True))
+                for child in reversed(node.children):
+                    stack.append((child, False))
+                continue
+            position[id(node)] = len(order)
+            order.append(node)
+            lid = label_id.get(node.label)
+            if lid is None:
+                lid = len(labels)
+                label_id[node.label] = lid
+                labels.append(node.label)
+            label_ids.append(lid)
+            child_index.extend(position[id(child)] for child in node.children)
+            child_offsets.append(len(child_index))
+        result = (order, labels, label_ids, child_offsets, child_index)
+        # The node count catches appends to the nodes list that bypass add_node
+        self._postorder = (len(self._nodes), result)
+        return result
 
     def build_subtree(tree:Tree, bag:Bag, visited:set):
         visited.add(bag)
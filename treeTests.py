@@ -97,4 +97,437 @@ result_states_cut = even_a.cut(even_b).run(t1)
 print("cut of even_a and even_b:", result_states_cut)
 
 result_states_cut_odd_a_even_b = even_a.complement().cut(even_b).run(t1)
-print("cut of odd_a and even_b:", result_states_cut_odd_a_even_b)
\ No newline at end of file
+print("cut of odd_a and even_b:", result_states_cut_odd_a_even_b)
+
+# Differential checks: products against nta_run of the operands on all small trees
+import itertools
+import random
+
+diff_symbols = {"a": 0, "b": 0, "g": 1, "f": 2, "h": 2}
+
+def random_automaton(rng, n=3, symbols=diff_symbols, deterministic=False):
+    # Partial on purpose: missing rows and empty leaf results must still reject correctly
+    states = [f"q{i}" for i in range(n)]
+    def successors():
+        if deterministic:
+            return rng.choice(states)
+        return rng.sample(states, rng.choice([0, 0, 1, 1, 2]))
+    transitions = {}
+    for sym, arity in symbols.items():
+        if arity == 0:
+            transitions[sym] = successors()
+        elif arity == 1:
+            transitions[sym] = {s: successors() for s in states if rng.random() < 0.8}
+        else:
+            transitions[sym] = {l: {r: successors() for r in states if rng.random() < 0.8}
+                                for l in states if rng.random() < 0.8}
+    return TreeAutomaton(set(states), dict(symbols), set(rng.sample(states, rng.randint(1, n))), transitions)
+
+def small_trees(depth, limit=150):
+    roots = [Node(sym, 0, []) for sym in ("a", "b")]
+    for _ in range(depth):
+        grown = list(roots) + [Node("g", 0, [c]) for c in roots]
+        for sym, (l, r) in zip(itertools.cycle(("f", "h")), itertools.product(roots[:10], roots[:10])):
+            grown.append(Node(sym, 0, [l, r]))
+        roots = grown[:limit]
+    trees = []
+    for root in roots:
+        nodes, stack = [], [root]
+        while stack:
+            node = stack.pop()
+            nodes.append(node)
+            stack.extend(node.children)
+        trees.append(RootedTree(root, nodes))
+    return trees
+
+def check_products(name, build, combine, pairs, trees):
+    mismatches = 0
+    for A, B in pairs:
+        product = build(A, B)
+        for tree in trees:
+            if product.nta_run(tree) != combine(A.nta_run(tree), B.nta_run(tree)):
+                mismatches += 1
+    status = "✓" if mismatches == 0 else "✗"
+    print(f"  {status} {name}: {mismatches} mismatches over {len(pairs)} pairs x {len(trees)} trees")
+    return mismatches
+
+def check_languages(name, build, expected, automata, trees):
+    # build(A) must accept exactly the trees t with expected(A, t)
+    mismatches = 0
+    for A in automata:
+        result = build(A)
+        for tree in trees:
+            if result.nta_run(tree) != expected(A, tree):
+                mismatches += 1
+    status = "✓" if mismatches == 0 else "✗"
+    print(f"  {status} {name}: {mismatches} mismatches over {len(automata)} automata x {len(trees)} trees")
+    return mismatches
+
+def check(name, failures):
+    print(f"  {'✓' if failures == 0 else '✗'} {name}")
+    return failures
+
+same_language = lambda A, tree: A.nta_run(tree)
+
+diff_rng = random.Random(7)
+diff_pairs = [(random_automaton(diff_rng), random_automaton(diff_rng)) for _ in range(25)]
+diff_trees = small_trees(3)
+either = lambda x, y: x or y
+both = lambda x, y: x and y
+
+print("\nDifferential checks:")
+diff_failures = 0
+diff_failures += check_products("union", lambda A, B: A.union(B), either, diff_pairs, diff_trees)
+diff_failures += check_products("cut", lambda A, B: A.cut(B), both, diff_pairs, diff_trees)
+diff_failures += check_products("trim+union", lambda A, B: A.trim().union(B.trim()), either, diff_pairs, diff_trees)
+diff_failures += check_products("trim+cut", lambda A, B: A.trim().cut(B.trim()), both, diff_pairs, diff_trees)
+diff_failures += check_languages("trim keeps the language", lambda A: A.trim(), same_language, [A for pair in diff_pairs for A in pair], diff_trees)
+# "r" is only used inside the transitions, trim must keep it without counting it as declared
+undeclared = TreeAutomaton({"q"}, {"a": 0, "g": 1}, {"r"}, {"a": "q", "g": {"q": "r"}})
+diff_failures += check("trim keeps states that are only used in transitions", undeclared.trim().states != {"q", "r"})
+
+# Thresholds at 0 so even these small products compute every round in the process pool
+def pool_product(A, B, is_final, keep_partial):
+    return A._product_reachable(B, is_final, workers=2, min_parallel_states=0, min_parallel_pairs=0, keep_partial=keep_partial)
+
+# Workers started by spawn re-import this script, only the main process builds pools
+if __name__ == "__main__":
+    diff_failures += check_products("union (process pool)", lambda A, B: pool_product(A, B, either, True), either, diff_pairs, diff_trees)
+    diff_failures += check_products("cut (process pool)", lambda A, B: pool_product(A, B, both, False), both, diff_pairs, diff_trees)
+diff_failures += check_products("compiled union", lambda A, B: A.compile().union(B.compile()), either, diff_pairs, diff_trees)
+diff_failures += check_products("compiled cut", lambda A, B: A.compile().cut(B.compile()), both, diff_pairs, diff_trees)
+
+try:
+    even_a.union(diff_pairs[0][0])
+    print("  ✗ union over different alphabets was not rejected")
+    diff_failures += 1
+except ValueError:
+    print("  ✓ union over different alphabets raises ValueError")
+
+from symbolicTreeAutomata import SymbolicTreeAutomaton
+from bdd import BDD
+
+def symbolic_product(A, B, method):
+    manager = BDD()
+    return getattr(SymbolicTreeAutomaton.from_tree_automaton(A, manager), method)(
+        SymbolicTreeAutomaton.from_tree_automaton(B, manager))
+
+diff_failures += check_products("symbolic union", lambda A, B: symbolic_product(A, B, "union"), either, diff_pairs, diff_trees)
+diff_failures += check_products("symbolic cut", lambda A, B: symbolic_product(A, B, "cut"), both, diff_pairs, diff_trees)
+
+# One track bit per symbol, so the symbolic product combines real BDDs
+tracked_symbols = {(sym, bit): arity for sym, arity in diff_symbols.items() for bit in (0, 1)}
+tracked_pairs = [(random_automaton(diff_rng, symbols=tracked_symbols), random_automaton(diff_rng, symbols=tracked_symbols))
+                 for _ in range(25)]
+def with_track(tree):
+    # Fresh nodes: small_trees shares subtrees between trees
+    order = tree.postorder()[0]
+    copies = {}
+    for position, node in enumerate(order):
+        copies[id(node)] = Node((node.label, position % 2), node.id, [copies[id(c)] for c in node.children])
+    return RootedTree(copies[id(tree.root)], list(copies.values()))
+
+tracked_trees = [with_track(tree) for tree in diff_trees]
+diff_failures += check_products("symbolic union (k=1)", lambda A, B: symbolic_product(A, B, "union"), either, tracked_pairs, tracked_trees)
+diff_failures += check_products("symbolic cut (k=1)", lambda A, B: symbolic_product(A, B, "cut"), both, tracked_pairs, tracked_trees)
+
+try:
+    symbolic_product(diff_pairs[0][0], tracked_pairs[0][0], "union")
+    print("  ✗ symbolic union over different alphabets was not rejected")
+    diff_failures += 1
+except ValueError:
+    print("  ✓ symbolic union over different alphabets raises ValueError")
+
+# The MSO parser must build the same language with and without pruning of empty subformulas
+from MSOtoNTA import MSO_to_NTA_Parser
+
+mso_alphabet = {"a": 2, "b": 2, "c": 2, "d": 1, "m": 0, "n": 0}
+mso_names = {"a": "m", "b": "n", "g": "d", "f": "a", "h": "b"}
+
+def with_labels(tree, names):
+    order = tree.postorder()[0]
+    copies = {}
+    for node in order:
+        copies[id(node)] = Node(names[node.label], node.id, [copies[id(c)] for c in node.children])
+    return RootedTree(copies[id(tree.root)], list(copies.values()))
+
+mso_trees = [with_labels(tree, mso_names) for tree in diff_trees]
+mso_formulas = [
+    ("∃x(and(P_a(x),P_b(x)))", 1, lambda labels: False),
+    ("∀x(->(and(P_a(x),P_b(x)),P_c(x)))", 1, lambda labels: True),
+    ("∃x(or(P_a(x),P_d(x)))", 1, lambda labels: "a" in labels or "d" in labels),
+    ("∃x(∃y(and(P_n(x),not(P_n(y)))))", 2, lambda labels: "n" in labels and labels != {"n"}),
+]
+for formula, k, expected in mso_formulas:
+    mismatches = 0
+    for options in ({}, {"prune_empty": True}, {"compiled": True}):
+        parser = MSO_to_NTA_Parser(mso_alphabet, k, **options)
+        automaton = parser.build_automaton(parser.build_ast(formula))
+        for tree in mso_trees:
+            if automaton.nta_run(tree) != expected({node.label for node in tree.nodes}):
+                mismatches += 1
+    status = "✓" if mismatches == 0 else "✗"
+    print(f"  {status} {formula} explicit, with prune_empty and compiled: {mismatches} mismatches over {len(mso_trees)} trees")
+    diff_failures += mismatches
+
+print("\nMinimization:")
+diff_automata = [random_automaton(diff_rng, n=4, deterministic=True) for _ in range(25)] + [A for A, _ in diff_pairs]
+minimized = [A.minimize() for A in diff_automata]
+diff_failures += check_languages("minimize keeps the language", lambda A: minimized[diff_automata.index(A)], same_language, diff_automata, diff_trees)
+diff_failures += check("minimizing twice changes nothing",
+                       sum(len(M.minimize().states) != len(M.states) for M in minimized))
+diff_failures += check("minimize never adds states to a deterministic automaton",
+                       sum(len(M.states) > len(A.states) for A, M in zip(diff_automata, minimized) if A.is_deterministic()))
+diff_failures += check("even a's and even b's minimizes to 4 states", len(even_a.cut(even_b).minimize().states) != 4)
+# Counts 'a' nodes mod 4 and accepts 0 and 2, the same language as even_a
+mod4 = {f"p{i}": {f"p{j}": f"p{(i + j + 1) % 4}" for j in range(4)} for i in range(4)}
+plain = {f"p{i}": {f"p{j}": f"p{(i + j) % 4}" for j in range(4)} for i in range(4)}
+even_a_mod4 = TreeAutomaton({f"p{i}" for i in range(4)}, {"a": 2, "b": 2, "leaf": 0}, {"p0", "p2"},
+                            {"leaf": "p0", "a": mod4, "b": plain})
+diff_failures += check("a-count mod 4 with finals {0, 2} minimizes to 2 states", len(even_a_mod4.minimize().states) != 2)
+diff_failures += check("minimize of a partial DTA with a missing binary table",
+                       len(TreeAutomaton({"q"}, {"a": 0, "f": 2, "g": 1}, {"q"}, {"a": "q", "g": {"q": "q"}}).minimize().states) != 1)
+
+print("\nDeterminization:")
+diff_failures += check_languages("determinize_reachable (frozenset subsets)", lambda A: A.determinize_reachable(), same_language, diff_automata, diff_trees)
+diff_failures += check_languages("determinize_reachable (bitset subsets)", lambda A: A.determinize_reachable(bitset=True), same_language, diff_automata, diff_trees)
+diff_failures += check_languages("compiled determinize_reachable", lambda A: A.compile().determinize_reachable(), same_language, diff_automata, diff_trees)
+diff_failures += check("determinize_reachable results are deterministic",
+                       sum(not A.determinize_reachable(bitset=bitset).is_deterministic() for A in diff_automata for bitset in (False, True)))
+if __name__ == "__main__":
+    # Threshold at 0 so every round goes through the process pool
+    parallel = [A._determinize_reachable_parallel(2, min_parallel_pairs=0) for A in diff_automata]
+    diff_failures += check_languages("determinize_reachable (workers=2)", lambda A: parallel[diff_automata.index(A)], same_language, diff_automata, diff_trees)
+    repeated = [A._determinize_reachable_parallel(3, min_parallel_pairs=0) for A in diff_automata]
+    diff_failures += check("parallel runs give identical state numbering and transitions",
+                           sum((P.states, P.final_states, P.transitions) != (Q.states, Q.final_states, Q.transitions)
+                               for P, Q in zip(parallel, repeated)))
+    diff_failures += check("parallel and in-process bitset runs agree",
+                           sum(P.transitions != A.determinize_reachable(bitset=True).transitions for A, P in zip(diff_automata, parallel)))
+
+print("\nRunners:")
+diff_failures += check("lazy_determinize agrees with nta_run",
+                       sum(A.lazy_determinize().run(tree) != A.nta_run(tree) for A in diff_automata for tree in diff_trees))
+diff_failures += check("lazy_complement agrees with complement().nta_run",
+                       sum(L.run(tree) != C.nta_run(tree) for A in diff_automata
+                           for L, C in [(A.lazy_complement(), A.complement())] for tree in diff_trees))
+diff_failures += check("lazy_complement rejects exactly the accepted trees",
+                       sum(A.lazy_complement().run(tree) == A.nta_run(tree) for A in diff_automata for tree in diff_trees))
+runners = [(A, A.determinize_reachable().compile_runner()) for A in diff_automata]
+diff_failures += check("compile_runner agrees with nta_run",
+                       sum(run(tree) != A.nta_run(tree) for A, run in runners for tree in diff_trees))
+diff_failures += check("compile_runner batch agrees with nta_run",
+                       sum(run.batch(diff_trees) != [A.nta_run(tree) for tree in diff_trees] for A, run in runners))
+diff_failures += check("nta_run_batch agrees with nta_run",
+                       sum(A.nta_run_batch(diff_trees) != [A.nta_run(tree) for tree in diff_trees] for A in diff_automata))
+
+print("\nEmptiness and witnesses:")
+witness_failures = 0
+for A in diff_automata + [A.cut(A.complement()) for A in diff_automata[:10]]:
+    witness = A.witness()
+    accepted = [tree for tree in diff_trees if A.nta_run(tree)]
+    if witness is None:
+        witness_failures += (not A.is_empty()) + len(accepted)
+    else:
+        # The witness is accepted and no accepted tree is smaller
+        witness_failures += A.is_empty() + (not A.nta_run(witness))
+        witness_failures += any(len(tree.postorder()[0]) < len(witness.postorder()[0]) for tree in accepted)
+diff_failures += check("witness() is accepted, minimal and agrees with is_empty()", witness_failures)
+
+print("\nUniversality and inclusion:")
+universal_cases = diff_automata[:20] + [A.union(A.complement()) for A in diff_automata[:5]] + [TreeAutomaton.one_state(diff_symbols, accepting=True)]
+universal_failures = 0
+for A in universal_cases:
+    counterexample = A.universality_counterexample()
+    universal_failures += A.is_universal() != A.complement().is_empty()
+    if counterexample is not None:
+        universal_failures += A.nta_run(counterexample)
+diff_failures += check("is_universal agrees with complement().is_empty(), counterexamples are rejected", universal_failures)
+diff_failures += check("some of these automata are universal", int(not any(A.is_universal() for A in universal_cases)))
+inclusion_failures = 0
+inclusion_pairs = diff_pairs[:15] + [(A.union(B), A) for A, B in diff_pairs[:5]] + [(A, A.cut(B)) for A, B in diff_pairs[:5]]
+for A, B in inclusion_pairs:
+    counterexample = A.inclusion_counterexample(B)
+    inclusion_failures += A.includes(B) != B.cut(A.complement()).is_empty()
+    if counterexample is not None:
+        inclusion_failures += A.nta_run(counterexample) or not B.nta_run(counterexample)
+diff_failures += check("includes agrees with complement and emptiness, counterexamples are genuine", inclusion_failures)
+
+print("\nSimulation:")
+diff_failures += check_languages("reduce_simulation keeps the language", lambda A: A.reduce_simulation(), same_language, diff_automata, diff_trees)
+diff_failures += check_languages("quotient_simulation keeps the language", lambda A: A.quotient_simulation(), same_language, diff_automata, diff_trees)
+diff_failures += check_languages("prune_simulation keeps the language", lambda A: A.prune_simulation(), same_language, diff_automata, diff_trees)
+
+print("\nSymbol classes:")
+def table_states(arity, table):
+    # Comparable view of a transition table: a single state and a one-element list are the same
+    def as_set(result):
+        return frozenset(result if isinstance(result, list) else [] if result is None else [result])
+    if arity == 0:
+        return as_set(table)
+    if arity == 1:
+        return {state: as_set(result) for state, result in (table or {}).items() if as_set(result)}
+    return {(l, r): as_set(result) for l, row in (table or {}).items() for r, result in row.items() if as_set(result)}
+
+# Copies of symbols with identical tables, so the classes are not all singletons
+copied = []
+for A in diff_automata:
+    symbols = dict(A.input_symbols)
+    transitions = dict(A.transitions)
+    for char in list(symbols):
+        symbols[char + "2"] = symbols[char]
+        transitions[char + "2"] = A.transitions.get(char)
+    copied.append(TreeAutomaton(set(A.states), symbols, set(A.final_states), transitions))
+class_failures = 0
+for A in copied:
+    classes = A.symbol_classes()
+    for char, representative in classes.items():
+        arity = A.input_symbols[char]
+        class_failures += A.input_symbols[representative] != arity
+        class_failures += table_states(arity, A.transitions.get(char)) != table_states(arity, A.transitions.get(representative))
+    class_failures += any(classes[char + "2"] != classes[char] for char in diff_symbols)
+diff_failures += check("symbol_classes maps every symbol to a representative with an identical table", class_failures)
+
+print("\nPostorder:")
+def postorder_errors(tree):
+    # small_trees shares subtrees, so a node may occur more than once in the order
+    order, labels, label_ids, child_offsets, child_index = tree.postorder()
+    errors = 0
+    for i, node in enumerate(order):
+        positions = child_index[child_offsets[i]:child_offsets[i + 1]]
+        errors += [order[j] for j in positions] != node.children or labels[label_ids[i]] != node.label
+        errors += any(j >= i for j in positions)
+    return errors + (order[-1] is not tree.root)
+
+postorder_failures = sum(postorder_errors(tree) for tree in diff_trees)
+# Nodes listed and attached out of order; the order cached before add_edge must be dropped
+shuffled_rng = random.Random(1)
+for tree in diff_trees[:30]:
+    copies = {id(node): Node(node.label, node.id, []) for node in tree.nodes}
+    nodes = list(copies.values())
+    shuffled_rng.shuffle(nodes)
+    rebuilt = RootedTree(copies[id(tree.root)], nodes)
+    rebuilt.postorder()
+    edges = [(node, child) for node in tree.nodes for child in node.children]
+    shuffled_rng.shuffle(edges)
+    for node, child in edges:
+        rebuilt.add_edge(copies[id(node)], copies[id(child)])
+    postorder_failures += postorder_errors(rebuilt)
+diff_failures += check("postorder lists children before parents for trees built out of order", postorder_failures)
+chain_root = Node("a", 0, [])
+chain_nodes = [chain_root]
+for i in range(10000):
+    chain_root = Node("g", i + 1, [chain_root])
+    chain_nodes.append(chain_root)
+chain = RootedTree(chain_root, chain_nodes)
+chain_failures = postorder_errors(chain)
+for A in diff_automata[:5]:
+    chain_failures += A.nta_run(chain) != A.nta_run_batch([chain])[0]
+diff_failures += check("a 10,000 node chain runs without recursion", chain_failures)
+
+print("\nBDD:")
+from symbolicTreeAutomata import _union
+bdd_rng = random.Random(2)
+bdd_failures = 0
+for k in (0, 1, 2, 3, 4):
+    manager = BDD()
+    for _ in range(20):
+        values = [frozenset(), frozenset({"p"}), frozenset({"q"}), frozenset({"p", "q"})]
+        table = {bits: bdd_rng.choice(values) for bits in itertools.product((0, 1), repeat=k) if bdd_rng.random() < 0.7}
+        u = manager.from_table(table, k, frozenset())
+        full = {bits: table.get(bits, frozenset()) for bits in itertools.product((0, 1), repeat=k)}
+        # Round trip, and equal functions share one node
+        bdd_failures += manager.to_table(u, k) != full
+        bdd_failures += manager.from_table(full, k, frozenset({"unused"})) != u
+        for var in range(k):
+            quantified = manager.exists(u, var, _union)
+            for bits in itertools.product((0, 1), repeat=k):
+                low, high = bits[:var] + (0,) + bits[var + 1:], bits[:var] + (1,) + bits[var + 1:]
+                bdd_failures += manager.evaluate(quantified, bits) != full[low] | full[high]
+        # Quantifying a variable u does not test leaves it alone
+        bdd_failures += manager.exists(u, k, _union) != u
+diff_failures += check("from_table/to_table round trip, sharing and exists", bdd_failures)
+
+print("\nSymbolic projection, determinization and complement:")
+def with_random_bits(tree, rng, m):
+    # Fresh nodes with m random track bits per label (plain labels for m = 0). Shared subtrees
+    # are copied once per occurrence, so every position gets its own bits.
+    nodes = []
+    def copy(node):
+        label = (node.label,) + tuple(rng.randint(0, 1) for _ in range(m)) if m else node.label
+        nodes.append(Node(label, node.id, [copy(c) for c in node.children]))
+        return nodes[-1]
+    root = copy(tree.root)
+    return RootedTree(root, nodes)
+
+from StringCase.utils import gen_new_alphabet
+track_rng = random.Random(4)
+symbolic_failures = {}
+for k in (1, 2, 3):
+    tracked_alphabet = {char: diff_symbols[char[0]] for char in gen_new_alphabet(diff_symbols, k)}
+    automata = [random_automaton(track_rng, symbols=tracked_alphabet) for _ in range(10)]
+    full_trees = [with_random_bits(tree, track_rng, k) for tree in diff_trees[:80]]
+    projected_trees = [with_random_bits(tree, track_rng, k - 1) for tree in diff_trees[:80]]
+    for A in automata:
+        manager = BDD()
+        S = SymbolicTreeAutomaton.from_tree_automaton(A, manager)
+        reference = A.project(diff_symbols, k).determinize_reachable()
+        results = {
+            "symbolic determinize_reachable": (S.determinize_reachable(), full_trees, A.nta_run),
+            "symbolic complement": (S.complement(), full_trees, lambda tree: not A.nta_run(tree)),
+            "symbolic project": (S.project(), projected_trees, reference.nta_run),
+            "symbolic project + determinize_reachable": (S.project().determinize_reachable(), projected_trees, reference.nta_run),
+            "symbolic project + complement": (S.project().complement(), projected_trees, lambda tree: not reference.nta_run(tree)),
+        }
+        for name, (result, trees, expected) in results.items():
+            symbolic_failures[name] = symbolic_failures.get(name, 0) + sum(result.nta_run(tree) != expected(tree) for tree in trees)
+for name, failures in symbolic_failures.items():
+    diff_failures += check(f"{name} agrees with the explicit automaton (k = 1..3)", failures)
+
+print("\nIndexed projection:")
+def with_bits(tree, bits):
+    # Fresh copy of tree with one more track: bits[i] for the i-th node of the postorder
+    order = tree.postorder()[0]
+    copies = {}
+    for node, bit in zip(order, bits):
+        label = (node.label if isinstance(node.label, tuple) else (node.label,)) + (bit,)
+        copies[id(node)] = Node(label, node.id, [copies[id(c)] for c in node.children])
+    return RootedTree(copies[id(tree.root)], list(copies.values()))
+
+def some_extension_accepted(A, tree):
+    # Brute force oracle for the projection: some choice of the last track is accepted by A
+    n = len(tree.postorder()[0])
+    return any(A.nta_run(with_bits(tree, bits)) for bits in itertools.product((0, 1), repeat=n))
+
+projection_rng = random.Random(5)
+projection_failures = {"project": 0, "compiled project": 0}
+for k in (1, 2, 3):
+    tracked_alphabet = {char: diff_symbols[char[0]] for char in gen_new_alphabet(diff_symbols, k)}
+    small = [tree for tree in diff_trees if len(tree.postorder()[0]) <= 7][:40]
+    trees = [with_random_bits(tree, projection_rng, k - 1) for tree in small]
+    for A in [random_automaton(projection_rng, symbols=tracked_alphabet) for _ in range(8)]:
+        projected, compiled = A.project(diff_symbols, k), A.compile().project(diff_symbols, k)
+        for tree in trees:
+            expected = some_extension_accepted(A, tree)
+            projection_failures["project"] += projected.nta_run(tree) != expected
+            projection_failures["compiled project"] += compiled.nta_run(tree) != expected
+for name, failures in projection_failures.items():
+    diff_failures += check(f"{name} accepts exactly the trees with an accepted extension (k = 1..3)", failures)
+
+print("\nProjection with determinization:")
+fused_rng = random.Random(6)
+fused_failures, fused_nondeterministic = 0, 0
+for k in (1, 2, 3):
+    tracked_alphabet = {char: diff_symbols[char[0]] for char in gen_new_alphabet(diff_symbols, k)}
+    trees = [with_random_bits(tree, fused_rng, k - 1) for tree in diff_trees[:80]]
+    for A in [random_automaton(fused_rng, symbols=tracked_alphabet) for _ in range(10)]:
+        fused = A.project_determinize(diff_symbols, k)
+        reference = A.project(diff_symbols, k).determinize_reachable()
+        fused_nondeterministic += not fused.is_deterministic()
+        fused_failures += sum(fused.nta_run(tree) != reference.nta_run(tree) for tree in trees)
+diff_failures += check("project_determinize is deterministic", fused_nondeterministic)
+diff_failures += check("project_determinize agrees with project + determinize_reachable (k = 1..3)", fused_failures)
+
+assert diff_failures == 0, f"{diff_failures} differential mismatches"
+print("  ✓ all differential checks passed")
+